@@ -0,0 +1,168 @@
+import os
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from scipy.stats import ks_2samp
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.ensemble import IsolationForest
+from sklearn.preprocessing import StandardScaler
+
+# 모델 하이퍼파라미터 (모델 캐시 키에 포함)
+HYPERPARAMETERS = {"n_clusters": 2, "contamination": 0.05, "random_state": 42}
+
+
+# 정규화 + 군집화 + 이상치 탐지 모델 학습 (전체 데이터로 새로 학습)
+def fit_models(features, hyperparameters=HYPERPARAMETERS):
+    # 실행 시간 정규화
+    scaler = StandardScaler()
+    scaled = scaler.fit_transform(features)
+
+    # 군집화 (K-Means)
+    kmeans = KMeans(n_clusters=hyperparameters["n_clusters"], random_state=hyperparameters["random_state"])
+    kmeans.fit(scaled)
+
+    # 이상치 탐지 (Isolation Forest)
+    iso_forest = IsolationForest(contamination=hyperparameters["contamination"],
+                                 random_state=hyperparameters["random_state"])
+    iso_forest.fit(scaled)
+    return {"scaler": scaler, "kmeans": kmeans, "iso_forest": iso_forest}
+
+
+# 학습된 모델로 판정 -> (군집, 이상치 여부(-1/1), 이상치 점수)
+def score_models(models, features):
+    scaled = models["scaler"].transform(features)
+    return (models["kmeans"].predict(scaled), models["iso_forest"].predict(scaled),
+            models["iso_forest"].decision_function(scaled))
+
+
+# 이상치 점수 경계값을 원본 실행 시간 값으로 변환 (첫 번째 특성 기준)
+def threshold_to_ms(scaler, threshold):
+    return threshold * scaler.scale_[0] + scaler.mean_[0]
+
+
+# 증분 이상 탐지 모델 상태
+# - StandardScaler.partial_fit: 평균/분산을 누적 갱신
+# - MiniBatchKMeans.partial_fit: 새 행만으로 군집 중심 갱신
+# - IsolationForest는 증분 학습이 안 되므로 과거 데이터의 reservoir 표본으로 다시 학습
+#   (refit_hours가 지났거나, 새 행 분포가 reservoir와 달라졌을 때(KS 검정)만)
+# - watermark(마지막으로 반영한 timestamp, epoch ms)와 함께 저장해서 다음 실행은 그 뒤의 행만 처리
+class IncrementalAnomalyModel:
+    def __init__(self, n_clusters=2, contamination=0.05, random_state=42, reservoir_size=10000,
+                 refit_hours=24.0, drift_pvalue=0.01, min_drift_rows=30, lateness_ms=60000):
+        self.n_clusters = n_clusters
+        self.contamination = contamination
+        self.random_state = random_state
+        self.reservoir_size = reservoir_size
+        self.refit_hours = refit_hours
+        self.drift_pvalue = drift_pvalue
+        self.min_drift_rows = min_drift_rows
+        self.lateness_ms = lateness_ms
+
+        self.scaler = StandardScaler()
+        self.kmeans = MiniBatchKMeans(n_clusters=n_clusters, random_state=random_state, n_init=3)
+        self.iso_forest = None
+        self.iso_fitted_at = None
+        self.refits = 0
+
+        self._random = np.random.default_rng(random_state)
+        self.reservoir = None
+        self.rows_seen = 0
+
+        # 증분 조회 위치
+        # 늦게 저장되는 문서를 놓치지 않도록 watermark - lateness_ms부터 다시 조회하고,
+        # 그 구간에서 이미 반영한 행은 tx_hash로 제외
+        self.watermark = None          # 반영한 가장 늦은 timestamp (epoch ms)
+        self.recent_ids = {}           # tx_hash -> timestamp (watermark - lateness_ms 이후 반영한 행)
+        self.open_orders = {}          # 끝나지 않은 주문의 마지막 단계 (배치 경계를 넘는 단계 지연 계산용)
+
+    # 새 행(원본 특성)으로 모델 갱신 -> (drift 여부, IsolationForest 재학습 여부)
+    def update(self, features):
+        features = np.asarray(features, dtype=np.float64)
+        self.scaler.partial_fit(features)
+        if self.kmeans_ready() or len(features) >= self.n_clusters:
+            self.kmeans.partial_fit(self.scaler.transform(features))
+
+        drift = self._detect_drift(features)
+        self._update_reservoir(features)
+        refit = self.iso_forest is None or drift or self._refit_due()
+        if refit:
+            self._refit_iso_forest()
+        return drift, refit
+
+    def kmeans_ready(self):
+        return hasattr(self.kmeans, "cluster_centers_")
+
+    # -> (군집, 이상치 여부(-1/1), 이상치 점수)
+    def score(self, features):
+        features = np.asarray(features, dtype=np.float64)
+        scaled = self.scaler.transform(features)
+        clusters = self.kmeans.predict(scaled) if self.kmeans_ready() else np.zeros(len(features), dtype=np.int32)
+        # 트리 분할은 특성별 단조 변환에 영향을 받지 않으므로 원본 값으로 학습/예측
+        # (scaler가 갱신되어도 기존 IsolationForest를 그대로 쓸 수 있음)
+        return clusters, self.iso_forest.predict(features), self.iso_forest.decision_function(features)
+
+    def _refit_due(self):
+        return self.iso_fitted_at is None or time.time() - self.iso_fitted_at >= self.refit_hours * 3600
+
+    def _refit_iso_forest(self):
+        self.iso_forest = IsolationForest(contamination=self.contamination, random_state=self.random_state)
+        self.iso_forest.fit(self.reservoir)
+        self.iso_fitted_at = time.time()
+        self.refits += 1
+
+    # 새 행 분포가 reservoir(과거 표본)와 다른지 특성별 2-표본 KS 검정
+    def _detect_drift(self, features):
+        if self.reservoir is None or len(features) < self.min_drift_rows:
+            return False
+        for column in range(features.shape[1]):
+            if ks_2samp(self.reservoir[:, column], features[:, column]).pvalue < self.drift_pvalue:
+                return True
+        return False
+
+    # reservoir sampling: 지금까지 본 모든 행에서 균등하게 reservoir_size개 표본 유지
+    def _update_reservoir(self, features):
+        if self.reservoir is None:
+            self.reservoir = np.empty((0, features.shape[1]))
+        free = max(self.reservoir_size - len(self.reservoir), 0)
+        if free:
+            self.reservoir = np.vstack([self.reservoir, features[:free]])
+        rest = features[free:]
+        if len(rest):
+            positions = self.rows_seen + free + np.arange(len(rest))
+            slots = self._random.integers(0, positions + 1)
+            keep = slots < self.reservoir_size
+            self.reservoir[slots[keep]] = rest[keep]
+        self.rows_seen += len(features)
+
+    # 다음 증분 조회 시작 시각 (epoch ms)
+    def fetch_start(self):
+        return None if self.watermark is None else self.watermark - self.lateness_ms
+
+    # 반영한 행의 timestamps(epoch ms)와 tx_hash로 watermark 이동
+    # tx_hash가 없는 예전 문서는 recent_ids에 넣지 않음 (None 하나로 이후의 tx_hash 없는 행이 모두 걸러지지 않도록)
+    def advance_watermark(self, timestamps, tx_hashes):
+        if len(timestamps) == 0:
+            return
+        self.recent_ids.update((tx_hash, ts) for tx_hash, ts in zip(tx_hashes.tolist(), timestamps.tolist())
+                               if not pd.isna(tx_hash))
+        self.watermark = max(int(timestamps.max()), self.watermark or 0)
+        cutoff = self.watermark - self.lateness_ms
+        self.recent_ids = {tx_hash: ts for tx_hash, ts in self.recent_ids.items() if ts >= cutoff}
+
+    # lateness 구간에서 이미 반영한 행인지 (tx_hash가 없는 행은 확인할 수 없으므로 항상 새 행)
+    def already_seen(self, tx_hashes):
+        recent = [tx_hash for tx_hash in self.recent_ids if not pd.isna(tx_hash)]
+        if not recent:
+            return np.zeros(len(tx_hashes), dtype=bool)
+        return np.isin(tx_hashes, recent) & ~pd.isna(tx_hashes)
+
+    def save(self, path):
+        tmp_path = path + ".tmp"
+        joblib.dump(self, tmp_path)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load(path):
+        return joblib.load(path)
@@ -0,0 +1,236 @@
+import argparse
+import asyncio
+import json
+import time
+
+from eth_abi.exceptions import DecodingError
+from elasticsearch import ApiError, AsyncElasticsearch, ConnectionError, ConnectionTimeout
+from web3 import AsyncWeb3
+
+from chain_cache import LRUCache, normalize_tx_hash
+from es_bulk_writer import RETRYABLE_STATUS
+from es_schema import ensure_index_templates_async
+from tx_decoder import build_transaction_data, default_registry
+
+# 단계 사이 큐를 닫을 때 쓰는 표시 값
+_DONE = object()
+
+
+# asyncio 기반 트랜잭션 수집 파이프라인
+# fetch(트랜잭션/영수증/블록 조회, 동시성 제한) -> decode -> index(_bulk) 단계를 크기 제한 큐로 연결
+# 저장되는 문서는 analyze_transaction의 transaction_data와 동일
+class AsyncIngestPipeline:
+    def __init__(self, w3, es, registry=None, concurrency=32, queue_size=1000, index="transactions",
+                 batch_size=500, flush_interval=1.0, max_retries=5, retry_backoff=0.5, max_blocks=65536):
+        self.w3 = w3
+        self.es = es
+        self.registry = registry or default_registry()
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.index = index
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+        # 블록 타임스탬프 캐시 + 같은 블록을 동시에 조회하는 요청 합치기
+        self.timestamps = LRUCache(max_blocks)
+        self._inflight_blocks = {}
+
+        self.fetched = 0
+        self.fetch_errors = 0
+        self.decode_errors = 0
+        self.docs_indexed = 0
+        self.docs_failed = 0
+
+    async def run(self, tx_hashes):
+        hash_queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        decode_queue = asyncio.Queue(maxsize=self.queue_size)
+        index_queue = asyncio.Queue(maxsize=self.queue_size)
+
+        started = time.perf_counter()
+        fetchers = [asyncio.create_task(self._fetch_worker(hash_queue, decode_queue))
+                    for _ in range(self.concurrency)]
+        decoder = asyncio.create_task(self._decode_worker(decode_queue, index_queue))
+        indexer = asyncio.create_task(self._index_worker(index_queue))
+
+        for tx_hash in tx_hashes:
+            await hash_queue.put(tx_hash)
+        for _ in fetchers:
+            await hash_queue.put(_DONE)
+
+        await asyncio.gather(*fetchers)
+        await decode_queue.put(_DONE)
+        await decoder
+        await index_queue.put(_DONE)
+        await indexer
+
+        elapsed = time.perf_counter() - started
+        return {
+            "fetched": self.fetched,
+            "fetch_errors": self.fetch_errors,
+            "decode_errors": self.decode_errors,
+            "docs_indexed": self.docs_indexed,
+            "docs_failed": self.docs_failed,
+            "block_cache": self.timestamps.stats(),
+            "elapsed_seconds": elapsed,
+            "tx_per_second": self.fetched / elapsed if elapsed > 0 else 0.0,
+        }
+
+    # 블록 타임스탬프 조회 (캐시 hit이면 RPC 없음, 조회 중인 블록이면 같은 요청을 기다림)
+    async def _block_timestamp(self, block_number):
+        timestamp = self.timestamps.get(block_number)
+        if timestamp is not None:
+            return timestamp
+
+        future = self._inflight_blocks.get(block_number)
+        if future is None:
+            future = asyncio.ensure_future(self.w3.eth.get_block(block_number))
+            self._inflight_blocks[block_number] = future
+            try:
+                block = await future
+                self.timestamps.put(block_number, block['timestamp'])
+            finally:
+                del self._inflight_blocks[block_number]
+            return block['timestamp']
+
+        block = await asyncio.shield(future)
+        return block['timestamp']
+
+    async def _fetch_worker(self, hash_queue, decode_queue):
+        while True:
+            tx_hash = await hash_queue.get()
+            if tx_hash is _DONE:
+                return
+            # 트랜잭션과 영수증은 서로 독립적이므로 동시에 조회
+            receipt_task = asyncio.ensure_future(self.w3.eth.wait_for_transaction_receipt(tx_hash))
+            try:
+                tx = await self.w3.eth.get_transaction(tx_hash)
+                await receipt_task
+                block_timestamp = await self._block_timestamp(tx['blockNumber'])
+            except Exception as e:
+                receipt_task.cancel()
+                self.fetch_errors += 1
+                print(f"Failed to fetch transaction {normalize_tx_hash(tx_hash)}: {e}")
+                continue
+            self.fetched += 1
+            await decode_queue.put((tx, block_timestamp))
+
+    async def _decode_worker(self, decode_queue, index_queue):
+        while True:
+            item = await decode_queue.get()
+            if item is _DONE:
+                return
+            tx, block_timestamp = item
+            try:
+                func_obj, func_params = self.registry.decode_function_input(tx['to'], tx['input'])
+            except DecodingError:
+                self.decode_errors += 1
+                print("Unable to decode function input.")
+                continue
+            await index_queue.put(build_transaction_data(tx, func_obj.name, func_params, block_timestamp))
+
+    # 문서를 batch_size 또는 flush_interval 기준으로 모아서 _bulk 전송
+    # flush_interval은 batch의 첫 문서가 들어온 시각부터 잼 (문서가 계속 조금씩 들어와도 그 이상 지연되지 않음)
+    async def _index_worker(self, index_queue):
+        loop = asyncio.get_running_loop()
+        batch = []
+        deadline = None
+        done = False
+        while not done:
+            timeout = None if deadline is None else max(deadline - loop.time(), 0)
+            try:
+                item = await asyncio.wait_for(index_queue.get(), timeout=timeout)
+            except asyncio.TimeoutError:
+                item = None
+
+            if item is _DONE:
+                done = True
+            elif item is not None:
+                if not batch:
+                    deadline = loop.time() + self.flush_interval
+                batch.append(item)
+
+            if batch and (done or len(batch) >= self.batch_size or loop.time() >= deadline):
+                await self._send(batch)
+                batch = []
+                deadline = None
+
+    async def _send(self, documents):
+        attempt = 0
+        while documents:
+            operations = []
+            # 트랜잭션 해시를 문서 id로 사용 (다시 실행하거나 재시도해도 중복 저장되지 않음, 다른 수집 경로와 같은 id)
+            for document in documents:
+                operations.append({"index": {"_index": self.index, "_id": document["tx_hash"]}})
+                operations.append(document)
+            # 연결 오류 / RETRYABLE_STATUS만 재시도 (직렬화 오류 등은 재시도해도 같으므로 바로 실패 처리)
+            try:
+                response = await self.es.bulk(operations=operations)
+            except (ConnectionError, ConnectionTimeout, ApiError) as e:
+                retryable = not isinstance(e, ApiError) or e.status_code in RETRYABLE_STATUS
+                if retryable and attempt < self.max_retries:
+                    await asyncio.sleep(self.retry_backoff * (2 ** attempt))
+                    attempt += 1
+                    continue
+                self.docs_failed += len(documents)
+                print(f"Failed to index {len(documents)} documents into {self.index}: {e}")
+                return
+            except Exception as e:
+                self.docs_failed += len(documents)
+                print(f"Failed to index {len(documents)} documents into {self.index}: {e!r}")
+                return
+
+            if not response.get("errors"):
+                self.docs_indexed += len(documents)
+                return
+
+            retry = []
+            for document, item in zip(documents, response["items"]):
+                result = next(iter(item.values()))
+                status = result.get("status", 500)
+                if status < 300:
+                    self.docs_indexed += 1
+                elif status in RETRYABLE_STATUS and attempt < self.max_retries:
+                    retry.append(document)
+                else:
+                    self.docs_failed += 1
+                    print(f"Failed to index document into {self.index}: {result.get('error', status)}")
+            documents = retry
+            if documents:
+                await asyncio.sleep(self.retry_backoff * (2 ** attempt))
+                attempt += 1
+
+
+async def ingest(tx_hashes, rpc_url, es_url, concurrency, index):
+    w3 = AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(rpc_url))
+    es = AsyncElasticsearch(es_url)
+    try:
+        await ensure_index_templates_async(es, ["transactions"])
+        pipeline = AsyncIngestPipeline(w3, es, concurrency=concurrency, index=index)
+        return await pipeline.run(tx_hashes)
+    finally:
+        await es.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrently fetch, decode and index transactions by hash")
+    parser.add_argument("tx_hashes", nargs="*", help="transaction hashes to ingest")
+    parser.add_argument("--hashes-file", help="file with one transaction hash per line")
+    parser.add_argument("--rpc-url", default="http://127.0.0.1:8545")
+    parser.add_argument("--es-url", default="http://localhost:9200")
+    parser.add_argument("--index", default="transactions")
+    parser.add_argument("--concurrency", type=int, default=32, help="maximum number of in-flight transaction fetches")
+    args = parser.parse_args()
+
+    tx_hashes = list(args.tx_hashes)
+    if args.hashes_file:
+        with open(args.hashes_file) as f:
+            tx_hashes.extend(line.strip() for line in f if line.strip())
+
+    stats = asyncio.run(ingest(tx_hashes, args.rpc_url, args.es_url, args.concurrency, args.index))
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+import argparse
+import json
+import os
+import time
+
+import requests
+from eth_abi.exceptions import DecodingError
+from eth_utils import to_checksum_address
+from elasticsearch import Elasticsearch
+
+from es_bulk_writer import BulkWriter
+from es_schema import ensure_index_templates
+from ingest_spool import SpoolWriter
+from tx_decoder import build_transaction_data, default_registry
+
+
+# JSON-RPC 배치 요청 클라이언트 (HTTP 요청 하나에 여러 호출을 담아 전송)
+class BatchRpcClient:
+    def __init__(self, url, timeout=60, max_retries=3, retry_backoff=1.0):
+        self.url = url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.session = requests.Session()
+        self.requests_sent = 0
+        self._next_id = 0
+
+    # calls: [(method, params), ...] -> 호출 순서대로 결과 리스트
+    def batch(self, calls):
+        payload = []
+        for method, params in calls:
+            self._next_id += 1
+            payload.append({"jsonrpc": "2.0", "id": self._next_id, "method": method, "params": params})
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.post(self.url, json=payload, timeout=self.timeout)
+                response.raise_for_status()
+                break
+            except requests.RequestException:
+                if attempt >= self.max_retries:
+                    raise
+                time.sleep(self.retry_backoff * (2 ** attempt))
+        self.requests_sent += 1
+
+        results = {item["id"]: item for item in response.json()}
+        ordered = []
+        for request in payload:
+            item = results.get(request["id"])
+            if item is None or "error" in item:
+                error = item["error"] if item else "missing response"
+                raise RuntimeError(f"{request['method']} {request['params']} failed: {error}")
+            ordered.append(item["result"])
+        return ordered
+
+    def call(self, method, params):
+        return self.batch([(method, params)])[0]
+
+
+# 결과를 NDJSON 파일에 한 줄씩 추가하는 sink (BulkWriter와 같은 index/flush/close 인터페이스)
+# 문서 id가 있으면 "_id" 필드로 같이 기록 (체크포인트 전에 중단돼서 다시 쓴 줄을 id로 중복 제거 / 재생할 수 있음)
+class NdjsonSink:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "a", encoding="utf-8")
+        self.docs_written = 0
+
+    def index(self, index, document, id=None):
+        if id is not None:
+            document = {"_id": id, **document}
+        self.file.write(json.dumps(document, default=str) + "\n")
+        self.docs_written += 1
+
+    def flush(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def stats(self):
+        return {"docs_written": self.docs_written}
+
+
+# 체크포인트 파일 (다음에 스캔할 블록 번호)
+def load_checkpoint(path):
+    if path and os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)["next_block"]
+    return None
+
+
+def save_checkpoint(path, next_block):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"next_block": next_block, "updated_at": time.time()}, f)
+    os.replace(tmp_path, path)
+
+
+# eth_getBlockByNumber(full=true) 결과의 트랜잭션을 web3 형식에 맞게 변환
+def normalize_raw_transaction(raw_tx, block_number):
+    return {
+        "hash": raw_tx["hash"],
+        "from": to_checksum_address(raw_tx["from"]),
+        "to": to_checksum_address(raw_tx["to"]) if raw_tx.get("to") else None,
+        "input": raw_tx["input"],
+        "blockNumber": block_number,
+    }
+
+
+# fromBlock..toBlock 구간을 배치 단위로 스캔하면서 디코딩된 트랜잭션을 sink로 전달
+# 블록에 포함된 트랜잭션을 그대로 사용하므로 트랜잭션별 추가 조회 없음
+def scan_blocks(rpc, registry, sink, from_block, to_block, index="transactions",
+                blocks_per_request=100, checkpoint_path=None):
+    stats = {"blocks": 0, "transactions": 0, "decoded": 0, "decode_errors": 0}
+    started = time.perf_counter()
+
+    for batch_start in range(from_block, to_block + 1, blocks_per_request):
+        batch_end = min(batch_start + blocks_per_request - 1, to_block)
+        failed_before = getattr(sink, "docs_failed", 0)
+        blocks = rpc.batch([("eth_getBlockByNumber", [hex(number), True])
+                            for number in range(batch_start, batch_end + 1)])
+
+        for block in blocks:
+            if block is None:
+                continue
+            stats["blocks"] += 1
+            block_number = int(block["number"], 16)
+            block_timestamp = int(block["timestamp"], 16)
+            for raw_tx in block["transactions"]:
+                stats["transactions"] += 1
+                tx = normalize_raw_transaction(raw_tx, block_number)
+                if not registry.is_registered(tx["to"]):
+                    continue
+                try:
+                    func_obj, func_params = registry.decode_function_input(tx["to"], tx["input"])
+                except DecodingError:
+                    stats["decode_errors"] += 1
+                    continue
+                # 문서 id = 트랜잭션 해시 (실패한 배치를 다시 스캔해도 중복 저장되지 않음)
+                sink.index(index=index, document=build_transaction_data(tx, func_obj.name, func_params, block_timestamp),
+                           id=tx["hash"])
+                stats["decoded"] += 1
+
+        # sink에 반영된 뒤에 체크포인트 저장 (중단되면 이 배치 다음부터 재개)
+        # 이 배치를 보내는 중에 색인 실패한 문서가 생기면 체크포인트를 넘기지 않고 중단 (다시 실행하면 이 배치부터 재시도)
+        if checkpoint_path:
+            sink.flush()
+            failed = getattr(sink, "docs_failed", 0) - failed_before
+            if failed:
+                raise RuntimeError(f"{failed} documents failed to index in blocks {batch_start}..{batch_end}; "
+                                   f"checkpoint left at block {batch_start}")
+            save_checkpoint(checkpoint_path, batch_end + 1)
+
+        elapsed = time.perf_counter() - started
+        print(f"Scanned blocks {batch_start}..{batch_end} "
+              f"({stats['decoded']} decoded, {stats['blocks'] / elapsed:.1f} blocks/s)")
+
+    stats["rpc_requests"] = rpc.requests_sent
+    stats["elapsed_seconds"] = time.perf_counter() - started
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill decoded transactions from a block range")
+    parser.add_argument("--rpc-url", default="http://127.0.0.1:8545")
+    parser.add_argument("--from-block", type=int, default=0)
+    parser.add_argument("--to-block", default="latest")
+    parser.add_argument("--blocks-per-request", type=int, default=100, help="blocks fetched per JSON-RPC batch")
+    parser.add_argument("--checkpoint", default="backfill_checkpoint.json",
+                        help="checkpoint file; an existing checkpoint overrides --from-block")
+    parser.add_argument("--contract", action="append", default=[], metavar="ADDRESS=ABI_FILE",
+                        help="register an additional contract ABI for decoding")
+    parser.add_argument("--ndjson", help="write documents to this NDJSON file instead of Elasticsearch")
+    parser.add_argument("--spool", help="write documents to this spool directory; run ingest_spool.py drain to index them")
+    parser.add_argument("--es-url", default="http://localhost:9200")
+    parser.add_argument("--index", default="transactions")
+    args = parser.parse_args()
+
+    rpc = BatchRpcClient(args.rpc_url)
+    registry = default_registry()
+    for spec in args.contract:
+        address, abi_file = spec.split("=", 1)
+        with open(abi_file) as f:
+            registry.register(address, f.read())
+
+    to_block = int(rpc.call("eth_blockNumber", []), 16) if args.to_block == "latest" else int(args.to_block)
+    from_block = load_checkpoint(args.checkpoint)
+    if from_block is None:
+        from_block = args.from_block
+    else:
+        print(f"Resuming from checkpoint at block {from_block}")
+
+    if args.ndjson:
+        sink = NdjsonSink(args.ndjson)
+    elif args.spool:
+        sink = SpoolWriter(args.spool)
+    else:
+        es = Elasticsearch(args.es_url)
+        ensure_index_templates(es, ["transactions"])
+        sink = BulkWriter(es)
+    try:
+        stats = scan_blocks(rpc, registry, sink, from_block, to_block, index=args.index,
+                            blocks_per_request=args.blocks_per_request, checkpoint_path=args.checkpoint)
+    finally:
+        sink.close()
+    stats["sink"] = sink.stats()
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
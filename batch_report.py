@@ -0,0 +1,134 @@
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import matplotlib
+matplotlib.use("Agg")  # 워커 프로세스에서 화면 없이 파일로만 저장
+from elasticsearch import Elasticsearch
+
+import visualdetail
+import visualizer
+from trace_fetch import fetch_order_traces, fetch_order_traces_from_snapshot
+
+MANIFEST_FILE = "manifest.json"
+
+
+# "1-100,250,300-310" -> ["1", ..., "100", "250", "300", ..., "310"]
+def parse_order_ids(spec):
+    order_ids = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            first, last = (int(value) for value in part.split("-", 1))
+            order_ids.extend(str(order_id) for order_id in range(first, last + 1))
+        else:
+            order_ids.append(part)
+    return list(dict.fromkeys(order_ids))
+
+
+# 주문 데이터 지문 (문서 id + 내용): 지난 렌더링 때와 같으면 다시 그리지 않음
+def order_fingerprint(transactions, fabric_data):
+    docs = sorted(json.dumps([hit.get("_id"), hit["_source"]], sort_keys=True, default=str)
+                  for hit in transactions + fabric_data)
+    return hashlib.sha256("\n".join(docs).encode("utf-8")).hexdigest()
+
+
+def _output_paths(output_dir, order_id):
+    return (os.path.join(output_dir, f"order-{order_id}-graph.png"),
+            os.path.join(output_dir, f"order-{order_id}-detail.png"))
+
+
+# 워커 프로세스: 주문 하나의 네트워크 그래프 + 상세 테이블 PNG
+def _render_order(order_id, transactions, fabric_data, output_dir):
+    graph_path, detail_path = _output_paths(output_dir, order_id)
+    network_graph, order_dict, legend_labels, edge_labels = visualizer.create_network_graph(transactions)
+    visualizer.visualize_graph(network_graph, order_dict, legend_labels, edge_labels, fabric_data,
+                               output=graph_path, show=False)
+    transaction_df = visualdetail.process_transactions(transactions)
+    fabric_df, legend_data = visualdetail.process_fabric_data([], fabric_data)
+    visualdetail.visualize_details(transaction_df, fabric_df, legend_data, output=detail_path, show=False)
+    return order_id
+
+
+def load_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _save_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+# 주문별 PNG를 프로세스 풀에서 렌더링 -> {"rendered", "skipped", "missing", "failed"}
+# - manifest에 기록된 지문과 같고 PNG가 남아 있는 주문은 건너뜀 (force=True면 전부 다시 그림)
+# - 트랜잭션이 하나도 없는 주문은 missing
+def run_batch(order_ids, transactions, fabric, output_dir, max_workers=None, force=False):
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = load_manifest(output_dir)
+    stats = {"rendered": 0, "skipped": 0, "missing": 0, "failed": 0}
+
+    pending = {}
+    for order_id in order_ids:
+        if not transactions.get(order_id):
+            stats["missing"] += 1
+            continue
+        fingerprint = order_fingerprint(transactions[order_id], fabric.get(order_id, []))
+        if (not force and manifest.get(order_id) == fingerprint
+                and all(os.path.exists(path) for path in _output_paths(output_dir, order_id))):
+            stats["skipped"] += 1
+            continue
+        pending[order_id] = fingerprint
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as pool:
+            futures = {pool.submit(_render_order, order_id, transactions[order_id], fabric.get(order_id, []),
+                                   output_dir): order_id
+                       for order_id in pending}
+            for future in as_completed(futures):
+                order_id = futures[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"Failed to render order {order_id}: {e}")
+                    manifest.pop(order_id, None)
+                    stats["failed"] += 1
+                    continue
+                manifest[order_id] = pending[order_id]
+                stats["rendered"] += 1
+        _save_manifest(output_dir, manifest)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render network graph and detail PNGs for many orders")
+    parser.add_argument("orders", help="order ids and ranges, e.g. 1-100,250,300-310")
+    parser.add_argument("--output-dir", default="reports")
+    parser.add_argument("--workers", type=int, help="render processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="re-render orders whose data has not changed")
+    parser.add_argument("--snapshot", metavar="DIR",
+                        help="read orders from a local snapshot (tx_snapshot.py) instead of Elasticsearch")
+    parser.add_argument("--es-url", default="http://localhost:9200")
+    parser.add_argument("--page-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    order_ids = parse_order_ids(args.orders)
+    if args.snapshot:
+        transactions, fabric = fetch_order_traces_from_snapshot(args.snapshot, order_ids)
+    else:
+        transactions, fabric = fetch_order_traces(Elasticsearch(args.es_url), order_ids, page_size=args.page_size)
+    stats = run_batch(order_ids, transactions, fabric, args.output_dir, max_workers=args.workers, force=args.force)
+    print(f"{len(order_ids)} orders: {stats}")
+
+
+if __name__ == "__main__":
+    main()
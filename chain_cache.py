@@ -0,0 +1,120 @@
+import threading
+from collections import OrderedDict
+
+from web3 import Web3
+
+
+# 크기 제한이 있는 LRU 캐시 (가장 오래 사용되지 않은 항목부터 제거)
+class LRUCache:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+
+# 트랜잭션 해시를 캐시 키로 정규화 (HexBytes/bytes/str 모두 "0x..." 소문자 문자열로)
+def normalize_tx_hash(tx_hash):
+    if isinstance(tx_hash, str):
+        return tx_hash.lower()
+    return Web3.to_hex(tx_hash).lower()
+
+
+# 이더리움 조회 캐시
+# - 블록 번호 기준 블록 헤더 / 타임스탬프 LRU 캐시 (같은 블록의 반복 get_block 제거)
+# - 트랜잭션 / 영수증 캐시 (호출자가 이미 가진 영수증을 prefill 가능)
+# - 캐시별 hit/miss 카운터로 절약한 RPC 호출 수 확인
+class ChainLookupCache:
+    def __init__(self, web3, max_blocks=1024, max_timestamps=65536, max_transactions=4096):
+        self.web3 = web3
+        self.blocks = LRUCache(max_blocks)
+        self.timestamps = LRUCache(max_timestamps)
+        self.transactions = LRUCache(max_transactions)
+        self.receipts = LRUCache(max_transactions)
+
+    # 이미 가지고 있는 트랜잭션/영수증을 캐시에 등록
+    def prefill(self, tx_hash, tx=None, receipt=None):
+        key = normalize_tx_hash(tx_hash)
+        if tx is not None:
+            self.transactions.put(key, tx)
+        if receipt is not None:
+            self.receipts.put(key, receipt)
+
+    # 이미 가지고 있는 블록을 캐시에 등록
+    def prefill_block(self, block):
+        self.blocks.put(block['number'], block)
+        self.timestamps.put(block['number'], block['timestamp'])
+
+    def get_transaction(self, tx_hash):
+        key = normalize_tx_hash(tx_hash)
+        tx = self.transactions.get(key)
+        if tx is None:
+            tx = self.web3.eth.get_transaction(tx_hash)
+            self.transactions.put(key, tx)
+        return tx
+
+    # 영수증 조회 (캐시에 없으면 채굴될 때까지 대기)
+    def get_receipt(self, tx_hash):
+        key = normalize_tx_hash(tx_hash)
+        receipt = self.receipts.get(key)
+        if receipt is None:
+            receipt = self.web3.eth.wait_for_transaction_receipt(tx_hash)
+            self.receipts.put(key, receipt)
+        return receipt
+
+    def get_block(self, block_number):
+        block = self.blocks.get(block_number)
+        if block is None:
+            block = self.web3.eth.get_block(block_number)
+            self.prefill_block(block)
+        return block
+
+    # 블록 타임스탬프만 필요한 경우 (블록 헤더가 LRU에서 밀려나도 타임스탬프는 유지)
+    def get_block_timestamp(self, block_number):
+        timestamp = self.timestamps.get(block_number)
+        if timestamp is None:
+            timestamp = self.get_block(block_number)['timestamp']
+        return timestamp
+
+    def stats(self):
+        stats = {
+            "blocks": self.blocks.stats(),
+            "timestamps": self.timestamps.stats(),
+            "transactions": self.transactions.stats(),
+            "receipts": self.receipts.stats(),
+        }
+        # 캐시 hit 한 번이 RPC 호출 한 번을 절약
+        stats["rpc_calls_saved"] = (self.blocks.hits + self.timestamps.hits
+                                    + self.transactions.hits + self.receipts.hits)
+        return stats
@@ -0,0 +1,263 @@
+import argparse
+import asyncio
+import json
+import time
+
+from eth_abi.exceptions import DecodingError
+from elasticsearch import Elasticsearch
+from web3 import AsyncWeb3, WebSocketProvider
+
+from backfill_scanner import load_checkpoint, save_checkpoint
+from es_bulk_writer import BulkWriter
+from es_schema import ensure_index_templates
+from ingest_spool import SpoolWriter
+from tx_decoder import build_transaction_data, default_registry
+
+
+# 실시간 체인 tailer
+# - WebSocket newHeads 구독으로 체인 head를 따라감
+# - head보다 confirmations 블록 이상 뒤에 있는 블록만 처리 (얕은 reorg는 여기서 걸러짐)
+# - 더 깊은 reorg는 parentHash 불일치로 감지해서 분기 지점까지 되감고, 버려진 블록의 문서를 삭제
+# - 블록 조회 -> decode/index 사이에 크기 제한 큐
+# - head 대비 지연(블록 수, 초)을 metrics()로 제공
+# - 체크포인트는 checkpoint_blocks 블록마다 / checkpoint_interval초마다 / 종료할 때 sink flush 후 기록
+#   (블록마다 flush하면 BulkWriter가 _bulk 요청을 모으지 못함)
+class ChainTailer:
+    def __init__(self, w3, registry, sink, confirmations=6, queue_size=256, index="transactions",
+                 metrics_interval=10.0, checkpoint_path=None, history_size=1024, checkpoint_blocks=100,
+                 checkpoint_interval=5.0):
+        self.w3 = w3
+        self.registry = registry
+        self.sink = sink
+        self.confirmations = confirmations
+        self.index = index
+        self.metrics_interval = metrics_interval
+        self.checkpoint_path = checkpoint_path
+        self.history_size = history_size
+        self.checkpoint_blocks = checkpoint_blocks
+        self.checkpoint_interval = checkpoint_interval
+
+        self.block_queue = asyncio.Queue(maxsize=queue_size)
+        self.head_changed = asyncio.Event()
+        self.chain_head = None
+        self.next_block = None
+
+        # 최근 조회한 블록: 번호 -> [블록 해시, 저장한 문서 id 목록]
+        self._recent_blocks = {}
+
+        # 아직 체크포인트에 기록하지 않은 다음 블록 번호 / 그 사이 처리한 블록 수
+        self._pending_checkpoint = None
+        self._blocks_since_checkpoint = 0
+        self._checkpoint_lock = asyncio.Lock()
+        self._failed_at_checkpoint = getattr(sink, "docs_failed", 0)
+
+        self.last_indexed_block = None
+        self.last_indexed_timestamp = None
+        self.blocks_processed = 0
+        self.docs_indexed = 0
+        self.decode_errors = 0
+        self.reorgs = 0
+
+    async def run(self, from_block=None):
+        self.chain_head = await self.w3.eth.block_number
+        if from_block is None:
+            from_block = max(self.chain_head - self.confirmations, 0)
+        self.next_block = from_block
+
+        tasks = [
+            asyncio.create_task(self._follow_heads()),
+            asyncio.create_task(self._fetch_blocks()),
+            asyncio.create_task(self._index_blocks()),
+            asyncio.create_task(self._report_metrics()),
+        ]
+        if self.checkpoint_path:
+            tasks.append(asyncio.create_task(self._checkpoint_periodically()))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            # 종료할 때 마지막으로 처리한 블록까지 기록
+            await self.checkpoint()
+
+    def metrics(self):
+        lag_seconds = None
+        if self.last_indexed_timestamp is not None:
+            lag_seconds = time.time() - self.last_indexed_timestamp
+        lag_blocks = None
+        if self.chain_head is not None and self.last_indexed_block is not None:
+            lag_blocks = self.chain_head - self.last_indexed_block
+        return {
+            "chain_head": self.chain_head,
+            "last_indexed_block": self.last_indexed_block,
+            "lag_blocks": lag_blocks,
+            "lag_seconds": lag_seconds,
+            "queue_depth": self.block_queue.qsize(),
+            "blocks_processed": self.blocks_processed,
+            "docs_indexed": self.docs_indexed,
+            "decode_errors": self.decode_errors,
+            "reorgs": self.reorgs,
+        }
+
+    # newHeads 구독 -> chain_head 갱신
+    async def _follow_heads(self):
+        await self.w3.eth.subscribe("newHeads")
+        async for payload in self.w3.socket.process_subscriptions():
+            self.chain_head = payload["result"]["number"]
+            self.head_changed.set()
+
+    # 확정된 블록을 순서대로 조회해서 큐에 넣음 (큐가 가득 차면 대기)
+    async def _fetch_blocks(self):
+        while True:
+            if self.next_block > self.chain_head - self.confirmations:
+                self.head_changed.clear()
+                await self.head_changed.wait()
+                continue
+
+            block = await self.w3.eth.get_block(self.next_block, full_transactions=True)
+            parent = self._recent_blocks.get(block["number"] - 1)
+            if parent is not None and parent[0] != block["parentHash"]:
+                await self._rewind(block["number"] - 1)
+                continue
+
+            self._recent_blocks[block["number"]] = [block["hash"], []]
+            self._recent_blocks.pop(block["number"] - self.history_size, None)
+            await self.block_queue.put(block)
+            self.next_block += 1
+
+    # 분기 지점을 찾아 되감고, 버려진 블록에서 저장한 문서 삭제
+    async def _rewind(self, block_number):
+        self.reorgs += 1
+        orphaned_ids = []
+        while block_number in self._recent_blocks:
+            block = await self.w3.eth.get_block(block_number)
+            block_hash, doc_ids = self._recent_blocks[block_number]
+            if block["hash"] == block_hash:
+                break
+            orphaned_ids.extend(doc_ids)
+            del self._recent_blocks[block_number]
+            block_number -= 1
+
+        print(f"Reorg detected below confirmation depth; rewinding to block {block_number + 1} "
+              f"and removing {len(orphaned_ids)} orphaned documents")
+        for doc_id in orphaned_ids:
+            await asyncio.to_thread(self.sink.delete, self.index, doc_id)
+        self.next_block = block_number + 1
+
+    async def _index_blocks(self):
+        while True:
+            block = await self.block_queue.get()
+            # 큐에서 기다리는 동안 되감기로 버려진 블록은 건너뜀
+            recent = self._recent_blocks.get(block["number"])
+            if recent is None or recent[0] != block["hash"]:
+                continue
+
+            doc_ids = recent[1]
+            documents = []
+            for tx in block["transactions"]:
+                if not self.registry.is_registered(tx["to"]):
+                    continue
+                try:
+                    func_obj, func_params = self.registry.decode_function_input(tx["to"], tx["input"])
+                except DecodingError:
+                    self.decode_errors += 1
+                    continue
+                doc_id = AsyncWeb3.to_hex(tx["hash"])
+                doc_ids.append(doc_id)
+                documents.append((doc_id, build_transaction_data(tx, func_obj.name, func_params, block["timestamp"])))
+
+            # 트랜잭션 해시를 문서 id로 사용 (되감은 뒤 재처리해도 중복 저장되지 않음)
+            # sink는 backpressure로 블록될 수 있으므로 스레드에서 실행
+            if documents:
+                await asyncio.to_thread(self._index_documents, documents)
+
+            self.blocks_processed += 1
+            self.docs_indexed += len(documents)
+            self.last_indexed_block = block["number"]
+            self.last_indexed_timestamp = block["timestamp"]
+            self._pending_checkpoint = block["number"] + 1
+            self._blocks_since_checkpoint += 1
+            if self.checkpoint_path and self._blocks_since_checkpoint >= self.checkpoint_blocks:
+                await self.checkpoint()
+
+    # sink 버퍼에만 있는 문서가 체크포인트보다 먼저 저장되도록 flush 후 기록
+    # 지난 체크포인트 이후 색인 실패한 문서가 있으면 체크포인트를 넘기지 않고 중단 (다시 실행하면 그 블록부터 재처리)
+    async def checkpoint(self):
+        async with self._checkpoint_lock:
+            next_block = self._pending_checkpoint
+            if not self.checkpoint_path or next_block is None:
+                return
+            await asyncio.to_thread(self.sink.flush)
+            failed = getattr(self.sink, "docs_failed", 0) - self._failed_at_checkpoint
+            if failed:
+                self._pending_checkpoint = None
+                raise RuntimeError(f"{failed} documents failed to index before block {next_block}; "
+                                   f"checkpoint not advanced")
+            save_checkpoint(self.checkpoint_path, next_block)
+            if self._pending_checkpoint == next_block:
+                self._pending_checkpoint = None
+            self._blocks_since_checkpoint = 0
+
+    async def _checkpoint_periodically(self):
+        while True:
+            await asyncio.sleep(self.checkpoint_interval)
+            await self.checkpoint()
+
+    def _index_documents(self, documents):
+        for doc_id, document in documents:
+            self.sink.index(index=self.index, document=document, id=doc_id)
+
+    async def _report_metrics(self):
+        while True:
+            await asyncio.sleep(self.metrics_interval)
+            print(f"Tailer metrics: {json.dumps(self.metrics())}")
+
+
+async def tail(args):
+    if args.spool:
+        sink = SpoolWriter(args.spool)
+    else:
+        es = Elasticsearch(args.es_url)
+        ensure_index_templates(es, ["transactions"])
+        sink = BulkWriter(es)
+    from_block = load_checkpoint(args.checkpoint)
+    if from_block is None:
+        from_block = args.from_block
+    try:
+        async with AsyncWeb3(WebSocketProvider(args.ws_url)) as w3:
+            tailer = ChainTailer(w3, default_registry(), sink, confirmations=args.confirmations,
+                                 queue_size=args.queue_size, index=args.index,
+                                 metrics_interval=args.metrics_interval, checkpoint_path=args.checkpoint,
+                                 checkpoint_blocks=args.checkpoint_blocks,
+                                 checkpoint_interval=args.checkpoint_interval)
+            await tailer.run(from_block)
+    finally:
+        sink.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Follow new blocks over WebSocket and index contract transactions")
+    parser.add_argument("--ws-url", default="ws://127.0.0.1:8545")
+    parser.add_argument("--es-url", default="http://localhost:9200")
+    parser.add_argument("--index", default="transactions")
+    parser.add_argument("--confirmations", type=int, default=6, help="blocks behind head before a block is indexed")
+    parser.add_argument("--queue-size", type=int, default=256, help="maximum blocks waiting to be indexed")
+    parser.add_argument("--from-block", type=int, help="first block to index (default: current head)")
+    parser.add_argument("--checkpoint", default="tailer_checkpoint.json")
+    parser.add_argument("--checkpoint-blocks", type=int, default=100,
+                        help="blocks between sink flushes and checkpoint writes")
+    parser.add_argument("--checkpoint-interval", type=float, default=5.0,
+                        help="seconds between sink flushes and checkpoint writes")
+    parser.add_argument("--spool", help="write documents to this spool directory; run ingest_spool.py drain to index them")
+    parser.add_argument("--metrics-interval", type=float, default=10.0, help="seconds between lag reports")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(tail(args))
+    except KeyboardInterrupt:
+        print("Tailer stopped.")
+
+
+if __name__ == "__main__":
+    main()
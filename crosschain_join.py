@@ -0,0 +1,254 @@
+import argparse
+import os
+import tempfile
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from elasticsearch import Elasticsearch
+
+from es_scan import iter_column_frames
+from tx_snapshot import SNAPSHOT_COLUMNS, iter_snapshot_frames
+from visualdetail import NODE_MAPPING
+from visualizer import node_mapping, request_loc_mapping
+
+# 조인에 쓰는 이더리움 트랜잭션 컬럼
+TRANSACTION_COLUMNS = [
+    ("timestamp", "timestamp", "datetime"),
+    ("function_name", ("function_name", "function_info.function_name"), "str"),
+    ("order_id", ("order_id", "function_info.parameters._orderId"), "int64"),
+    ("tx_hash", "tx_hash", "str"),
+    ("from", "from", "str"),
+    ("to", "to", "str"),
+    ("receipt_at_ms", "receipt_at_ms", "float64"),
+]
+FABRIC_COLUMNS = [column for column in SNAPSHOT_COLUMNS["hyperledgerfabric"] if column[0] != "doc_id"]
+
+# 역할마다 붙이는 Fabric 필드 (결과 컬럼은 from_name, to_email, ...)
+FABRIC_FIELDS = ["request_loc", "name", "address", "phone", "email"]
+
+# request_loc -> 역할 (MSP id와 위치 이름 둘 다, 매핑에 없으면 request_loc 그대로)
+REQUEST_LOC_ROLES = {msp: role for role, msp in request_loc_mapping.items()}
+REQUEST_LOC_ROLES.update(NODE_MAPPING)
+
+# 함수 이름 -> (from 역할, to 역할)
+STEP_ROLES = {function_name: edges[0] for function_name, edges in node_mapping.items()}
+
+# 결과 Parquet 스키마 (첫 청크에서 추론하면 예전 문서만 있는 청크의 빈 컬럼이 null 타입이 됨)
+_ARROW_TYPES = {"datetime": pa.timestamp("ms"), "str": pa.string(), "int64": pa.int64(), "float64": pa.float64()}
+JOIN_SCHEMA = pa.schema(
+    [(name, _ARROW_TYPES[dtype]) for name, _, dtype in TRANSACTION_COLUMNS]
+    + [("from_role", pa.string()), ("to_role", pa.string())]
+    + [(f"{side}_{field}", pa.string()) for side in ("from", "to") for field in FABRIC_FIELDS]
+)
+
+# Fabric 해시 인덱스 최대 행 수 (넘으면 정렬-병합 조인으로 전환)
+MAX_INDEX_ROWS = 1_000_000
+
+SPILL_BATCH_SIZE = 65536
+
+# run 파일을 다시 읽을 때 정수/문자열 컬럼 타입 유지 (order_id가 float로 바뀌지 않도록)
+_RUN_TYPES = {pa.int64(): pd.Int64Dtype(), pa.string(): pd.StringDtype()}
+
+
+# Fabric 문서 -> (order_id, role)별 한 행 (같은 키의 문서가 여럿이면 필드마다 처음으로 값이 있는 것)
+# order_id가 숫자가 아닌 문서는 이더리움 트랜잭션과 맞출 수 없으므로 버림
+def fabric_index(fabric):
+    order_id = pd.to_numeric(fabric["order_id"], errors="coerce")
+    request_loc = fabric["request_loc"].astype("string")
+    index = pd.DataFrame({
+        "order_id": order_id.astype("Int64"),
+        "role": request_loc.map(REQUEST_LOC_ROLES).fillna(request_loc).astype("string"),
+        **{field: fabric[field].astype("string") for field in FABRIC_FIELDS},
+    }).dropna(subset=["order_id", "role"])
+    return index.groupby(["order_id", "role"], sort=False, as_index=False).first()
+
+
+# 트랜잭션 -> 단계별 from/to 역할이 붙은 행 (order_id가 없거나 주문 흐름에 없는 함수는 버림)
+def transaction_steps(transactions):
+    function_name = transactions["function_name"].astype("string")
+    steps = transactions.assign(
+        function_name=function_name,
+        from_role=function_name.map({name: roles[0] for name, roles in STEP_ROLES.items()}).astype("string"),
+        to_role=function_name.map({name: roles[1] for name, roles in STEP_ROLES.items()}).astype("string"),
+    )
+    return steps[steps["order_id"].notna() & steps["from_role"].notna()]
+
+
+# 트랜잭션 단계와 Fabric 인덱스를 (order_id, from 역할) / (order_id, to 역할)로 두 번 해시 조인 (left join)
+def join_steps(steps, index):
+    joined = steps
+    for side in ("from", "to"):
+        side_index = index.rename(columns={"role": f"{side}_role",
+                                           **{field: f"{side}_{field}" for field in FABRIC_FIELDS}})
+        joined = joined.merge(side_index, on=["order_id", f"{side}_role"], how="left", sort=False)
+    return joined
+
+
+def _write_run(directory, prefix, number, frame, sort_columns):
+    path = os.path.join(directory, f"{prefix}-{number:05d}.parquet")
+    pq.write_table(pa.Table.from_pandas(frame.sort_values(sort_columns, kind="stable"), preserve_index=False), path)
+    return path
+
+
+# 정렬된 run 파일들을 key 순서로 병합해서 DataFrame 청크 생성
+# 각 청크에는 key 값이 같은 행이 모두 들어 있음 (청크 경계에서 주문이 나뉘지 않음)
+# - 아직 다 읽지 않은 run들의 버퍼 마지막 key 중 최솟값(bound)보다 작은 행만 내보냄
+#   -> 이후 배치에는 bound 이상의 key만 남아 있으므로 bound 미만 key는 이 청크에서 완결
+def merge_sorted_runs(paths, key, sort_columns, batch_size=SPILL_BATCH_SIZE):
+    readers = [pq.ParquetFile(path).iter_batches(batch_size=batch_size) for path in paths]
+    buffers = [None] * len(readers)
+    exhausted = [False] * len(readers)
+
+    def read_batch(i):
+        batch = next(readers[i], None)
+        if batch is None:
+            exhausted[i] = True
+            return None
+        return batch.to_pandas(types_mapper=_RUN_TYPES.get)
+
+    while True:
+        for i in range(len(readers)):
+            while (buffers[i] is None or buffers[i].empty) and not exhausted[i]:
+                buffers[i] = read_batch(i)
+        live = [i for i in range(len(readers)) if not exhausted[i]]
+        if not live:
+            remaining = [buffer for buffer in buffers if buffer is not None and not buffer.empty]
+            if remaining:
+                yield pd.concat(remaining, ignore_index=True).sort_values(sort_columns, kind="stable")
+            return
+
+        bound = min(buffers[i][key].iloc[-1] for i in live)
+        parts = []
+        for i, buffer in enumerate(buffers):
+            if buffer is None or buffer.empty:
+                continue
+            below = (buffer[key] < bound).to_numpy()
+            if below.any():
+                parts.append(buffer[below])
+                buffers[i] = buffer[~below]
+        if parts:
+            yield pd.concat(parts, ignore_index=True).sort_values(sort_columns, kind="stable")
+            continue
+        # 버퍼가 전부 bound와 같은 key면 그 run들을 한 배치씩 더 읽어 붙임
+        for i in live:
+            if buffers[i][key].iloc[-1] == bound:
+                batch = read_batch(i)
+                if batch is not None:
+                    buffers[i] = pd.concat([buffers[i], batch], ignore_index=True)
+
+
+# 정렬-병합 조인: 양쪽 run을 order_id 순서로 병합하면서 트랜잭션 청크의 주문 구간에 해당하는 Fabric 행만 들고 있음
+def _merge_join(transaction_runs, fabric_runs, batch_size):
+    fabric_chunks = merge_sorted_runs(fabric_runs, "order_id", ["order_id"], batch_size)
+    window = _empty_index()
+    fabric_done = False
+    for steps in merge_sorted_runs(transaction_runs, "order_id", ["order_id", "timestamp"], batch_size):
+        low, high = steps["order_id"].iloc[0], steps["order_id"].iloc[-1]
+        while not fabric_done and (window.empty or window["order_id"].iloc[-1] <= high):
+            chunk = next(fabric_chunks, None)
+            if chunk is None:
+                fabric_done = True
+            else:
+                window = chunk if window.empty else pd.concat([window, chunk], ignore_index=True)
+        window = window[window["order_id"] >= low]  # 트랜잭션이 없는 주문의 Fabric 행은 버림
+        current = (window["order_id"] <= high).to_numpy()
+        yield join_steps(steps, fabric_index_from_runs(window[current]))
+        window = window[~current]
+
+
+def _empty_index():
+    return pd.DataFrame({"order_id": pd.array([], dtype="Int64"), "role": pd.array([], dtype="string"),
+                         **{field: pd.array([], dtype="string") for field in FABRIC_FIELDS}})
+
+
+# spill한 Fabric run은 이미 fabric_index를 거친 행이라 같은 키만 다시 합침
+def fabric_index_from_runs(fabric):
+    fabric = fabric.astype({"order_id": "Int64", "role": "string", **{field: "string" for field in FABRIC_FIELDS}})
+    return fabric.groupby(["order_id", "role"], sort=False, as_index=False).first()
+
+
+# 이더리움 트랜잭션과 Fabric 데이터를 주문 단계별 한 행으로 조인해서 DataFrame 청크로 생성
+# 결과 컬럼: 트랜잭션 컬럼 + from_role / to_role + from_<Fabric 필드> / to_<Fabric 필드>
+# - 기본은 Fabric 쪽으로 (order_id, role) 해시 인덱스를 만들고 트랜잭션 청크를 흘려보내며 조인
+#   (메모리: Fabric 인덱스 + 트랜잭션 청크 하나)
+# - Fabric 인덱스가 max_index_rows를 넘으면 양쪽을 order_id로 정렬한 run 파일로 spill_dir에 내리고 정렬-병합 조인
+#   (메모리: run마다 배치 하나 + 주문 구간 하나, 결과는 order_id 순서)
+def cross_chain_join(transaction_frames, fabric_frames, max_index_rows=MAX_INDEX_ROWS, spill_dir=None,
+                     batch_size=SPILL_BATCH_SIZE):
+    chunks = []
+    rows = 0
+    spill = None
+    fabric_runs = []
+    for fabric in fabric_frames:
+        index = fabric_index(fabric)
+        if spill is None:
+            chunks.append(index)
+            rows += len(index)
+            if rows <= max_index_rows:
+                continue
+            spill = tempfile.TemporaryDirectory(prefix="crosschain-", dir=spill_dir)
+            for chunk in chunks:
+                fabric_runs.append(_write_run(spill.name, "fabric", len(fabric_runs), chunk, ["order_id"]))
+            chunks = None
+        elif not index.empty:
+            fabric_runs.append(_write_run(spill.name, "fabric", len(fabric_runs), index, ["order_id"]))
+
+    if spill is None:
+        index = fabric_index_from_runs(pd.concat(chunks, ignore_index=True)) if chunks else _empty_index()
+        for transactions in transaction_frames:
+            steps = transaction_steps(transactions)
+            if not steps.empty:
+                yield join_steps(steps, index)
+        return
+
+    with spill:
+        transaction_runs = []
+        for transactions in transaction_frames:
+            steps = transaction_steps(transactions)
+            if not steps.empty:
+                transaction_runs.append(_write_run(spill.name, "transactions", len(transaction_runs), steps,
+                                                   ["order_id", "timestamp"]))
+        if transaction_runs:
+            yield from _merge_join(transaction_runs, fabric_runs, batch_size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Join Ethereum transactions and Fabric patterns into one record per order step")
+    parser.add_argument("--output", default="crosschain.parquet")
+    parser.add_argument("--snapshot", metavar="DIR",
+                        help="read transactions and fabric data from a local snapshot (tx_snapshot.py) instead of Elasticsearch")
+    parser.add_argument("--es-url", default="http://localhost:9200")
+    parser.add_argument("--start", help="transactions at or after this timestamp")
+    parser.add_argument("--end", help="transactions before this timestamp")
+    parser.add_argument("--page-size", type=int, default=5000)
+    parser.add_argument("--max-index-rows", type=int, default=MAX_INDEX_ROWS,
+                        help="switch to an on-disk sort-merge join above this many fabric (order, role) rows")
+    parser.add_argument("--spill-dir", help="directory for sort-merge run files (default: system temp)")
+    args = parser.parse_args()
+
+    if args.snapshot:
+        transaction_frames = iter_snapshot_frames("transactions", args.snapshot,
+                                                  columns=[name for name, _, _ in TRANSACTION_COLUMNS],
+                                                  start=args.start, end=args.end, batch_size=args.page_size)
+        fabric_frames = iter_snapshot_frames("hyperledgerfabric", args.snapshot,
+                                             columns=[name for name, _, _ in FABRIC_COLUMNS],
+                                             batch_size=args.page_size)
+    else:
+        es = Elasticsearch(args.es_url)
+        transaction_frames = iter_column_frames(es, "transactions", TRANSACTION_COLUMNS, start=args.start,
+                                                end=args.end, page_size=args.page_size)
+        fabric_frames = iter_column_frames(es, "hyperledgerfabric", FABRIC_COLUMNS, time_field=None,
+                                           page_size=args.page_size)
+
+    rows = 0
+    with pq.ParquetWriter(args.output, JOIN_SCHEMA) as writer:
+        for chunk in cross_chain_join(transaction_frames, fabric_frames, max_index_rows=args.max_index_rows,
+                                      spill_dir=args.spill_dir):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=JOIN_SCHEMA, preserve_index=False))
+            rows += len(chunk)
+    print(f"Joined {rows} order steps into {args.output}")
+
+
+if __name__ == "__main__":
+    main()
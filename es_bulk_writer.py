@@ -0,0 +1,252 @@
+import atexit
+import json
+import queue
+import threading
+import time
+from collections import deque
+
+from elasticsearch import ApiError, ConnectionError, ConnectionTimeout
+
+# 재시도 대상 상태 코드 (Elasticsearch 과부하/일시적 장애)
+RETRYABLE_STATUS = {429, 502, 503, 504}
+
+
+# _bulk API 기반 버퍼링 Elasticsearch writer
+# - 문서 수 / 바이트 크기 / 경과 시간 중 하나라도 기준을 넘으면 flush
+# - 전송 대기 배치 큐가 가득 차면 index() 호출이 블록되어 생산자에 backpressure 전달
+# - 아이템 단위 실패는 on_failure 콜백과 failures 목록으로 보고
+# - close() 또는 인터프리터 종료 시 남은 문서를 모두 flush
+class BulkWriter:
+    def __init__(self, es, max_docs=500, max_bytes=5 * 1024 * 1024, flush_interval=1.0,
+                 max_pending_batches=4, max_retries=5, retry_backoff=0.5, on_failure=None):
+        self.es = es
+        self.max_docs = max_docs
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.on_failure = on_failure or self._print_failure
+
+        # 현재 채우는 중인 버퍼 (action/document 쌍을 미리 직렬화해서 보관)
+        self._buffer = []
+        self._buffer_bytes = 0
+        self._buffer_started = None
+        self._lock = threading.Lock()
+        # 전송 스레드가 flush_interval 만료로 큐를 거치지 않고 직접 보내는 배치 수 (flush()가 끝날 때까지 대기)
+        self._timer_sends = 0
+        self._timer_done = threading.Condition(self._lock)
+
+        # 전송 대기 배치 큐 (크기 제한 = backpressure)
+        self._batches = queue.Queue(maxsize=max_pending_batches)
+        self._queued_docs = 0
+        self._closed = False
+
+        # 통계 및 실패 기록
+        self.docs_indexed = 0
+        self.docs_failed = 0
+        self.retryable_failures = 0  # 재시도를 모두 소진한 일시적 오류 (나중에 다시 보내면 성공할 수 있음)
+        self.batches_sent = 0
+        self.bytes_sent = 0
+        self.failures = deque(maxlen=1000)
+
+        self._sender = threading.Thread(target=self._run_sender, name="es-bulk-writer", daemon=True)
+        self._sender.start()
+        atexit.register(self.close)
+
+    # 문서 하나를 버퍼에 추가 (es.index와 같은 인자 형태)
+    def index(self, index, document, id=None):
+        if self._closed:
+            raise RuntimeError("BulkWriter is closed")
+
+        action = {"index": {"_index": index}}
+        if id is not None:
+            action["index"]["_id"] = id
+        action_line = json.dumps(action).encode("utf-8")
+        document_line = json.dumps(document, default=str).encode("utf-8")
+
+        self._append((action_line, document_line, index, document))
+
+    # 문서 삭제 요청을 버퍼에 추가 (없는 문서 삭제는 실패로 보지 않음)
+    def delete(self, index, id):
+        if self._closed:
+            raise RuntimeError("BulkWriter is closed")
+
+        action_line = json.dumps({"delete": {"_index": index, "_id": id}}).encode("utf-8")
+        self._append((action_line, None, index, {"_id": id}))
+
+    def _append(self, entry):
+        action_line, document_line, _, _ = entry
+        batch = None
+        with self._lock:
+            if self._buffer_started is None:
+                self._buffer_started = time.monotonic()
+            self._buffer.append(entry)
+            self._buffer_bytes += len(action_line) + 1
+            if document_line is not None:
+                self._buffer_bytes += len(document_line) + 1
+            if len(self._buffer) >= self.max_docs or self._buffer_bytes >= self.max_bytes:
+                batch = self._take_buffer()
+
+        if batch:
+            # 큐가 가득 차 있으면 여기서 블록됨 (Elasticsearch가 느릴 때 생산 속도 제한)
+            self._enqueue(batch)
+
+    # 현재 버퍼를 전송 큐로 넘기고 전송이 끝날 때까지 대기
+    # (전송 스레드가 시간 만료로 이미 가져가서 보내는 중인 배치도 끝날 때까지 대기)
+    def flush(self):
+        with self._lock:
+            batch = self._take_buffer()
+        if batch:
+            self._enqueue(batch)
+        self._batches.join()
+        with self._timer_done:
+            self._timer_done.wait_for(lambda: self._timer_sends == 0)
+
+    # 남은 문서를 모두 전송하고 전송 스레드 종료
+    def close(self):
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        self._batches.put(None)
+        self._sender.join()
+        atexit.unregister(self.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # 전송 대기 중인 문서 수 (버퍼 + 큐)
+    def pending(self):
+        with self._lock:
+            return len(self._buffer) + self._queued_docs
+
+    def stats(self):
+        return {
+            "docs_indexed": self.docs_indexed,
+            "docs_failed": self.docs_failed,
+            "retryable_failures": self.retryable_failures,
+            "batches_sent": self.batches_sent,
+            "bytes_sent": self.bytes_sent,
+        }
+
+    def _enqueue(self, batch):
+        with self._lock:
+            self._queued_docs += len(batch)
+        self._batches.put(batch)
+
+    # lock을 잡은 상태에서 호출
+    def _take_buffer(self):
+        batch = self._buffer
+        self._buffer = []
+        self._buffer_bytes = 0
+        self._buffer_started = None
+        return batch
+
+    # 전송 스레드: 큐의 배치를 보내고, 대기 중 flush_interval이 지나면 버퍼를 비움
+    def _run_sender(self):
+        while True:
+            try:
+                batch = self._batches.get(timeout=self.flush_interval / 2)
+            except queue.Empty:
+                with self._lock:
+                    expired = (self._buffer_started is not None
+                               and time.monotonic() - self._buffer_started >= self.flush_interval)
+                    batch = self._take_buffer() if expired else None
+                    if batch:
+                        self._timer_sends += 1
+                        self._queued_docs += len(batch)
+                if batch:
+                    try:
+                        self._send(batch)
+                    finally:
+                        with self._timer_done:
+                            self._timer_sends -= 1
+                            self._queued_docs -= len(batch)
+                            self._timer_done.notify_all()
+                continue
+
+            if batch is None:
+                self._batches.task_done()
+                return
+            try:
+                self._send(batch)
+            finally:
+                with self._lock:
+                    self._queued_docs -= len(batch)
+                self._batches.task_done()
+
+    # 배치 전송 (429 등 일시적 오류 아이템만 지수 백오프로 재전송)
+    def _send(self, batch):
+        attempt = 0
+        while batch:
+            operations = []
+            for action_line, document_line, _, _ in batch:
+                operations.append(action_line)
+                if document_line is not None:
+                    operations.append(document_line)
+
+            try:
+                response = self.es.bulk(operations=operations)
+            except (ConnectionError, ConnectionTimeout) as e:
+                if attempt >= self.max_retries:
+                    self._fail_all(batch, str(e), retryable=True)
+                    return
+                self._backoff(attempt)
+                attempt += 1
+                continue
+            except ApiError as e:
+                if e.status_code in RETRYABLE_STATUS and attempt < self.max_retries:
+                    self._backoff(attempt)
+                    attempt += 1
+                    continue
+                self._fail_all(batch, str(e), retryable=e.status_code in RETRYABLE_STATUS)
+                return
+
+            self.batches_sent += 1
+            self.bytes_sent += sum(len(line) + 1 for line in operations)
+
+            if not response.get("errors"):
+                self.docs_indexed += len(batch)
+                return
+
+            # 아이템 단위 결과 확인
+            retry = []
+            for entry, item in zip(batch, response["items"]):
+                operation, result = next(iter(item.items()))
+                status = result.get("status", 500)
+                if status < 300 or (operation == "delete" and status == 404):
+                    self.docs_indexed += 1
+                elif status in RETRYABLE_STATUS and attempt < self.max_retries:
+                    retry.append(entry)
+                else:
+                    self._fail(entry, result.get("error", status), retryable=status in RETRYABLE_STATUS)
+
+            batch = retry
+            if batch:
+                self._backoff(attempt)
+                attempt += 1
+
+    def _backoff(self, attempt):
+        time.sleep(self.retry_backoff * (2 ** attempt))
+
+    def _fail_all(self, batch, error, retryable=False):
+        for entry in batch:
+            self._fail(entry, error, retryable)
+
+    def _fail(self, entry, error, retryable=False):
+        _, _, index, document = entry
+        self.docs_failed += 1
+        if retryable:
+            self.retryable_failures += 1
+        self.failures.append({"index": index, "document": document, "error": error, "retryable": retryable})
+        try:
+            self.on_failure(index, document, error)
+        except Exception as e:
+            print(f"BulkWriter on_failure callback error: {e}")
+
+    @staticmethod
+    def _print_failure(index, document, error):
+        print(f"Failed to index document into {index}: {error}")
@@ -0,0 +1,194 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+# datetime 컬럼의 결측값 (datetime64[ms]로 보면 NaT)
+_NAT = np.iinfo(np.int64).min
+
+
+# 한 컬럼을 타입별 numpy 버퍼에 누적 (용량이 차면 두 배로 늘림)
+# - "float64": 결측은 NaN
+# - "int64": 값 + 유효 여부 마스크 (pandas nullable Int64로 변환)
+# - "datetime": epoch ms를 int64로 보관 (datetime64[ms]로 변환)
+# - "category": 반복되는 문자열(주소, 함수 이름)을 int32 코드로 보관
+# - "str": 그 외 문자열 (object 배열)
+# - "json": dict/list 값 (함수 파라미터 등)을 JSON 문자열로 보관
+class ColumnBuffer:
+    def __init__(self, dtype, capacity=1024):
+        self.dtype = dtype
+        self.size = 0
+        if dtype == "float64":
+            self.values = np.empty(capacity, dtype=np.float64)
+        elif dtype in ("int64", "datetime"):
+            self.values = np.empty(capacity, dtype=np.int64)
+            self.valid = np.empty(capacity, dtype=bool)
+        elif dtype == "category":
+            self.values = np.empty(capacity, dtype=np.int32)
+            self.categories = {}
+        elif dtype in ("str", "json"):
+            self.values = np.empty(capacity, dtype=object)
+        else:
+            raise ValueError(f"Unsupported column type {dtype!r}")
+
+    def _grow(self):
+        capacity = len(self.values) * 2
+        self.values = np.resize(self.values, capacity)
+        if hasattr(self, "valid"):
+            self.valid = np.resize(self.valid, capacity)
+
+    def append(self, value):
+        if self.size == len(self.values):
+            self._grow()
+        i = self.size
+        if self.dtype == "float64":
+            self.values[i] = np.nan if value is None else float(value)
+        elif self.dtype == "int64":
+            self.valid[i] = value is not None
+            self.values[i] = 0 if value is None else int(value)
+        elif self.dtype == "datetime":
+            self.valid[i] = value is not None
+            self.values[i] = _NAT if value is None else int(float(value))
+        elif self.dtype == "category":
+            if value is None:
+                self.values[i] = -1
+            else:
+                self.values[i] = self.categories.setdefault(value, len(self.categories))
+        elif self.dtype == "json":
+            self.values[i] = None if value is None else json.dumps(value, sort_keys=True, default=str)
+        else:
+            self.values[i] = value
+        self.size += 1
+
+    def to_array(self):
+        values = self.values[:self.size]
+        if self.dtype == "int64":
+            return pd.arrays.IntegerArray(values.copy(), ~self.valid[:self.size])
+        if self.dtype == "datetime":
+            return values.view("datetime64[ms]")
+        if self.dtype == "category":
+            return pd.Categorical.from_codes(values, categories=list(self.categories))
+        return values
+
+
+# time_field 구간(start 이상, end 미만) 조건을 query에 추가
+def time_range_query(time_field="timestamp", start=None, end=None, query=None):
+    filters = [query] if query else []
+    if start is not None or end is not None:
+        time_range = {}
+        if start is not None:
+            time_range["gte"] = start
+        if end is not None:
+            time_range["lt"] = end
+        filters.append({"range": {time_field: time_range}})
+    if not filters:
+        return None
+    if len(filters) == 1:
+        return filters[0]
+    return {"bool": {"filter": filters}}
+
+
+# point-in-time + search_after로 정렬된 페이지를 차례로 생성
+# (from/size나 단일 search의 10,000건 제한 없이 전체 결과를 일관된 스냅샷으로 읽음)
+# sort_field가 None이면 문서 순서(_shard_doc)로만 정렬 (timestamp가 없는 인덱스)
+def iter_hit_pages(es, index, query=None, sort_field="timestamp", source=None, docvalue_fields=None,
+                   page_size=5000, keep_alive="2m"):
+    pit_id = es.open_point_in_time(index=index, keep_alive=keep_alive)["id"]
+    search_after = None
+    try:
+        while True:
+            response = es.search(
+                pit={"id": pit_id, "keep_alive": keep_alive},
+                size=page_size,
+                sort=([{sort_field: "asc"}] if sort_field else []) + [{"_shard_doc": "asc"}],
+                search_after=search_after,
+                query=query,
+                source=source if source is not None else False,
+                docvalue_fields=docvalue_fields,
+                track_total_hits=False,
+            )
+            pit_id = response.get("pit_id", pit_id)
+            hits = response["hits"]["hits"]
+            if not hits:
+                return
+            yield hits
+            if len(hits) < page_size:
+                return
+            search_after = hits[-1]["sort"]
+    finally:
+        es.close_point_in_time(id=pit_id)
+
+
+def _get_path(source, path):
+    # 필드 경로 후보 중 처음으로 값이 있는 것 (예: 최상위 order_id가 없는 예전 문서는 파라미터의 _orderId)
+    if isinstance(path, tuple):
+        for candidate in path:
+            value = _get_path(source, candidate)
+            if value is not None:
+                return value
+        return None
+    value = source
+    for key in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def _column_pages(es, index, columns, start, end, time_field, query, page_size, keep_alive):
+    source_paths = []
+    for _, path, dtype in columns:
+        if dtype != "datetime" and path != "_id":
+            source_paths.extend(path if isinstance(path, tuple) else [path])
+    docvalue_paths = [path for _, path, dtype in columns if dtype == "datetime"]
+    return iter_hit_pages(
+        es, index,
+        query=time_range_query(time_field, start, end, query),
+        sort_field=time_field,
+        source=source_paths or False,
+        docvalue_fields=[{"field": path, "format": "epoch_millis"} for path in docvalue_paths] or None,
+        page_size=page_size,
+        keep_alive=keep_alive,
+    )
+
+
+def _append_hits(buffers, columns, hits):
+    for hit in hits:
+        source = hit.get("_source", {})
+        fields = hit.get("fields", {})
+        for buffer, (_, path, dtype) in zip(buffers, columns):
+            if path == "_id":
+                buffer.append(hit["_id"])
+            elif dtype == "datetime":
+                value = fields.get(path)
+                buffer.append(value[0] if value else None)
+            else:
+                buffer.append(_get_path(source, path))
+
+
+def _to_frame(buffers, columns):
+    return pd.DataFrame({name: buffer.to_array() for buffer, (name, _, _) in zip(buffers, columns)})
+
+
+# 선택한 컬럼만 페이지 단위로 타입별 버퍼에 바로 누적해서 DataFrame 생성
+# columns: [(컬럼 이름, 필드 경로, 타입), ...]
+# - 필드 경로는 튜플로 여러 후보를 줄 수 있음 (처음으로 값이 있는 경로 사용)
+# - 필드 경로 "_id"는 문서 id
+# - datetime 컬럼은 docvalue(epoch_millis)로 받고, 나머지는 _source에서 필드 경로로 꺼냄
+# time_field가 None이면 시간 구간 없이 인덱스 전체를 문서 순서로 읽음
+def fetch_columns(es, index, columns, start=None, end=None, time_field="timestamp", query=None,
+                  page_size=5000, keep_alive="2m"):
+    buffers = [ColumnBuffer(dtype) for _, _, dtype in columns]
+    for hits in _column_pages(es, index, columns, start, end, time_field, query, page_size, keep_alive):
+        _append_hits(buffers, columns, hits)
+    return _to_frame(buffers, columns)
+
+
+# fetch_columns와 같지만 페이지마다 DataFrame을 하나씩 생성
+# (전체 결과를 메모리에 모으지 않고 페이지 단위로 집계할 때)
+def iter_column_frames(es, index, columns, start=None, end=None, time_field="timestamp", query=None,
+                       page_size=5000, keep_alive="2m"):
+    for hits in _column_pages(es, index, columns, start, end, time_field, query, page_size, keep_alive):
+        buffers = [ColumnBuffer(dtype, capacity=max(len(hits), 1)) for _, _, dtype in columns]
+        _append_hits(buffers, columns, hits)
+        yield _to_frame(buffers, columns)
@@ -0,0 +1,128 @@
+import argparse
+import json
+
+from elasticsearch import Elasticsearch
+
+# 동적 매핑에서 문자열은 text + keyword로 이중 저장되므로, 명시하지 않은 문자열 필드도 keyword로만 저장
+_STRINGS_AS_KEYWORD = [{"strings_as_keyword": {"match_mapping_type": "string", "mapping": {"type": "keyword"}}}]
+
+# 컨트랙트 함수 인자 (uint256 금액은 long 범위를 넘을 수 있으므로 unsigned_long)
+_FUNCTION_PARAMETERS = {
+    "properties": {
+        "_orderId": {"type": "long"},
+        "_seller": {"type": "keyword"},
+        "_manufacturer": {"type": "keyword"},
+        "_deliveryAgency": {"type": "keyword"},
+        "_productName": {"type": "keyword"},
+        "_quantity": {"type": "long"},
+        "_price": {"type": "unsigned_long"},
+    }
+}
+
+# 인덱스 이름 -> 인덱스 템플릿 (새로 만들어지는 인덱스에 적용)
+INDEX_TEMPLATES = {
+    "transactions": {
+        "index_patterns": ["transactions", "transactions-*"],
+        "mappings": {
+            "dynamic_templates": _STRINGS_AS_KEYWORD,
+            "properties": {
+                # 분석에서 바로 컬럼으로 읽는 평탄화 필드
+                "order_id": {"type": "long"},
+                "function_name": {"type": "keyword"},
+                "block_number": {"type": "long"},
+                "tx_hash": {"type": "keyword"},
+                "timestamp": {"type": "date"},
+                "from": {"type": "keyword"},
+                "to": {"type": "keyword"},
+                "sc_address": {"type": "keyword"},
+                # 고해상도 시각 (epoch ms 숫자, 단조 시계 기준) / 전송 -> 영수증 지연
+                "block_timestamp_ms": {"type": "long"},
+                "submitted_at_ms": {"type": "long"},
+                "receipt_at_ms": {"type": "long"},
+                "indexed_at_ms": {"type": "long"},
+                "confirm_latency_ms": {"type": "double"},
+                "function_info": {
+                    "properties": {
+                        "function_name": {"type": "keyword"},
+                        "parameters": _FUNCTION_PARAMETERS,
+                    }
+                },
+            },
+        },
+    },
+    "transaction_events": {
+        "index_patterns": ["transaction_events", "transaction_events-*"],
+        "mappings": {
+            "dynamic_templates": _STRINGS_AS_KEYWORD,
+            "properties": {
+                "event_name": {"type": "keyword"},
+                "function_name": {"type": "keyword"},
+                "sc_address": {"type": "keyword"},
+                "order_id": {"type": "long"},
+                "block_number": {"type": "long"},
+                "tx_hash": {"type": "keyword"},
+                "log_index": {"type": "integer"},
+                "timestamp": {"type": "date"},
+                "parameters": {
+                    "properties": {
+                        "orderId": {"type": "long"},
+                        "customer": {"type": "keyword"},
+                        "seller": {"type": "keyword"},
+                        "manufacturer": {"type": "keyword"},
+                        "deliveryAgency": {"type": "keyword"},
+                    }
+                },
+            },
+        },
+    },
+    "hyperledgerfabric": {
+        "index_patterns": ["hyperledgerfabric", "hyperledgerfabric-*"],
+        "mappings": {
+            "dynamic_templates": _STRINGS_AS_KEYWORD,
+            "properties": {
+                "order_id": {"type": "keyword"},
+                "request_loc": {"type": "keyword"},
+            },
+        },
+    },
+}
+
+
+def _put_template_requests(names=None):
+    for name in names or INDEX_TEMPLATES:
+        template = INDEX_TEMPLATES[name]
+        yield {
+            "name": name,
+            "index_patterns": template["index_patterns"],
+            "template": {"mappings": template["mappings"]},
+            "priority": 100,
+        }
+
+
+# 인덱스 템플릿 등록 (이미 있으면 덮어씀, 기존 인덱스의 매핑은 바뀌지 않으므로 새 인덱스부터 적용)
+def ensure_index_templates(es, names=None):
+    for request in _put_template_requests(names):
+        es.indices.put_index_template(**request)
+
+
+# AsyncElasticsearch용
+async def ensure_index_templates_async(es, names=None):
+    for request in _put_template_requests(names):
+        await es.indices.put_index_template(**request)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Install index templates with explicit mappings")
+    parser.add_argument("--es-url", default="http://localhost:9200")
+    parser.add_argument("--print", action="store_true", help="print the templates instead of installing them")
+    args = parser.parse_args()
+
+    if args.print:
+        print(json.dumps(INDEX_TEMPLATES, indent=2))
+        return
+    ensure_index_templates(Elasticsearch(args.es_url))
+    print(f"Installed index templates: {', '.join(INDEX_TEMPLATES)}")
+
+
+if __name__ == "__main__":
+    main()
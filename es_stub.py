@@ -0,0 +1,164 @@
+import itertools
+from datetime import datetime, timezone
+
+
+# 테스트용 프로세스 내 Elasticsearch 대역
+# QueryService / es_scan / trace_fetch가 쓰는 만큼만 구현
+# - open_point_in_time / close_point_in_time: PIT를 열 때 인덱스 문서 목록을 복사해 두고 그 시점 기준으로 검색
+# - search: query(match_all, term, terms, range, exists, bool), sort + search_after, _source 필드 선택,
+#           docvalue_fields(epoch_millis), track_total_hits, max 집계
+# - count
+# 날짜 필드는 ISO 문자열 또는 epoch ms 숫자로 저장 (now-1d 같은 날짜 계산식은 지원하지 않음)
+# 지원하지 않는 query / 집계는 ValueError (Elasticsearch의 400 응답에 해당)
+DATE_FIELDS = {"timestamp"}
+
+
+def _get_path(source, path):
+    value = source
+    for key in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def _epoch_ms(value):
+    if isinstance(value, (int, float)):
+        return int(value)
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp() * 1000)
+
+
+def _sort_value(source, field):
+    value = _get_path(source, field)
+    if value is not None and field in DATE_FIELDS:
+        return _epoch_ms(value)
+    return value
+
+
+def _matches(query, source):
+    if not query:
+        return True
+    (kind, body), = query.items()
+    if kind == "match_all":
+        return True
+    if kind == "bool":
+        should = body.get("should", [])
+        return (all(_matches(clause, source) for clause in body.get("filter", []) + body.get("must", []))
+                and not any(_matches(clause, source) for clause in body.get("must_not", []))
+                and (not should or sum(_matches(clause, source) for clause in should)
+                     >= body.get("minimum_should_match", 1)))
+    if kind == "term":
+        (field, value), = body.items()
+        if isinstance(value, dict):
+            value = value["value"]
+        return str(_get_path(source, field)) == str(value)
+    if kind == "terms":
+        (field, values), = body.items()
+        return str(_get_path(source, field)) in {str(value) for value in values}
+    if kind == "exists":
+        return _get_path(source, body["field"]) is not None
+    if kind == "range":
+        (field, bounds), = body.items()
+        value = _sort_value(source, field)
+        if value is None:
+            return False
+        convert = _epoch_ms if field in DATE_FIELDS else float
+        return all({"gte": value >= bound, "gt": value > bound, "lte": value <= bound, "lt": value < bound}[op]
+                   for op, bound in ((op, convert(bound)) for op, bound in bounds.items() if op != "format"))
+    raise ValueError(f"InMemoryElasticsearch does not support {kind!r} queries "
+                     f"(supported: match_all, term, terms, range, exists, bool)")
+
+
+def _select_source(source, paths):
+    selected = {}
+    for path in paths:
+        value = _get_path(source, path)
+        if value is None:
+            continue
+        target = selected
+        *parents, key = path.split(".")
+        for parent in parents:
+            target = target.setdefault(parent, {})
+        target[key] = value
+    return selected
+
+
+class InMemoryElasticsearch:
+    def __init__(self):
+        self.indices_data = {}  # 인덱스 -> {문서 id: _source}
+        self.requests = []  # 호출한 API 이름 (테스트에서 캐시가 Elasticsearch까지 갔는지 확인용)
+        self._pits = {}
+        self._pit_ids = itertools.count(1)
+        self._doc_ids = itertools.count(1)
+
+    def add(self, index, document, id=None):
+        doc_id = str(id) if id is not None else f"doc-{next(self._doc_ids)}"
+        self.indices_data.setdefault(index, {})[doc_id] = document
+        return doc_id
+
+    def open_point_in_time(self, index, keep_alive=None):
+        self.requests.append("open_point_in_time")
+        pit_id = f"pit-{next(self._pit_ids)}"
+        self._pits[pit_id] = (index, list(self.indices_data.get(index, {}).items()))
+        return {"id": pit_id}
+
+    def close_point_in_time(self, id):
+        self.requests.append("close_point_in_time")
+        self._pits.pop(id, None)
+        return {"succeeded": True}
+
+    def count(self, index, query=None):
+        self.requests.append("count")
+        return {"count": sum(_matches(query, source) for source in self.indices_data.get(index, {}).values())}
+
+    def search(self, index=None, pit=None, query=None, size=10, sort=None, search_after=None, source=None,
+               docvalue_fields=None, track_total_hits=None, aggs=None, **kwargs):
+        self.requests.append("search")
+        if pit is not None:
+            index, documents = self._pits[pit["id"]]
+        else:
+            documents = list(self.indices_data.get(index, {}).items())
+        documents = [(doc_id, document) for doc_id, document in documents if _matches(query, document)]
+
+        hits = []
+        for position, (doc_id, document) in enumerate(documents):
+            sort_values = []
+            for clause in sort or []:
+                (field, _), = clause.items()
+                sort_values.append(position if field == "_shard_doc" else _sort_value(document, field))
+            hits.append((sort_values, doc_id, document))
+        hits.sort(key=lambda hit: hit[0])
+        if search_after is not None:
+            hits = [hit for hit in hits if hit[0] > list(search_after)]
+
+        response_hits = []
+        for sort_values, doc_id, document in hits[:size]:
+            hit = {"_index": index, "_id": doc_id, "sort": sort_values}
+            if source is None or source is True:
+                hit["_source"] = document
+            elif source is not False:
+                hit["_source"] = _select_source(document, source)
+            if docvalue_fields:
+                hit["fields"] = {spec["field"]: [str(_epoch_ms(_get_path(document, spec["field"])))]
+                                 for spec in docvalue_fields if _get_path(document, spec["field"]) is not None}
+            response_hits.append(hit)
+
+        response = {"hits": {"hits": response_hits}}
+        if track_total_hits:
+            response["hits"]["total"] = {"value": len(documents), "relation": "eq"}
+        if pit is not None:
+            response["pit_id"] = pit["id"]
+        if aggs:
+            response["aggregations"] = {}
+            for name, aggregation in aggs.items():
+                (kind, body), = aggregation.items()
+                if kind != "max":
+                    raise ValueError(f"InMemoryElasticsearch does not support {kind!r} aggregations "
+                                     f"(supported: max)")
+                values = [_sort_value(document, body["field"]) for _, document in documents]
+                values = [value for value in values if value is not None]
+                response["aggregations"][name] = {"value": max(values) if values else None}
+        return response
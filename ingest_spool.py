@@ -0,0 +1,403 @@
+import argparse
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+
+from elasticsearch import Elasticsearch
+
+from es_bulk_writer import BulkWriter
+from es_schema import INDEX_TEMPLATES, ensure_index_templates
+
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".ndjson"
+CHECKPOINT_FILE = "drain_checkpoint.json"
+DEAD_LETTER_FILE = "dead_letter.ndjson"
+
+
+def _segment_path(directory, number):
+    return os.path.join(directory, f"{SEGMENT_PREFIX}{number:012d}{SEGMENT_SUFFIX}")
+
+
+# spool 디렉터리의 세그먼트 번호 (오름차순)
+def list_segments(directory):
+    numbers = []
+    for name in os.listdir(directory):
+        if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+            numbers.append(int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]))
+    return sorted(numbers)
+
+
+def load_drain_checkpoint(directory):
+    path = os.path.join(directory, CHECKPOINT_FILE)
+    if os.path.exists(path):
+        with open(path) as f:
+            checkpoint = json.load(f)
+        return checkpoint["segment"], checkpoint["offset"]
+    return 0, 0
+
+
+def save_drain_checkpoint(directory, segment, offset):
+    path = os.path.join(directory, CHECKPOINT_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"segment": segment, "offset": offset, "updated_at": time.time()}, f)
+    os.replace(tmp_path, path)
+
+
+# 아직 drain되지 않은 spool 크기 (체크포인트 이후 바이트 수, 세그먼트 수)
+def spool_status(directory):
+    checkpoint_segment, checkpoint_offset = load_drain_checkpoint(directory)
+    depth_bytes = 0
+    segments = 0
+    for number in list_segments(directory):
+        if number < checkpoint_segment:
+            continue
+        size = os.path.getsize(_segment_path(directory, number))
+        if number == checkpoint_segment:
+            size -= checkpoint_offset
+        depth_bytes += max(size, 0)
+        segments += 1
+    return {
+        "spool_depth_bytes": depth_bytes,
+        "spool_segments": segments,
+        "checkpoint_segment": checkpoint_segment,
+        "checkpoint_offset": checkpoint_offset,
+    }
+
+
+# 디코딩 결과를 로컬 디스크에 먼저 기록하는 append-only spool writer
+# - BulkWriter와 같은 index/delete/flush/close 인터페이스 (기존 sink 자리에 그대로 사용)
+# - 한 줄에 레코드 하나 (NDJSON), 세그먼트가 segment_bytes를 넘으면 새 세그먼트로 교체
+# - fsync는 fsync_docs건마다, 또는 fsync_interval초마다 모아서 수행
+# - Elasticsearch 상태와 무관하게 디스크 쓰기만 하므로 체인 조회 쪽이 멈추지 않음
+class SpoolWriter:
+    def __init__(self, directory, segment_bytes=64 * 1024 * 1024, fsync_docs=500, fsync_interval=1.0):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync_docs = fsync_docs
+        self.fsync_interval = fsync_interval
+        os.makedirs(directory, exist_ok=True)
+
+        # 재시작하면 항상 새 세그먼트에 기록 (이전 세그먼트는 완료된 것으로 보고 drain)
+        segments = list_segments(directory)
+        self._segment = segments[-1] + 1 if segments else 1
+        self._file = open(_segment_path(directory, self._segment), "ab")
+        self._segment_size = 0
+        self._unsynced = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self.records_written = 0
+        self.bytes_written = 0
+        self.segments_rotated = 0
+        self.fsyncs = 0
+
+        self._stop = threading.Event()
+        self._syncer = threading.Thread(target=self._run_syncer, name="spool-fsync", daemon=True)
+        self._syncer.start()
+
+    # id가 없으면 spool에서 부여 (drain을 다시 해도 같은 문서로 저장되게)
+    def index(self, index, document, id=None):
+        record = {"op": "index", "index": index, "id": id or uuid.uuid4().hex, "document": document}
+        self._append(json.dumps(record, default=str).encode("utf-8") + b"\n")
+
+    def delete(self, index, id):
+        self._append(json.dumps({"op": "delete", "index": index, "id": id}).encode("utf-8") + b"\n")
+
+    def _append(self, line):
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("SpoolWriter is closed")
+            self._file.write(line)
+            self._segment_size += len(line)
+            self._unsynced += 1
+            self.records_written += 1
+            self.bytes_written += len(line)
+            if self._segment_size >= self.segment_bytes:
+                self._rotate()
+            elif self._unsynced >= self.fsync_docs:
+                self._sync()
+
+    # lock을 잡은 상태에서 호출
+    def _sync(self):
+        if self._unsynced == 0:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self.fsyncs += 1
+
+    # lock을 잡은 상태에서 호출
+    def _rotate(self):
+        self._sync()
+        self._file.close()
+        self._segment += 1
+        self._file = open(_segment_path(self.directory, self._segment), "ab")
+        self._segment_size = 0
+        self.segments_rotated += 1
+
+    def _run_syncer(self):
+        while not self._stop.wait(self.fsync_interval):
+            with self._lock:
+                if not self._closed:
+                    self._sync()
+
+    # 기록한 레코드를 디스크에 반영 (fsync)
+    def flush(self):
+        with self._lock:
+            self._sync()
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._sync()
+            self._file.close()
+            self._closed = True
+        self._stop.set()
+        self._syncer.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def stats(self):
+        stats = {
+            "records_written": self.records_written,
+            "bytes_written": self.bytes_written,
+            "segments_rotated": self.segments_rotated,
+            "fsyncs": self.fsyncs,
+        }
+        stats.update(spool_status(self.directory))
+        return stats
+
+
+# 다시 보내면 성공할 수 있는 drain 실패 (체크포인트를 옮기지 않음)
+class RetryableDrainError(Exception):
+    pass
+
+
+# spool 세그먼트를 순서대로 읽어서 BulkWriter로 Elasticsearch에 재생하는 drainer
+# - 배치가 Elasticsearch에 반영된 뒤에만 (세그먼트, 오프셋) 체크포인트를 저장
+# - 일시적 오류(연결 실패, 429/5xx 재시도 소진)면 체크포인트를 옮기지 않고 대기 후 같은 배치를 다시 보냄
+# - 매핑 오류처럼 다시 보내도 실패할 문서는 dead letter 파일에 남기고 진행
+# - 다 읽은 세그먼트는 뒤에 새 세그먼트가 있을 때 (writer가 더 쓰지 않을 때) 삭제
+class SpoolDrainer:
+    # index_templates: 첫 drain 전에 설치할 인덱스 템플릿 이름
+    # (Elasticsearch에 처음 연결될 때 설치하고, 설치 전에는 spool을 보내지 않음 -> 생산자는 Elasticsearch 상태와 무관)
+    def __init__(self, directory, es, batch_size=500, poll_interval=0.5, retry_delay=1.0, max_retry_delay=60.0,
+                 rate_window=60.0, index_templates=()):
+        self.directory = directory
+        self.es = es
+        self.index_templates = list(index_templates)
+        self._templates_installed = not self.index_templates
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.rate_window = rate_window
+        os.makedirs(directory, exist_ok=True)
+
+        self._batch_failures = []
+        self.writer = BulkWriter(es, max_docs=batch_size, on_failure=self._collect_failure)
+
+        self._stop = threading.Event()
+        self._thread = None
+        self._drained = deque()  # (시각, 레코드 수), drain 속도 계산용
+        self.records_drained = 0
+        self.batches_retried = 0
+        self.dead_lettered = 0
+        self.segments_deleted = 0
+        self.truncated_tails = 0
+
+    def _collect_failure(self, index, document, error):
+        self._batch_failures.append({"index": index, "document": document, "error": error})
+
+    # stop()이 호출될 때까지 drain (exit_when_empty면 spool이 비었을 때 종료)
+    def run(self, exit_when_empty=False):
+        delay = self.retry_delay
+        while not self._stop.is_set():
+            try:
+                self._install_templates()
+                drained = self.drain_once()
+            except RetryableDrainError as e:
+                self.batches_retried += 1
+                print(f"Spool drain failed ({e}); retrying in {delay:.1f}s")
+                self._stop.wait(delay)
+                delay = min(delay * 2, self.max_retry_delay)
+                continue
+            delay = self.retry_delay
+            if drained == 0:
+                if exit_when_empty and spool_status(self.directory)["spool_depth_bytes"] == 0:
+                    return
+                self._stop.wait(self.poll_interval)
+
+    def _install_templates(self):
+        if self._templates_installed:
+            return
+        try:
+            ensure_index_templates(self.es, self.index_templates)
+        except Exception as e:
+            raise RetryableDrainError(f"could not install index templates: {e}")
+        self._templates_installed = True
+
+    # 백그라운드 스레드에서 run()
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name="spool-drainer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    # spool이 빌 때까지 대기 (timeout이 지나면 False)
+    def wait_empty(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while spool_status(self.directory)["spool_depth_bytes"] > 0:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(self.poll_interval)
+        return True
+
+    def close(self):
+        self.stop()
+        if self._thread is not None:
+            self._thread.join()
+        self.writer.close()
+
+    # 배치 하나를 처리하고 처리한 레코드 수 반환
+    def drain_once(self):
+        checkpoint_segment, offset = load_drain_checkpoint(self.directory)
+        segments = []
+        for number in list_segments(self.directory):
+            if number >= checkpoint_segment:
+                segments.append(number)
+            else:
+                # 체크포인트 저장 후 삭제 전에 중단된 세그먼트
+                os.remove(_segment_path(self.directory, number))
+        if not segments:
+            return 0
+        segment = segments[0]
+        if segment != checkpoint_segment:
+            offset = 0
+        has_newer = len(segments) > 1
+
+        records, next_offset, size = self._read_records(segment, offset)
+        if not records:
+            if has_newer:
+                # writer가 넘어간 세그먼트: 끝에 남은 불완전한 줄은 기록 도중 중단된 것
+                if size > offset:
+                    self.truncated_tails += 1
+                    print(f"Dropping {size - offset} bytes of incomplete record at the end of segment {segment}")
+                save_drain_checkpoint(self.directory, segments[1], 0)
+                os.remove(_segment_path(self.directory, segment))
+                self.segments_deleted += 1
+            return 0
+
+        self._send(records)
+        save_drain_checkpoint(self.directory, segment, next_offset)
+        self._record_rate(len(records))
+        return len(records)
+
+    # offset부터 완전한 줄(개행으로 끝나는 줄)만 batch_size개까지 읽음
+    def _read_records(self, segment, offset):
+        path = _segment_path(self.directory, segment)
+        records = []
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            f.seek(offset)
+            while len(records) < self.batch_size:
+                line = f.readline()
+                if not line.endswith(b"\n"):
+                    break
+                offset += len(line)
+                records.append(json.loads(line))
+        return records, offset, size
+
+    def _send(self, records):
+        self._batch_failures = []
+        retryable_before = self.writer.retryable_failures
+        for record in records:
+            if record["op"] == "delete":
+                self.writer.delete(index=record["index"], id=record["id"])
+            else:
+                self.writer.index(index=record["index"], document=record["document"], id=record["id"])
+        self.writer.flush()
+
+        # 문서 id가 고정되어 있으므로 배치 전체를 다시 보내도 중복 저장되지 않음
+        if self.writer.retryable_failures > retryable_before:
+            raise RetryableDrainError(self._batch_failures[-1]["error"] if self._batch_failures else "bulk failure")
+
+        if self._batch_failures:
+            with open(os.path.join(self.directory, DEAD_LETTER_FILE), "a") as f:
+                for failure in self._batch_failures:
+                    f.write(json.dumps(failure, default=str) + "\n")
+            self.dead_lettered += len(self._batch_failures)
+
+    def _record_rate(self, count):
+        now = time.monotonic()
+        self._drained.append((now, count))
+        self.records_drained += count
+        while self._drained and now - self._drained[0][0] > self.rate_window:
+            self._drained.popleft()
+
+    # 최근 rate_window초 동안의 초당 drain 레코드 수
+    def drain_rate(self):
+        now = time.monotonic()
+        count = sum(c for t, c in self._drained if now - t <= self.rate_window)
+        return count / self.rate_window
+
+    def metrics(self):
+        metrics = spool_status(self.directory)
+        metrics.update({
+            "records_drained": self.records_drained,
+            "drain_rate_per_sec": self.drain_rate(),
+            "batches_retried": self.batches_retried,
+            "dead_lettered": self.dead_lettered,
+            "segments_deleted": self.segments_deleted,
+            "truncated_tails": self.truncated_tails,
+        })
+        return metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay the on-disk ingest spool into Elasticsearch")
+    parser.add_argument("command", choices=["drain", "status"])
+    parser.add_argument("--spool-dir", default="ingest_spool")
+    parser.add_argument("--es-url", default="http://localhost:9200")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--once", action="store_true", help="exit when the spool is empty instead of following it")
+    parser.add_argument("--metrics-interval", type=float, default=10.0, help="seconds between drain reports")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        print(json.dumps(spool_status(args.spool_dir), indent=2))
+        return
+
+    es = Elasticsearch(args.es_url)
+    drainer = SpoolDrainer(args.spool_dir, es, batch_size=args.batch_size, index_templates=INDEX_TEMPLATES)
+    stop_reporting = threading.Event()
+
+    def report():
+        while not stop_reporting.wait(args.metrics_interval):
+            print(f"Spool drain metrics: {json.dumps(drainer.metrics())}")
+
+    threading.Thread(target=report, daemon=True).start()
+    try:
+        drainer.run(exit_when_empty=args.once)
+    except KeyboardInterrupt:
+        print("Drainer stopped.")
+    finally:
+        stop_reporting.set()
+        drainer.close()
+    print(json.dumps(drainer.metrics(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,122 +1,271 @@
+import argparse
+import os
 from elasticsearch import Elasticsearch
 import pandas as pd
 import numpy as np
-from sklearn.cluster import KMeans
-from sklearn.preprocessing import StandardScaler
-from sklearn.ensemble import IsolationForest
+import matplotlib
+matplotlib.use("Agg")  # 화면 없이 파일로만 저장
 import matplotlib.pyplot as plt
-from matplotlib.colors import ListedColormap
-import matplotlib.cm as cm
+from es_scan import fetch_columns
+from anomaly_model import HYPERPARAMETERS, IncrementalAnomalyModel, fit_models, score_models, threshold_to_ms
+from model_store import ModelStore
+from order_latency import latency_columns, order_feature_table, step_latencies
+from partitioned_detect import detect_partitioned
+from tx_snapshot import load_snapshot
 
 # 1. Elasticsearch 연결 설정
 es = Elasticsearch("http://localhost:9200")  # Elasticsearch 서버 주소
 
 # 2. Elasticsearch에서 데이터 가져오기
-def fetch_data_from_elasticsearch(index_name, size=10000):
-    query = {
-        "size": size,
-        "sort": [{"timestamp": {"order": "asc"}}],  # timestamp 기준 정렬
-        "_source": ["timestamp", "from", "to", "function_info"]  # 필요한 필드만 선택
-    }
-    response = es.search(index=index_name, body=query)
-    hits = response['hits']['hits']
-    data = [hit["_source"] for hit in hits]  # '_source'에서 데이터 추출
-    return pd.DataFrame(data)
-
-# 트랜잭션 데이터 가져오기
-index_name = "transactions"
-transactions = fetch_data_from_elasticsearch(index_name)
+# 가져올 컬럼: (컬럼 이름, 필드 경로, 타입) - ingest 시 최상위로 올려 저장한 필드를 사용
+# (최상위 필드가 없는 예전 문서는 function_info 아래 값으로 대체)
+TRANSACTION_COLUMNS = [
+    ("timestamp", "timestamp", "datetime"),
+    ("from", "from", "category"),
+    ("to", "to", "category"),
+    ("sc_address", "sc_address", "category"),
+    ("function_name", ("function_name", "function_info.function_name"), "category"),
+    ("order_id", ("order_id", "function_info.parameters._orderId"), "int64"),
+    ("tx_hash", "tx_hash", "str"),
+    ("receipt_at_ms", "receipt_at_ms", "float64"),  # 영수증 수신 시각 (있으면 단계 지연을 ms 단위로 계산)
+]
+
+# point-in-time + search_after로 timestamp 순 페이지를 끝까지 읽어서 컬럼 버퍼에 바로 누적
+# (10,000건 제한 없음, 필요한 컬럼만 메모리에 유지)
+def fetch_data_from_elasticsearch(index_name, start=None, end=None, page_size=5000):
+    return fetch_columns(es, index_name, TRANSACTION_COLUMNS, start=start, end=end, page_size=page_size)
+
+# 로컬 스냅샷(tx_snapshot.py refresh)에서 같은 컬럼 읽기 (Elasticsearch 조회 없음)
+def fetch_data_from_snapshot(snapshot_dir, index_name, start=None, end=None):
+    transactions = load_snapshot(index_name, snapshot_dir, columns=[name for name, _, _ in TRANSACTION_COLUMNS],
+                                 start=start, end=end)
+    for name, _, dtype in TRANSACTION_COLUMNS:
+        if dtype == "category":
+            transactions[name] = transactions[name].astype("category")
+    transactions['order_id'] = transactions['order_id'].astype('Int64')
+    return transactions
+
+def fetch_transactions(args, start=None, end=None):
+    if args.snapshot:
+        return fetch_data_from_snapshot(args.snapshot, args.index, start=start, end=end)
+    return fetch_data_from_elasticsearch(args.index, start=start, end=end, page_size=args.page_size)
 
 # 3. 데이터 전처리: 실행 시간 계산
-transactions['timestamp'] = pd.to_datetime(transactions['timestamp'])  # datetime 변환
-transactions.sort_values(by='timestamp', inplace=True)  # 시간순 정렬
-
-# 실행 시간 (ms) 계산
-transactions['execution_time'] = transactions['timestamp'].diff().dt.total_seconds() * 1000  # 실행 시간 (ms)
-
-# NaN 제거 (첫 번째 값은 실행 시간이 계산되지 않음)
-transactions = transactions.dropna(subset=['execution_time'])
-
-# Order ID는 function_info에서 추출
-transactions['order_id'] = transactions['function_info'].apply(
-    lambda x: x.get('parameters', {}).get('_orderId') if isinstance(x, dict) and 'parameters' in x else None
-)
-
-# NaN 제거 (Order ID 없는 경우 제외)
-transactions = transactions.dropna(subset=['order_id'])
-
-# 4. 실행 시간 정규화
-scaler = StandardScaler()
-execution_times_scaled = scaler.fit_transform(transactions[['execution_time']])
-
-# 5. 군집화 (K-Means)
-kmeans = KMeans(n_clusters=2, random_state=42)
-transactions['cluster'] = kmeans.fit_predict(execution_times_scaled)
-
-# 6. 이상치 탐지 (Isolation Forest)
-iso_forest = IsolationForest(contamination=0.05, random_state=42)
-transactions['anomaly'] = iso_forest.fit_predict(execution_times_scaled)
-
-# IsolationForest 스코어 계산
-transactions['anomaly_score'] = iso_forest.decision_function(execution_times_scaled)
-
-# 경계값 계산 (IsolationForest 이상치 기준)
-threshold = np.percentile(transactions['anomaly_score'], 5)  # 이상치 기준(5% contamination)
-
-# 데이터 정렬 (원본 유지)
-transactions.reset_index(drop=True, inplace=True)
-transactions['index'] = range(len(transactions))  # X축: 원본 트랜잭션 인덱스
-
-# Order ID별 색상 매핑
-unique_order_ids = transactions['order_id'].unique()
-cmap = cm.get_cmap("tab20", len(unique_order_ids))
-order_id_to_color = {order_id: cmap(i) for i, order_id in enumerate(unique_order_ids)}
-transactions['color'] = transactions['order_id'].map(order_id_to_color)
-
-# 시각화
-plt.figure(figsize=(14, 7))
-
-# 정상 데이터 표시 (Order ID별 색상)
-for order_id in unique_order_ids:
-    subset = transactions[(transactions['order_id'] == order_id) & (transactions['anomaly'] == 1)]
-    plt.scatter(
-        subset['index'],
-        subset['execution_time'],
-        color=order_id_to_color[order_id],
-        label=f"Order {order_id}",
-        alpha=0.6
+# 실행 시간 = 같은 주문의 직전 단계부터 걸린 시간 (ms)
+# (전체 트랜잭션의 timestamp.diff()는 주문이 섞이면 서로 다른 주문 사이 간격이 됨)
+# open_orders: 이전 실행에서 끝나지 않은 주문의 마지막 단계 (증분 모드)
+def compute_execution_time(transactions, open_orders=None):
+    # Order ID 없는 경우는 step_latencies에서 제외
+    transactions, open_orders = step_latencies(transactions, open_orders)
+    transactions['execution_time'] = transactions['step_latency_ms']
+
+    # NaN 제거 (주문의 첫 단계는 실행 시간이 계산되지 않음)
+    return transactions.dropna(subset=['execution_time']), open_orders
+
+# 주문 단위 특성: 전체 소요 시간 + 단계 전환별 지연 (모든 단계가 끝난 주문만)
+def build_order_features(transactions):
+    steps, _ = step_latencies(transactions)
+    orders = order_feature_table(steps)
+    orders = orders[orders['completed']].dropna(subset=latency_columns(orders))
+    orders['execution_time'] = orders['duration_ms']  # 시각화 Y축: 주문 전체 소요 시간
+    return orders, ['duration_ms'] + latency_columns(orders)
+
+# 4~6. 정규화 + 군집화 + 이상치 탐지
+# 전체 데이터로 학습(또는 같은 데이터로 학습해 둔 캐시 모델 사용) 후 판정 -> 경계값 (첫 번째 특성 단위, ms)
+def fit_full(transactions, feature_columns=('execution_time',), store=None, cache_key=None, metadata=None):
+    features = transactions[list(feature_columns)]
+    models = store.get(cache_key) if store is not None else None
+    if models is None:
+        models = fit_models(features)
+        if store is not None:
+            store.put(cache_key, models, metadata)
+    else:
+        print(f"Data unchanged since model {cache_key} was fitted; skipping fit")
+
+    # 군집 / 이상치 여부 / IsolationForest 스코어
+    transactions['cluster'], transactions['anomaly'], transactions['anomaly_score'] = score_models(models, features)
+
+    # 경계값 계산 (IsolationForest 이상치 기준)
+    threshold = np.percentile(transactions['anomaly_score'], 5)  # 이상치 기준(5% contamination)
+    return threshold_to_ms(models["scaler"], threshold)
+
+# 파티션 모드: 컨트랙트 / 함수별로 독립된 모델을 프로세스 풀에서 학습 (캐시 모델이 있으면 판정만)
+def fit_partitioned(transactions, workers=None, store=None, cache_key=None, metadata=None):
+    cached = store.get(cache_key) if store is not None else None
+    transactions, models = detect_partitioned(transactions, max_workers=workers, models=cached)
+    if cached is not None and models is cached:
+        print(f"Data unchanged since model {cache_key} was fitted; skipping fit")
+    elif store is not None:
+        store.put(cache_key, models, metadata)
+
+    summary = transactions.groupby('partition')['anomaly'].agg(rows='size', anomalies=lambda a: int((a == -1).sum()))
+    print(summary.to_string())
+    return transactions
+
+# 증분 모드: 저장된 모델 상태를 새 행으로만 갱신하고 새 행을 판정 -> (새 행, 경계값)
+def run_incremental(args):
+    if os.path.exists(args.state):
+        model = IncrementalAnomalyModel.load(args.state)
+        print(f"Loaded model state from {args.state} (watermark {model.watermark})")
+    else:
+        model = IncrementalAnomalyModel(refit_hours=args.refit_hours, drift_pvalue=args.drift_pvalue)
+    model.refit_hours = args.refit_hours
+    model.drift_pvalue = args.drift_pvalue
+
+    # watermark 이후 행만 조회 (lateness 구간에서 이미 반영한 행은 tx_hash로 제외)
+    start = model.fetch_start() if model.watermark is not None else args.start
+    transactions = fetch_transactions(args, start=start, end=args.end)
+    transactions = transactions[~model.already_seen(transactions['tx_hash'].to_numpy())]
+    print(f"Fetched {len(transactions)} new transactions from {args.index}")
+
+    # epoch ms로 명시적으로 변환 (pandas 버전에 따라 datetime64[ns]로 바뀌어 있을 수 있음)
+    timestamps = transactions['timestamp'].to_numpy().astype('datetime64[ms]').astype('int64')
+    model.advance_watermark(timestamps, transactions['tx_hash'].to_numpy())
+    transactions, model.open_orders = compute_execution_time(transactions, model.open_orders)
+    if transactions.empty:
+        model.save(args.state)
+        return transactions, None
+
+    features = transactions[['execution_time']].to_numpy()
+    drift, refit = model.update(features)
+    transactions['cluster'], transactions['anomaly'], transactions['anomaly_score'] = model.score(features)
+    model.save(args.state)
+    print(f"Updated model with {len(features)} rows (drift detected: {drift}, IsolationForest refit: {refit})")
+
+    threshold = np.percentile(transactions['anomaly_score'], 5)  # 이상치 기준(5% contamination)
+    return transactions, threshold_to_ms(model.scaler, threshold)
+
+# 시각화 (Agg 백엔드에서 파일로만 저장)
+# - 정상 데이터는 색 배열을 넘겨 scatter 한 번으로 그림 (주문별 mask/scatter 반복 없음)
+# - 점이 density_threshold개를 넘으면 hexbin 밀도 그림으로 전환
+# - 이상치만 개별 마커로 강조
+def plot_anomalies(transactions, threshold_value, output, xlabel="Transaction Index", density_threshold=50000):
+    # 데이터 정렬 (원본 유지)
+    transactions.reset_index(drop=True, inplace=True)
+    index = np.arange(len(transactions))  # X축: 원본 트랜잭션 인덱스
+    execution_time = transactions['execution_time'].to_numpy(dtype=np.float64)
+    is_anomaly = transactions['anomaly'].to_numpy() == -1
+    normal = ~is_anomaly
+
+    fig, ax = plt.subplots(figsize=(14, 7))
+    density = len(transactions) > density_threshold
+    if density:
+        hexbin = ax.hexbin(index[normal], execution_time[normal], gridsize=200, bins="log", mincnt=1, cmap="viridis")
+        fig.colorbar(hexbin, ax=ax, label="Transactions per bin")
+    else:
+        # Order ID별 색상 (tab20을 순환, 주문이 20개 이하일 때만 주문별 범례 표시)
+        order_codes, unique_order_ids = pd.factorize(transactions['order_id'])
+        cmap = plt.get_cmap("tab20")
+        ax.scatter(index[normal], execution_time[normal], c=order_codes[normal] % cmap.N, cmap=cmap,
+                   vmin=0, vmax=cmap.N - 1, alpha=0.6, s=12, rasterized=True, label="Transactions (colored by order)")
+        if len(unique_order_ids) <= cmap.N:
+            for code, order_id in enumerate(unique_order_ids):
+                ax.scatter([], [], color=cmap(code), label=f"Order {order_id}", alpha=0.6)
+
+    # 경계값 표시 (IsolationForest의 이상치 기준선, 파티션 모드는 파티션마다 달라서 생략)
+    if threshold_value is not None:
+        ax.axhline(
+            y=threshold_value,
+            color="red",
+            linestyle="--",
+            label="Anomaly Threshold"
+        )
+
+    # 이상치 데이터 표시 (Order ID와 무관, 원본 데이터 유지)
+    ax.scatter(
+        index[is_anomaly],
+        execution_time[is_anomaly],
+        color="red",
+        label=f"Anomalous Transactions ({int(is_anomaly.sum())})",
+        alpha=0.6,
+        s=50 if is_anomaly.sum() < 10000 else 8,
+        rasterized=True
     )
 
-# 경계값 표시 (IsolationForest의 이상치 기준선)
-plt.axhline(
-    y=scaler.inverse_transform([[threshold]])[0][0],  # 경계값을 원본 실행 시간 값으로 변환
-    color="red",
-    linestyle="--",
-    label="Anomaly Threshold"
-)
-
-# 이상치 데이터 표시 (Order ID와 무관, 원본 데이터 유지)
-anomalies = transactions[transactions['anomaly'] == -1]
-plt.scatter(
-    anomalies['index'],
-    anomalies['execution_time'],
-    color="red",
-    label="Anomalous Transactions",
-    alpha=0.6,
-    s=50
-)
-
-# 그래프 설정
-plt.xlabel("Transaction Index")
-plt.ylabel("Execution Time (ms)")
-plt.title("Transaction Execution Time Anomaly Detection")
-plt.legend(
-    loc="upper left",  # 상단 중앙 위치
-    bbox_to_anchor=(1, 1),  # 그래프 아래쪽으로 이동  # 한 줄에 표시할 열 개수
-    fontsize=9  # 레전드 글자 크기 조정
-)
-plt.tight_layout()
-plt.grid()
-plt.savefig("./exam1.png")
-plt.show()
-print(scaler.inverse_transform([[threshold]])[0][0])
+    # 그래프 설정
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel("Execution Time (ms)")
+    ax.set_title(f"Transaction Execution Time Anomaly Detection ({len(transactions)} points)")
+    ax.legend(
+        loc="upper right" if density else "upper left",  # 밀도 그림은 오른쪽에 colorbar가 있으므로 그래프 안쪽
+        bbox_to_anchor=None if density else (1, 1),  # 그래프 오른쪽 바깥
+        fontsize=9  # 레전드 글자 크기 조정
+    )
+    ax.grid()
+    fig.tight_layout()
+    fig.savefig(output)
+    plt.close(fig)
+    print(f"Saved plot to {output}")
+
+def main():
+    # 분석 구간 / 인덱스 옵션 (시간은 Elasticsearch range 형식, 예: 2025-01-01T00:00:00 또는 now-1d)
+    parser = argparse.ArgumentParser(description="Transaction execution time anomaly detection")
+    parser.add_argument("--index", default="transactions")
+    parser.add_argument("--start", help="analyze transactions at or after this timestamp")
+    parser.add_argument("--end", help="analyze transactions before this timestamp")
+    parser.add_argument("--page-size", type=int, default=5000, help="hits per search_after page")
+    parser.add_argument("--snapshot", metavar="DIR",
+                        help="read transactions from a local snapshot (tx_snapshot.py) instead of Elasticsearch")
+    parser.add_argument("--output", default="./exam1.png")
+    parser.add_argument("--density-threshold", type=int, default=50000,
+                        help="draw a hexbin density plot instead of individual points above this many points")
+    parser.add_argument("--level", choices=["step", "order"], default="step",
+                        help="step: latency of each transaction since the previous step of its order; "
+                             "order: end-to-end duration and step latencies per completed order")
+    parser.add_argument("--incremental", action="store_true",
+                        help="update the persisted model with transactions after its watermark instead of refitting")
+    parser.add_argument("--state", default="kmeans_state.joblib", help="model state file for --incremental")
+    parser.add_argument("--refit-hours", type=float, default=24.0,
+                        help="refit the IsolationForest at most this often unless drift is detected")
+    parser.add_argument("--drift-pvalue", type=float, default=0.01,
+                        help="KS-test p-value below which new rows count as drifted")
+    parser.add_argument("--model-store", default="model_store",
+                        help="directory of fitted models keyed by a fingerprint of the data and hyperparameters")
+    parser.add_argument("--model-store-mb", type=float, default=512, help="model store size limit")
+    parser.add_argument("--no-model-cache", action="store_true", help="always refit the models")
+    parser.add_argument("--partitioned", action="store_true",
+                        help="fit separate models per sc_address and function_name in a process pool")
+    parser.add_argument("--workers", type=int, help="worker processes for --partitioned (default: CPU count)")
+    args = parser.parse_args()
+    if args.incremental and args.level != "step":
+        parser.error("--incremental only supports --level step")
+    if args.partitioned and (args.incremental or args.level != "step"):
+        parser.error("--partitioned only supports full runs with --level step")
+
+    if args.incremental:
+        transactions, threshold_value = run_incremental(args)
+        if threshold_value is None:
+            print("No new transactions since the last run.")
+            return
+    else:
+        # 트랜잭션 데이터 가져오기
+        transactions = fetch_transactions(args, start=args.start, end=args.end)
+        print(f"Fetched {len(transactions)} transactions from {args.snapshot or args.index}")
+
+        # 데이터 지문 (가져온 문서 수 + 최대 timestamp + 설정): 같으면 저장된 모델을 그대로 사용
+        store, cache_key, metadata = None, None, None
+        if not args.no_model_cache:
+            store = ModelStore(args.model_store, max_bytes=int(args.model_store_mb * 1024 * 1024))
+            metadata = {"index": args.index, "start": args.start, "end": args.end, "level": args.level,
+                        "partitioned": args.partitioned, "count": len(transactions),
+                        "max_timestamp": transactions['timestamp'].max()}
+            cache_key = ModelStore.fingerprint(hyperparameters=HYPERPARAMETERS, **metadata)
+        if args.level == "order":
+            orders, feature_columns = build_order_features(transactions)
+            threshold_value = fit_full(orders, feature_columns, store, cache_key, metadata)
+            plot_anomalies(orders, threshold_value, args.output, xlabel="Order Index",
+                           density_threshold=args.density_threshold)
+            print(threshold_value)
+            return
+        transactions, _ = compute_execution_time(transactions)
+        if args.partitioned:
+            transactions = fit_partitioned(transactions, args.workers, store, cache_key, metadata)
+            threshold_value = None
+        else:
+            threshold_value = fit_full(transactions, store=store, cache_key=cache_key, metadata=metadata)
+
+    plot_anomalies(transactions, threshold_value, args.output, density_threshold=args.density_threshold)
+    print(threshold_value)
+
+if __name__ == "__main__":
+    main()
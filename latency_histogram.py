@@ -0,0 +1,109 @@
+import math
+
+import numpy as np
+
+# 0 이하 값 버킷 (1 미만 값의 로그 버킷은 음수이므로 어떤 로그 버킷보다도 작은 값을 사용)
+ZERO_BUCKET = -(2 ** 62)
+
+
+# HDR 스타일 지연 히스토그램
+# 값을 상대 오차(precision) 이내의 로그 버킷에 세어서, 기록 수와 관계없이 버킷 수만큼의 메모리로
+# 백분위수를 계산 (기본 precision=0.001 -> 유효숫자 약 3자리)
+class LatencyHistogram:
+    def __init__(self, precision=0.001, unit="ms"):
+        self.precision = precision
+        self.unit = unit
+        self._log_base = math.log1p(precision)
+        self.counts = {}
+        self.total = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def _bucket(self, value):
+        if value <= 0:
+            return ZERO_BUCKET  # 0 이하 값은 별도 버킷
+        return math.floor(math.log(value) / self._log_base)
+
+    # 버킷의 대표값 (버킷 구간의 중간값, 1 미만 값의 음수 버킷도 같은 식)
+    def _bucket_value(self, bucket):
+        if bucket == ZERO_BUCKET:
+            return 0.0
+        low = math.exp(bucket * self._log_base)
+        return low * (1 + self.precision / 2)
+
+    def record(self, value, count=1):
+        bucket = self._bucket(value)
+        self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.total += count
+        self.sum += value * count
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    # 값 배열을 한 번에 기록 (버킷 계산과 개수 세기를 numpy로 처리, NaN은 건너뜀)
+    def record_many(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        buckets = np.full(len(values), ZERO_BUCKET, dtype=np.int64)
+        positive = values > 0
+        buckets[positive] = np.floor(np.log(values[positive]) / self._log_base)
+        for bucket, count in zip(*(array.tolist() for array in np.unique(buckets, return_counts=True))):
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.total += len(values)
+        self.sum += float(values.sum())
+        low, high = float(values.min()), float(values.max())
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+
+    def merge(self, other):
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.total += other.total
+        self.sum += other.sum
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def percentile(self, percent):
+        if self.total == 0:
+            return None
+        target = math.ceil(self.total * percent / 100)
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= max(target, 1):
+                return min(max(self._bucket_value(bucket), self.min), self.max)
+        return self.max
+
+    def mean(self):
+        return self.sum / self.total if self.total else None
+
+    def summary(self, percentiles=(50, 90, 99, 99.9)):
+        result = {"count": self.total, "unit": self.unit, "min": self.min, "max": self.max, "mean": self.mean()}
+        for percent in percentiles:
+            result[f"p{percent:g}"] = self.percentile(percent)
+        return result
+
+    # JSON 저장용 (버킷 카운트 포함, from_dict로 복원 가능)
+    def to_dict(self):
+        return {
+            "precision": self.precision,
+            "unit": self.unit,
+            "counts": {str(bucket): count for bucket, count in sorted(self.counts.items())},
+            "total": self.total,
+            "sum": self.sum,
+            "min": self.min,
+            "max": self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls(precision=data["precision"], unit=data["unit"])
+        histogram.counts = {int(bucket): count for bucket, count in data["counts"].items()}
+        histogram.total = data["total"]
+        histogram.sum = data["sum"]
+        histogram.min = data["min"]
+        histogram.max = data["max"]
+        return histogram
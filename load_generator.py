@@ -0,0 +1,192 @@
+import argparse
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from web3 import Web3
+
+from contract_abis import CONTRACTS
+from latency_histogram import LatencyHistogram
+from order_executor import ORDER_FLOW, OrderFlowExecutor
+
+# 흐름 종류 -> 실행할 단계 수 (ORDER_FLOW 앞에서부터)
+FLOW_TYPES = {
+    "place": 1,        # placeOrder
+    "manufacture": 3,  # placeOrder -> requestManufacture -> completeManufacture
+    "full": 5,         # placeOrder -> ... -> completeDelivery
+}
+
+# 저장소에 컨트랙트 바이트코드가 없으므로 eth-tester 체인에는 모든 호출을 받아들이는 stub을 배포
+# (init code가 런타임 코드 0x00(STOP)을 반환)
+STUB_CONTRACT_BYTECODE = "0x6001600c60003960016000f300"
+
+
+# "full:0.8,place:0.2" -> [("full", 0.8), ("place", 0.2)]
+def parse_flow_mix(spec):
+    mix = []
+    for part in spec.split(","):
+        name, weight = part.split(":")
+        if name not in FLOW_TYPES:
+            raise ValueError(f"Unknown flow type {name!r}; expected one of {sorted(FLOW_TYPES)}")
+        mix.append((name, float(weight)))
+    return mix
+
+
+# eth-tester provider는 스레드 안전하지 않으므로 요청을 직렬화
+def _locked_tester_provider():
+    from web3 import EthereumTesterProvider
+
+    class LockedEthereumTesterProvider(EthereumTesterProvider):
+        _request_lock = threading.Lock()
+
+        def make_request(self, method, params):
+            with self._request_lock:
+                return super().make_request(method, params)
+
+    return LockedEthereumTesterProvider()
+
+
+# 체인 연결 및 컨트랙트 준비 -> (web3, contracts)
+def connect(chain, rpc_url):
+    if chain == "tester":
+        web3 = Web3(_locked_tester_provider())
+        deployer = web3.eth.accounts[0]
+        contracts = {}
+        for name, (_, abi) in CONTRACTS.items():
+            tx_hash = web3.eth.send_transaction({'from': deployer, 'data': STUB_CONTRACT_BYTECODE})
+            address = web3.eth.wait_for_transaction_receipt(tx_hash)['contractAddress']
+            contracts[name] = web3.eth.contract(address=address, abi=abi)
+        return web3, contracts
+
+    web3 = Web3(Web3.HTTPProvider(rpc_url))
+    contracts = {name: web3.eth.contract(address=address, abi=abi) for name, (address, abi) in CONTRACTS.items()}
+    return web3, contracts
+
+
+# 개방형(open-loop) 부하 생성기
+# 도착 시각은 목표 도착률의 포아송 과정으로 미리 정해지고, 완료 여부와 관계없이 예정 시각에 흐름을 시작
+# 지연은 예정 도착 시각 기준으로 측정하므로 큐잉 지연이 결과에 그대로 드러남
+class OpenLoopLoadGenerator:
+    def __init__(self, executor, rate, duration, flow_mix, max_in_flight=64, start_order_id=1, seed=None):
+        self.executor = executor
+        self.rate = rate
+        self.duration = duration
+        self.flow_names = [name for name, _ in flow_mix]
+        self.flow_weights = [weight for _, weight in flow_mix]
+        self.max_in_flight = max_in_flight
+        self.next_order_id = start_order_id
+        self.random = random.Random(seed)
+
+        self._lock = threading.Lock()
+        self.step_histograms = {name: LatencyHistogram() for name, *_ in ORDER_FLOW}
+        self.flow_histograms = {name: LatencyHistogram() for name in FLOW_TYPES}
+        self.start_lag = LatencyHistogram()  # 예정 도착 시각 -> 실제 첫 전송까지 (큐잉 지연)
+        self.arrivals = {name: 0 for name in FLOW_TYPES}
+        self.completed = {name: 0 for name in FLOW_TYPES}
+        self.failed = {name: 0 for name in FLOW_TYPES}
+
+    def run(self):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as pool:
+            scheduled = started
+            while True:
+                scheduled += self.random.expovariate(self.rate)
+                if scheduled - started > self.duration:
+                    break
+                wait = scheduled - time.perf_counter()
+                if wait > 0:
+                    time.sleep(wait)
+                flow_name = self.random.choices(self.flow_names, weights=self.flow_weights)[0]
+                order_id = self.next_order_id
+                self.next_order_id += 1
+                self.arrivals[flow_name] += 1
+                pool.submit(self._run_flow, order_id, flow_name, scheduled)
+        elapsed = time.perf_counter() - started
+        return self.summary(elapsed)
+
+    def _run_flow(self, order_id, flow_name, scheduled):
+        # 첫 단계 지연은 예정 도착 시각부터, 이후 단계는 이전 단계 영수증 시각부터 측정
+        step_start = scheduled
+        first_send = True
+        try:
+            for step in ORDER_FLOW[:FLOW_TYPES[flow_name]]:
+                tx_hash, submitted = self.executor.submit_step(order_id, step)
+                if first_send:
+                    self._record(self.start_lag, (submitted - scheduled) * 1000)
+                    first_send = False
+                receipt = self.executor.web3.eth.wait_for_transaction_receipt(
+                    tx_hash, timeout=self.executor.receipt_timeout)
+                received = time.perf_counter()
+                if receipt['status'] != 1:
+                    raise RuntimeError(f"{step[0]} reverted")
+                self._record(self.step_histograms[step[0]], (received - step_start) * 1000)
+                step_start = received
+        except Exception as e:
+            with self._lock:
+                self.failed[flow_name] += 1
+            print(f"Order ID {order_id} ({flow_name}) failed: {e}")
+            return
+        self._record(self.flow_histograms[flow_name], (step_start - scheduled) * 1000)
+        with self._lock:
+            self.completed[flow_name] += 1
+
+    def _record(self, histogram, value):
+        with self._lock:
+            histogram.record(value)
+
+    def summary(self, elapsed):
+        total_arrivals = sum(self.arrivals.values())
+        return {
+            "config": {
+                "target_rate": self.rate,
+                "duration": self.duration,
+                "flow_mix": dict(zip(self.flow_names, self.flow_weights)),
+                "max_in_flight": self.max_in_flight,
+            },
+            "elapsed_seconds": elapsed,
+            "arrivals": self.arrivals,
+            "completed": self.completed,
+            "failed": self.failed,
+            "offered_rate": total_arrivals / self.duration if self.duration else 0.0,
+            "completed_rate": sum(self.completed.values()) / elapsed if elapsed else 0.0,
+            "start_lag_ms": self.start_lag.summary(),
+            "step_latency_ms": {name: h.summary() for name, h in self.step_histograms.items() if h.total},
+            "flow_latency_ms": {name: h.summary() for name, h in self.flow_histograms.items() if h.total},
+            "histograms": {name: h.to_dict() for name, h in self.step_histograms.items() if h.total},
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open-loop load generator for the Order/Manufacture/Delivery contracts")
+    parser.add_argument("--chain", choices=["ganache", "tester"], default="ganache",
+                        help="ganache: use --rpc-url and the deployed contract addresses; "
+                             "tester: in-process eth-tester chain with stub contracts")
+    parser.add_argument("--rpc-url", default="http://127.0.0.1:8545")
+    parser.add_argument("--rate", type=float, default=5.0, help="target flow arrivals per second")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds to generate arrivals for")
+    parser.add_argument("--mix", default="full:1", help="flow mix, e.g. full:0.7,manufacture:0.2,place:0.1")
+    parser.add_argument("--max-in-flight", type=int, default=64, help="worker threads running flows")
+    parser.add_argument("--start-order-id", type=int, default=1)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--output", default="load_summary.json")
+    args = parser.parse_args()
+
+    web3, contracts = connect(args.chain, args.rpc_url)
+    accounts = web3.eth.accounts
+    roles = {"customer": accounts[0], "seller": accounts[1], "manufacturer": accounts[2], "delivery_agency": accounts[3]}
+    executor = OrderFlowExecutor(web3, contracts, roles)
+
+    generator = OpenLoopLoadGenerator(executor, args.rate, args.duration, parse_flow_mix(args.mix),
+                                      max_in_flight=args.max_in_flight, start_order_id=args.start_order_id,
+                                      seed=args.seed)
+    summary = generator.run()
+    with open(args.output, "w") as f:
+        json.dump(summary, f, indent=2)
+    print(json.dumps({k: v for k, v in summary.items() if k != "histograms"}, indent=2))
+    print(f"Summary written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import argparse
+import json
+import re
+import time
+from datetime import datetime
+
+import requests
+from eth_abi.exceptions import DecodingError
+from elasticsearch import Elasticsearch
+from web3 import Web3
+
+from backfill_scanner import NdjsonSink, load_checkpoint, save_checkpoint
+from chain_cache import ChainLookupCache
+from es_bulk_writer import BulkWriter
+from es_schema import ensure_index_templates
+from tx_decoder import default_registry
+
+# 이벤트 -> 이벤트를 발생시키는 컨트랙트 함수
+EVENT_FUNCTION_MAPPING = {
+    "OrderPlaced": "placeOrder",
+    "OrderFulfilled": "fulfillOrder",
+    "ManufactureRequested": "requestManufacture",
+    "ManufactureCompleted": "completeManufacture",
+    "DeliveryRequested": "requestDelivery",
+    "DeliveryCompleted": "completeDelivery",
+}
+
+
+# 노드의 구간 / 결과 수 / 응답 크기 제한 오류 메시지 (geth, erigon, nethermind, 호스팅 노드 등)
+RANGE_LIMIT_ERROR = re.compile(
+    r"block range|range (is )?too (large|wide)|more than \d+ (results|logs)|too many (results|logs)|"
+    r"limit exceeded|exceeds? .*limit|response (size|is too)|query timeout|timed? ?out",
+    re.IGNORECASE,
+)
+
+
+# 구간을 줄이면 성공할 수 있는 오류인지 (구간 제한 또는 타임아웃)
+def is_range_limit_error(error):
+    if isinstance(error, (TimeoutError, requests.Timeout)):
+        return True
+    return bool(RANGE_LIMIT_ERROR.search(str(error)))
+
+
+# eth_getLogs 구간 조회
+# - 노드가 구간 제한 / 타임아웃으로 실패하면 구간을 절반으로 줄여 재시도 (그 외 오류는 바로 다시 발생)
+# - grow_after번 연속으로 성공하면 구간을 두 배로 늘림
+#   (성공할 때마다 늘리면 고정된 노드 제한 앞에서 실패와 성공이 번갈아 요청 절반이 실패함)
+# - 실패했던 구간 크기 이상으로는 늘리지 않고, reprobe_after번 연속 성공하면 그 제한을 잊고 다시 시도
+class AdaptiveLogFetcher:
+    def __init__(self, web3, addresses, topics, chunk_size=2000, min_chunk_size=1, max_chunk_size=100000,
+                 grow_after=8, reprobe_after=1000):
+        self.web3 = web3
+        self.addresses = addresses
+        self.topics = topics
+        self.chunk_size = chunk_size
+        self.min_chunk_size = min_chunk_size
+        self.max_chunk_size = max_chunk_size
+        self.grow_after = grow_after
+        self.reprobe_after = reprobe_after
+        self.requests_sent = 0
+        self.chunk_shrinks = 0
+        self._successes = 0
+        self._failed_size = None  # 구간 제한 / 타임아웃으로 실패한 가장 작은 구간 크기
+
+    # (chunk_start, chunk_end, logs)를 순서대로 생성
+    def iter_chunks(self, from_block, to_block):
+        start = from_block
+        while start <= to_block:
+            end = min(start + self.chunk_size - 1, to_block)
+            try:
+                self.requests_sent += 1
+                logs = self.web3.eth.get_logs({
+                    "fromBlock": start,
+                    "toBlock": end,
+                    "address": self.addresses,
+                    "topics": [self.topics],  # topic0이 이 중 하나인 로그
+                })
+            except Exception as e:
+                if not is_range_limit_error(e) or self.chunk_size <= self.min_chunk_size:
+                    raise
+                size = end - start + 1
+                self._failed_size = size if self._failed_size is None else min(self._failed_size, size)
+                self.chunk_size = max(min(self.chunk_size, size) // 2, self.min_chunk_size)
+                self.chunk_shrinks += 1
+                self._successes = 0
+                print(f"eth_getLogs {start}..{end} failed ({e}); retrying with chunk size {self.chunk_size}")
+                continue
+
+            yield start, end, logs
+            start = end + 1
+            self._successes += 1
+            if self._failed_size is not None and self._successes >= self.reprobe_after:
+                self._failed_size = None
+            if self._successes % self.grow_after == 0:
+                grown = min(self.chunk_size * 2, self.max_chunk_size)
+                if self._failed_size is None or grown < self._failed_size:
+                    self.chunk_size = grown
+
+
+# 디코딩된 이벤트 로그 문서 생성
+def build_event_data(log, event_name, event_params, block_timestamp):
+    tx_hash = Web3.to_hex(log["transactionHash"])
+    return {
+        "event_name": event_name,
+        "function_name": EVENT_FUNCTION_MAPPING.get(event_name),
+        "sc_address": log["address"],
+        "order_id": event_params.get("orderId"),
+        "parameters": event_params,
+        "block_number": log["blockNumber"],
+        "tx_hash": tx_hash,
+        "log_index": log["logIndex"],
+        "timestamp": datetime.utcfromtimestamp(block_timestamp).isoformat(),
+    }
+
+
+# 이벤트 로그 기반 수집: 컨트랙트 주소 + 이벤트 topic으로 필터링한 로그만 받아서 디코딩
+# 로그가 있는 블록만 타임스탬프를 조회하므로 드문드문한 체인에서 RPC 호출이 크게 줄어듦
+def ingest_logs(fetcher, registry, chain_cache, sink, from_block, to_block, index="transaction_events",
+                checkpoint_path=None):
+    stats = {"logs": 0, "decoded": 0, "decode_errors": 0}
+    started = time.perf_counter()
+
+    for chunk_start, chunk_end, logs in fetcher.iter_chunks(from_block, to_block):
+        failed_before = getattr(sink, "docs_failed", 0)
+        for log in logs:
+            stats["logs"] += 1
+            try:
+                event, event_params = registry.decode_log(log)
+            except DecodingError:
+                stats["decode_errors"] += 1
+                continue
+            document = build_event_data(log, event.name, event_params,
+                                        chain_cache.get_block_timestamp(log["blockNumber"]))
+            # tx 해시 + 로그 인덱스를 문서 id로 사용 (재수집해도 중복 저장되지 않음)
+            sink.index(index=index, document=document, id=f"{document['tx_hash']}-{document['log_index']}")
+            stats["decoded"] += 1
+
+        # 이 구간을 보내는 중에 색인 실패한 문서가 생기면 체크포인트를 넘기지 않고 중단 (다시 실행하면 이 구간부터 재시도)
+        if checkpoint_path:
+            sink.flush()
+            failed = getattr(sink, "docs_failed", 0) - failed_before
+            if failed:
+                raise RuntimeError(f"{failed} documents failed to index in blocks {chunk_start}..{chunk_end}; "
+                                   f"checkpoint left at block {chunk_start}")
+            save_checkpoint(checkpoint_path, chunk_end + 1)
+        print(f"Fetched logs for blocks {chunk_start}..{chunk_end} ({len(logs)} logs)")
+
+    stats["get_logs_requests"] = fetcher.requests_sent
+    stats["chunk_shrinks"] = fetcher.chunk_shrinks
+    stats["block_cache"] = chain_cache.stats()
+    stats["elapsed_seconds"] = time.perf_counter() - started
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest contract events with range-chunked eth_getLogs")
+    parser.add_argument("--rpc-url", default="http://127.0.0.1:8545")
+    parser.add_argument("--from-block", type=int, default=0)
+    parser.add_argument("--to-block", default="latest")
+    parser.add_argument("--chunk-size", type=int, default=2000, help="initial block range per eth_getLogs call")
+    parser.add_argument("--max-chunk-size", type=int, default=100000)
+    parser.add_argument("--events", default=",".join(EVENT_FUNCTION_MAPPING),
+                        help="comma-separated event names to ingest")
+    parser.add_argument("--checkpoint", default="log_checkpoint.json",
+                        help="checkpoint file; an existing checkpoint overrides --from-block")
+    parser.add_argument("--ndjson", help="write documents to this NDJSON file instead of Elasticsearch")
+    parser.add_argument("--es-url", default="http://localhost:9200")
+    parser.add_argument("--index", default="transaction_events")
+    args = parser.parse_args()
+
+    web3 = Web3(Web3.HTTPProvider(args.rpc_url))
+    registry = default_registry()
+    wanted = set(args.events.split(","))
+    topics = sorted({Web3.to_hex(topic) for topic, decoder in registry.event_topics().items() if decoder.name in wanted})
+    fetcher = AdaptiveLogFetcher(web3, sorted(registry.addresses), topics,
+                                 chunk_size=args.chunk_size, max_chunk_size=args.max_chunk_size)
+
+    to_block = web3.eth.block_number if args.to_block == "latest" else int(args.to_block)
+    from_block = load_checkpoint(args.checkpoint)
+    if from_block is None:
+        from_block = args.from_block
+    else:
+        print(f"Resuming from checkpoint at block {from_block}")
+
+    if args.ndjson:
+        sink = NdjsonSink(args.ndjson)
+    else:
+        es = Elasticsearch(args.es_url)
+        ensure_index_templates(es, ["transaction_events"])
+        sink = BulkWriter(es)
+    try:
+        stats = ingest_logs(fetcher, registry, ChainLookupCache(web3), sink, from_block, to_block,
+                            index=args.index, checkpoint_path=args.checkpoint)
+    finally:
+        sink.close()
+    stats["sink"] = sink.stats()
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+
+import joblib
+
+MODEL_SUFFIX = ".joblib"
+META_SUFFIX = ".json"
+
+
+# 학습된 모델 객체를 로컬 디렉터리에 저장하는 캐시
+# - 키는 데이터 지문 (인덱스 이름, 문서 수, 최대 timestamp, 하이퍼파라미터 등)의 해시
+#   -> 같은 데이터 + 같은 설정이면 학습을 건너뛰고 저장된 모델을 사용
+# - 전체 크기가 max_bytes를 넘으면 가장 오래 사용하지 않은 항목부터 삭제
+class ModelStore:
+    def __init__(self, directory="model_store", max_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def fingerprint(**parts):
+        encoded = json.dumps(parts, sort_keys=True, default=str).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()[:32]
+
+    def _path(self, key, suffix):
+        return os.path.join(self.directory, key + suffix)
+
+    def get(self, key):
+        path = self._path(key, MODEL_SUFFIX)
+        try:
+            models = joblib.load(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception as e:
+            print(f"Discarding unreadable model store entry {key}: {e}")
+            self.invalidate(key)
+            self.misses += 1
+            return None
+        os.utime(path)  # 마지막 사용 시각 (eviction 순서)
+        self.hits += 1
+        return models
+
+    # metadata: 목록 조회 / 인덱스 단위 무효화에 쓰는 정보 (JSON으로 저장)
+    def put(self, key, models, metadata=None):
+        tmp_path = self._path(key, MODEL_SUFFIX) + ".tmp"
+        joblib.dump(models, tmp_path)
+        os.replace(tmp_path, self._path(key, MODEL_SUFFIX))
+        with open(self._path(key, META_SUFFIX), "w") as f:
+            json.dump({"key": key, "created_at": time.time(), **(metadata or {})}, f, default=str)
+        self._evict()
+
+    def entries(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(MODEL_SUFFIX):
+                continue
+            key = name[:-len(MODEL_SUFFIX)]
+            path = self._path(key, MODEL_SUFFIX)
+            entry = {"key": key, "size": os.path.getsize(path), "last_used": os.path.getmtime(path)}
+            try:
+                with open(self._path(key, META_SUFFIX)) as f:
+                    entry["metadata"] = json.load(f)
+            except FileNotFoundError:
+                entry["metadata"] = {}
+            entries.append(entry)
+        return sorted(entries, key=lambda entry: entry["last_used"])
+
+    # key 하나, 또는 metadata가 조건과 일치하는 항목 전체 삭제 -> 삭제한 항목 수
+    def invalidate(self, key=None, **match):
+        if key is not None:
+            keys = [key]
+        else:
+            keys = [entry["key"] for entry in self.entries()
+                    if all(entry["metadata"].get(field) == value for field, value in match.items())]
+        for key in keys:
+            for suffix in (MODEL_SUFFIX, META_SUFFIX):
+                try:
+                    os.remove(self._path(key, suffix))
+                except FileNotFoundError:
+                    pass
+        return len(keys)
+
+    def _evict(self):
+        entries = self.entries()
+        total = sum(entry["size"] for entry in entries)
+        for entry in entries:
+            if total <= self.max_bytes:
+                break
+            self.invalidate(entry["key"])
+            total -= entry["size"]
+
+    def stats(self):
+        entries = self.entries()
+        return {
+            "entries": len(entries),
+            "bytes": sum(entry["size"] for entry in entries),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or invalidate cached anomaly detection models")
+    parser.add_argument("command", choices=["list", "invalidate"])
+    parser.add_argument("--store", default="model_store")
+    parser.add_argument("--key", help="invalidate a single entry")
+    parser.add_argument("--index", help="invalidate every entry fitted on this index")
+    parser.add_argument("--all", action="store_true", help="invalidate every entry")
+    args = parser.parse_args()
+
+    store = ModelStore(args.store)
+    if args.command == "list":
+        for entry in store.entries():
+            print(json.dumps(entry))
+        print(json.dumps(store.stats()))
+        return
+
+    if args.key:
+        removed = store.invalidate(args.key)
+    elif args.index:
+        removed = store.invalidate(index=args.index)
+    elif args.all:
+        removed = store.invalidate()
+    else:
+        parser.error("invalidate needs --key, --index or --all")
+    print(f"Removed {removed} cached model(s) from {args.store}")
+
+
+if __name__ == "__main__":
+    main()
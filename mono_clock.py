@@ -0,0 +1,13 @@
+import time
+
+# 단조 시계 기준 epoch ms
+# 프로세스 시작 시 벽시계(time.time)와 time.perf_counter의 차이를 한 번만 고정하고 이후에는 perf_counter만 사용
+# (NTP 보정으로 벽시계가 움직여도 시각이 역전되지 않고, 블록 timestamp(초 단위)보다 훨씬 세밀함)
+_ANCHOR = time.time() - time.perf_counter()
+
+
+# perf_counter 값(없으면 현재) -> epoch ms
+def epoch_ms(perf_counter=None):
+    if perf_counter is None:
+        perf_counter = time.perf_counter()
+    return (_ANCHOR + perf_counter) * 1000
@@ -0,0 +1,255 @@
+import heapq
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+
+from mono_clock import epoch_ms
+
+# 주문 흐름 단계: (단계 이름 = 함수 이름, 컨트랙트, 보내는 역할, 인자 생성 함수, value 생성 함수)
+# 인자 생성 함수는 (order_id, roles, options)를 받음
+ORDER_FLOW = [
+    ("placeOrder", "order", "customer",
+     lambda order_id, roles, options: (order_id, roles["seller"], options["product_name"],
+                                       options["quantity"], options["price"]),
+     lambda options: options["price"]),
+    ("requestManufacture", "manufacture", "seller",
+     lambda order_id, roles, options: (order_id, roles["manufacturer"]),
+     None),
+    ("completeManufacture", "manufacture", "manufacturer",
+     lambda order_id, roles, options: (order_id, roles["seller"]),
+     None),
+    ("requestDelivery", "delivery", "seller",
+     lambda order_id, roles, options: (order_id, roles["delivery_agency"]),
+     None),
+    ("completeDelivery", "delivery", "delivery_agency",
+     lambda order_id, roles, options: (order_id, roles["seller"]),
+     None),
+]
+
+
+# 계정별 로컬 nonce 할당기
+# - 전송마다 get_transaction_count를 호출하지 않고 로컬 카운터로 nonce 발급
+# - 전송에 실패한 nonce는 반환받아 다음 할당에서 먼저 재사용 (nonce gap 메우기)
+# - 노드가 nonce 오류를 돌려주면 체인의 pending 카운트로 재동기화
+# - 계정별 전송 lock으로 nonce 할당과 전송 순서를 맞춤 (미래 nonce를 거부하는 노드 대응)
+class NonceManager:
+    def __init__(self, web3):
+        self.web3 = web3
+        self._next = {}
+        self._released = {}
+        self._account_locks = {}
+        self._lock = threading.Lock()
+        self.resyncs = 0
+
+    # 한 계정의 nonce 할당 ~ 전송 구간을 감싸는 lock
+    def sending(self, account):
+        with self._lock:
+            return self._account_locks.setdefault(account, threading.Lock())
+
+    def allocate(self, account):
+        with self._lock:
+            released = self._released.get(account)
+            if released:
+                return heapq.heappop(released)
+            if account not in self._next:
+                self._next[account] = self.web3.eth.get_transaction_count(account, 'pending')
+            nonce = self._next[account]
+            self._next[account] += 1
+            return nonce
+
+    # 전송되지 않은 nonce 반환
+    def release(self, account, nonce):
+        with self._lock:
+            if self._next.get(account) == nonce + 1:
+                self._next[account] = nonce
+            else:
+                heapq.heappush(self._released.setdefault(account, []), nonce)
+
+    # 반환된 nonce를 모두 꺼냄 (gap을 직접 메울 때 사용)
+    def take_released(self, account):
+        with self._lock:
+            released = sorted(self._released.get(account, []))
+            self._released[account] = []
+            return released
+
+    # 체인 기준으로 다시 맞춤 (반환된 nonce 중 이미 사용된 것은 버림)
+    def resync(self, account):
+        with self._lock:
+            chain_nonce = self.web3.eth.get_transaction_count(account, 'pending')
+            self._next[account] = max(chain_nonce, self._next.get(account, 0))
+            released = [n for n in self._released.get(account, []) if n >= chain_nonce]
+            heapq.heapify(released)
+            self._released[account] = released
+            self.resyncs += 1
+
+
+def _is_nonce_error(error):
+    message = str(error).lower()
+    return "nonce" in message
+
+
+# 지연 주입 정책 (기존 3, 6, 9번 주문 5초 지연을 설정으로 분리)
+# order_ids에 포함되거나 probability 확률에 걸린 주문은 after_step 단계 뒤에 delay초 대기
+class FaultInjectionPolicy:
+    def __init__(self, order_ids=(), delay=5.0, after_step="placeOrder", probability=0.0, seed=None):
+        self.order_ids = set(order_ids)
+        self.delay = delay
+        self.after_step = after_step
+        self.probability = probability
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay_for(self, order_id, step):
+        if step != self.after_step:
+            return 0.0
+        if order_id in self.order_ids:
+            return self.delay
+        if self.probability > 0:
+            with self._lock:
+                if self._random.random() < self.probability:
+                    return self.delay
+        return 0.0
+
+
+NO_FAULTS = FaultInjectionPolicy()
+
+
+# 주문 흐름 실행기
+# 한 주문의 5단계는 이전 단계 영수증을 받은 뒤 순서대로 보내고, 여러 주문은 스레드 풀에서 병렬 실행
+# on_receipt(order_id, 단계 이름, tx_hash, receipt, timing)
+# - timing: 전송 / 영수증 수신 시각 (단조 시계 기준 epoch ms)과 그 차이 (transactions 문서에 그대로 저장)
+class OrderFlowExecutor:
+    def __init__(self, web3, contracts, roles, concurrency=8, fault_policy=None, on_receipt=None,
+                 gas=3000000, receipt_timeout=120, max_send_attempts=3, flow=ORDER_FLOW, options=None):
+        self.web3 = web3
+        self.contracts = contracts
+        self.roles = roles
+        self.concurrency = concurrency
+        self.fault_policy = fault_policy or NO_FAULTS
+        self.on_receipt = on_receipt
+        self.gas = gas
+        self.receipt_timeout = receipt_timeout
+        self.max_send_attempts = max_send_attempts
+        self.flow = flow
+        self.options = options or {
+            "product_name": "Product A",
+            "quantity": 1,
+            "price": web3.to_wei(0.1, 'ether'),
+        }
+        self.nonces = NonceManager(web3)
+        self._records_lock = threading.Lock()
+        self.records = []
+
+    # 단계 하나 전송 (nonce 오류면 재동기화 후 재시도)
+    def submit_step(self, order_id, step):
+        name, contract_key, sender_role, build_args, build_value = step
+        sender = self.roles[sender_role]
+        function = getattr(self.contracts[contract_key].functions, name)(*build_args(order_id, self.roles, self.options))
+
+        for attempt in range(self.max_send_attempts):
+            with self.nonces.sending(sender):
+                tx_params = {'from': sender, 'gas': self.gas, 'nonce': self.nonces.allocate(sender)}
+                if build_value is not None:
+                    tx_params['value'] = build_value(self.options)
+                try:
+                    tx = function.build_transaction(tx_params)
+                    submitted = time.perf_counter()
+                    tx_hash = self.web3.eth.send_transaction(tx)
+                    return tx_hash, submitted
+                except Exception as e:
+                    self.nonces.release(sender, tx_params['nonce'])
+                    if not _is_nonce_error(e) or attempt == self.max_send_attempts - 1:
+                        self.fill_nonce_gaps(sender)
+                        raise
+                    self.nonces.resync(sender)
+
+    # 반환된 nonce 자리에 0 ETH 자기 자신 전송을 보내서 뒤따르는 트랜잭션이 막히지 않게 함
+    # (계정 전송 lock을 잡은 상태에서 호출)
+    def fill_nonce_gaps(self, account):
+        for nonce in self.nonces.take_released(account):
+            try:
+                self.web3.eth.send_transaction({'from': account, 'to': account, 'value': 0,
+                                                'gas': 21000, 'nonce': nonce})
+            except Exception as e:
+                print(f"Failed to fill nonce gap {nonce} for {account}: {e}")
+                self.nonces.resync(account)
+
+    def run_order(self, order_id):
+        for step in self.flow:
+            name = step[0]
+            record = {"order_id": order_id, "step": name}
+            try:
+                tx_hash, submitted = self.submit_step(order_id, step)
+                receipt = self.web3.eth.wait_for_transaction_receipt(tx_hash, timeout=self.receipt_timeout)
+                received = time.perf_counter()
+                record["submit_to_receipt_ms"] = (received - submitted) * 1000
+                record["tx_hash"] = self.web3.to_hex(tx_hash)
+                record["status"] = receipt['status']
+            except Exception as e:
+                record["error"] = str(e)
+                self._record(record)
+                print(f"Order ID {order_id} failed at {name}: {e}")
+                return False
+
+            # 콜백(스풀 기록 등)이 실패해도 트랜잭션은 이미 체인에 있으므로 주문은 계속 진행하고 기록에만 남김
+            if self.on_receipt is not None:
+                timing = {
+                    "submitted_at_ms": round(epoch_ms(submitted)),
+                    "receipt_at_ms": round(epoch_ms(received)),
+                    "confirm_latency_ms": round(record["submit_to_receipt_ms"], 3),
+                }
+                try:
+                    self.on_receipt(order_id, name, tx_hash, receipt, timing)
+                except Exception as e:
+                    record["on_receipt_error"] = str(e)
+                    print(f"on_receipt failed for order ID {order_id} at {name}: {e}")
+            self._record(record)
+            if receipt['status'] != 1:
+                print(f"Order ID {order_id} reverted at {name}")
+                return False
+
+            delay = self.fault_policy.delay_for(order_id, name)
+            if delay > 0:
+                print(f"Delaying order ID {order_id}...")
+                time.sleep(delay)
+        return True
+
+    def run(self, order_ids):
+        completed = 0
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            futures = [pool.submit(self.run_order, order_id) for order_id in order_ids]
+            for future in as_completed(futures):
+                completed += bool(future.result())
+        return completed
+
+    def _record(self, record):
+        with self._records_lock:
+            self.records.append(record)
+
+    # 단계별 submit -> receipt 지연 통계 (ms)
+    def latency_summary(self):
+        summary = {}
+        with self._records_lock:
+            records = list(self.records)
+        for name, *_ in self.flow:
+            latencies = np.array([r["submit_to_receipt_ms"] for r in records
+                                  if r["step"] == name and "submit_to_receipt_ms" in r])
+            errors = sum(1 for r in records if r["step"] == name and "error" in r)
+            callback_errors = sum(1 for r in records if r["step"] == name and "on_receipt_error" in r)
+            if len(latencies) == 0:
+                summary[name] = {"count": 0, "errors": errors}
+                continue
+            summary[name] = {
+                "count": int(len(latencies)),
+                "errors": errors,
+                "on_receipt_errors": callback_errors,
+                "mean_ms": float(latencies.mean()),
+                "p50_ms": float(np.percentile(latencies, 50)),
+                "p95_ms": float(np.percentile(latencies, 95)),
+                "max_ms": float(latencies.max()),
+            }
+        summary["nonce_resyncs"] = self.nonces.resyncs
+        return summary
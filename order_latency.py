@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+
+from order_executor import ORDER_FLOW
+
+# 주문 흐름 단계 순서 (placeOrder -> requestManufacture -> ... -> completeDelivery)
+ORDER_STEPS = [name for name, *_ in ORDER_FLOW]
+FINAL_STEP = ORDER_STEPS[-1]
+_STEP_INDEX = {name: i for i, name in enumerate(ORDER_STEPS)}
+
+
+def _to_epoch_ms(timestamps):
+    return pd.to_datetime(timestamps).to_numpy().astype("datetime64[ms]").astype(np.int64)
+
+
+# 단계 시각 (epoch ms)
+# 전송한 쪽에서 기록한 영수증 수신 시각(receipt_at_ms, ms 단위)이 있으면 사용하고, 없으면 블록 timestamp (초 단위)
+def event_times_ms(transactions):
+    timestamps = _to_epoch_ms(transactions["timestamp"])
+    if "receipt_at_ms" not in transactions.columns:
+        return timestamps
+    receipt = transactions["receipt_at_ms"].to_numpy(dtype=np.float64, na_value=np.nan)
+    return np.where(np.isnan(receipt), timestamps, np.round(receipt)).astype(np.int64)
+
+
+# 주문별 단계 지연 계산 (Python 반복 없이 정렬 + 인접 행 비교로 계산, 단계 시각은 event_times_ms)
+# - (order_id, timestamp, 단계 순서)로 정렬한 뒤 같은 주문의 직전 행과의 시간 차이를 step_latency_ms로 저장
+# - 주문의 첫 단계는 직전 단계가 없으므로 NaN
+# - open_orders: 이전 배치에서 끝나지 않은 주문의 마지막 단계 {order_id: (timestamp ms, function_name)}
+#   (증분 처리에서 배치 경계를 넘는 단계 지연 계산용)
+# - final_step: 이 단계가 나오면 주문이 끝난 것으로 보고 open_orders에서 뺌
+# - tie_breaker: 같은 시각의 단계를 ORDER_FLOW 단계 순서 대신 이 컬럼(예: block_number) 값으로 정렬
+#   (ORDER_FLOW에 없는 흐름용, 값이 없는 행과 남은 동점은 입력 순서대로)
+# -> (원본 컬럼 + previous_function / step_latency_ms가 추가된 DataFrame, 갱신된 open_orders)
+def step_latencies(transactions, open_orders=None, final_step=FINAL_STEP, tie_breaker=None):
+    transactions = transactions[transactions["order_id"].notna()]
+    order = transactions["order_id"].to_numpy(dtype=np.int64)
+    timestamps = event_times_ms(transactions)
+    names = transactions["function_name"].astype(str).to_numpy(dtype=object)
+    positions = np.arange(len(transactions))
+    if tie_breaker is not None:
+        ties = transactions[tie_breaker].to_numpy(dtype=np.float64, na_value=np.nan)
+        ties = np.where(np.isnan(ties), -1, ties).astype(np.int64)
+
+    # 이전 배치에서 이어지는 주문의 마지막 단계를 앞에 붙임 (position -1, 결과에서는 제외)
+    if open_orders:
+        carried_orders = np.fromiter(open_orders.keys(), dtype=np.int64, count=len(open_orders))
+        carried_ts = np.array([ts for ts, _ in open_orders.values()], dtype=np.int64)
+        carried_names = np.array([name for _, name in open_orders.values()], dtype=object)
+        order = np.concatenate([carried_orders, order])
+        timestamps = np.concatenate([carried_ts, timestamps])
+        names = np.concatenate([carried_names, names])
+        positions = np.concatenate([np.full(len(carried_orders), -1), positions])
+        if tie_breaker is not None:
+            ties = np.concatenate([np.full(len(carried_orders), -1), ties])
+
+    if tie_breaker is not None:
+        sort = np.lexsort((positions, ties, timestamps, order))
+    else:
+        steps = pd.Series(names).map(_STEP_INDEX).fillna(len(ORDER_STEPS)).to_numpy(dtype=np.int64)
+        sort = np.lexsort((steps, timestamps, order))
+    order, timestamps, names, positions = order[sort], timestamps[sort], names[sort], positions[sort]
+
+    same_order = np.zeros(len(order), dtype=bool)
+    same_order[1:] = order[1:] == order[:-1]
+    latency = np.full(len(order), np.nan)
+    latency[1:] = np.where(same_order[1:], timestamps[1:] - timestamps[:-1], np.nan)
+    previous = np.full(len(order), None, dtype=object)
+    previous[1:] = np.where(same_order[1:], names[:-1], None)
+
+    # 주문별 마지막 행 중 완료되지 않은 주문만 다음 배치로 넘김
+    last_of_order = np.ones(len(order), dtype=bool)
+    last_of_order[:-1] = order[:-1] != order[1:]
+    still_open = last_of_order & (names != final_step)
+    next_open_orders = dict(zip(order[still_open].tolist(),
+                                zip(timestamps[still_open].tolist(), names[still_open].tolist())))
+
+    keep = positions >= 0
+    result = transactions.iloc[positions[keep]].copy()
+    result["previous_function"] = previous[keep]
+    result["step_latency_ms"] = latency[keep]
+    return result, next_open_orders
+
+
+# 주문별 전체 소요 시간 + 단계 전환별 지연을 한 행으로 모은 특성 테이블
+# (step_latencies 결과를 받아 groupby/unstack으로 계산)
+def order_feature_table(steps):
+    steps = steps.assign(
+        timestamp_ms=event_times_ms(steps),
+        is_final=steps["function_name"].astype(str) == FINAL_STEP,
+    )
+    grouped = steps.groupby("order_id")
+    table = pd.DataFrame({
+        "started_at": grouped["timestamp_ms"].min(),
+        "finished_at": grouped["timestamp_ms"].max(),
+        "steps": grouped.size(),
+        "completed": grouped["is_final"].any(),
+    })
+    table["duration_ms"] = (table["finished_at"] - table["started_at"]).astype(np.float64)
+
+    # 단계 전환별 지연 (예: requestManufacture_latency_ms = placeOrder -> requestManufacture)
+    transitions = steps[steps["step_latency_ms"].notna()]
+    latencies = (transitions.groupby(["order_id", transitions["function_name"].astype(str)])["step_latency_ms"]
+                 .mean().unstack())
+    latencies = latencies.reindex(columns=[name for name in ORDER_STEPS[1:] if name in latencies.columns])
+    latencies.columns = [f"{name}_latency_ms" for name in latencies.columns]
+    return table.join(latencies).reset_index()
+
+
+def latency_columns(table):
+    return [column for column in table.columns if column.endswith("_latency_ms")]
@@ -0,0 +1,86 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from threadpoolctl import threadpool_limits
+
+from anomaly_model import HYPERPARAMETERS, fit_models, score_models
+
+# 파티션 키가 없는 작은 파티션들을 모아서 학습하는 파티션 이름
+OTHER_PARTITION = ("*", "*")
+# 파티션 컬럼 값이 비어 있는 행(예: sc_address가 없는 문서)을 모으는 파티션 이름
+UNPARTITIONED = ("unpartitioned",)
+
+
+# 워커 프로세스: 파티션 하나의 scaler / KMeans / IsolationForest 학습 후 판정
+# (프로세스마다 코어 하나를 쓰도록 BLAS/OpenMP 스레드를 1개로 제한)
+def _fit_partition(key, features, hyperparameters):
+    with threadpool_limits(limits=1):
+        models = fit_models(features, hyperparameters)
+        return key, models, score_models(models, features)
+
+
+# sc_address / function_name 파티션별로 독립된 모델을 프로세스 풀에서 학습하고 결과를 한 프레임으로 합침
+# - 함수마다 지연 분포가 다르므로 파티션 안에서만 비교해서 이상치를 판정
+# - 파티션 컬럼 값이 비어 있는 행은 UNPARTITIONED 파티션으로 모음
+# - 행 수가 min_rows보다 적은 파티션은 OTHER_PARTITION으로 모아서 학습
+# - models: 이전에 학습한 파티션별 모델 (학습 가능한 파티션이 모두 있으면 학습 없이 판정만 함)
+# -> (cluster / anomaly / anomaly_score / partition 컬럼이 추가된 table, 파티션별 모델)
+def detect_partitioned(table, feature_columns=("execution_time",), partition_columns=("sc_address", "function_name"),
+                       hyperparameters=HYPERPARAMETERS, max_workers=None, min_rows=50, models=None):
+    features = table[list(feature_columns)].to_numpy(dtype=np.float64)
+    groups = {}
+    missing = []
+    for key, positions in table.groupby(list(partition_columns), observed=True, sort=True,
+                                        dropna=False).indices.items():
+        key = key if isinstance(key, tuple) else (key,)
+        if any(part is None or part != part for part in key):  # None / NaN
+            missing.append(positions)
+        else:
+            groups[tuple(str(part) for part in key)] = positions
+    if missing:
+        groups[UNPARTITIONED] = np.sort(np.concatenate(missing))
+
+    partitions = {}
+    small = []
+    for key, positions in groups.items():
+        if len(positions) >= min_rows:
+            partitions[key] = positions
+        else:
+            small.append(positions)
+    if small:
+        partitions[OTHER_PARTITION] = np.concatenate(small)
+
+    cluster = np.full(len(table), -1, dtype=np.int32)
+    anomaly = np.ones(len(table), dtype=np.int32)
+    anomaly_score = np.full(len(table), np.nan)
+    partition_label = np.empty(len(table), dtype=object)
+    for key, positions in partitions.items():
+        partition_label[positions] = "/".join(key)
+
+    def merge(key, scores):
+        positions = partitions[key]
+        cluster[positions], anomaly[positions], anomaly_score[positions] = scores
+
+    # KMeans는 군집 수보다 행이 많아야 학습 가능 (나머지 파티션은 모델 없이 판정하지 않음)
+    trainable = {key: positions for key, positions in partitions.items()
+                 if len(positions) >= hyperparameters["n_clusters"]}
+    if models is not None and set(models) == set(trainable):
+        for key, partition_models in models.items():
+            merge(key, score_models(partition_models, features[partitions[key]]))
+    else:
+        models = {}
+        with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as pool:
+            futures = [pool.submit(_fit_partition, key, features[positions], hyperparameters)
+                       for key, positions in trainable.items()]
+            for future in futures:
+                key, partition_models, scores = future.result()
+                models[key] = partition_models
+                merge(key, scores)
+
+    table = table.copy()
+    table["cluster"] = cluster
+    table["anomaly"] = anomaly
+    table["anomaly_score"] = anomaly_score
+    table["partition"] = partition_label
+    return table, models
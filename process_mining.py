@@ -0,0 +1,196 @@
+import argparse
+import json
+
+import matplotlib
+matplotlib.use("Agg")  # 화면 없이 파일로만 저장
+import matplotlib.pyplot as plt
+import networkx as nx
+import pandas as pd
+from elasticsearch import Elasticsearch
+
+from es_scan import iter_column_frames
+from latency_histogram import LatencyHistogram
+from order_latency import FINAL_STEP, step_latencies
+from tx_snapshot import iter_snapshot_frames
+
+# 이벤트 로그로 읽는 컬럼: 케이스 = order_id, 활동 = function_name, 시각 = receipt_at_ms(있으면) 또는 timestamp
+# 같은 시각의 단계는 block_number 순서 (ORDER_FLOW에 없는 흐름도 마이닝하므로 단계 순서를 가정하지 않음)
+EVENT_COLUMNS = [
+    ("timestamp", "timestamp", "datetime"),
+    ("function_name", ("function_name", "function_info.function_name"), "category"),
+    ("order_id", ("order_id", "function_info.parameters._orderId"), "int64"),
+    ("receipt_at_ms", "receipt_at_ms", "float64"),
+    ("block_number", "block_number", "int64"),
+]
+
+
+# 트랜잭션 스트림을 한 번만 읽으면서 주문 흐름을 마이닝
+# - directly-follows 그래프: 같은 주문에서 바로 이어진 (이전 함수, 다음 함수) 건수 + 전환 지연 히스토그램
+# - trace variant: 완료된 주문의 함수 이름 순서별 건수
+# 진행 중인 주문마다 (마지막 단계 시각, 마지막 함수, variant 접두사 노드 번호)만 들고 있고
+# final_step(completeDelivery)이 들어오면 variant 건수에 더한 뒤 버림
+# -> 메모리: 진행 중인 주문 수 + 서로 다른 전환 / variant 접두사 수
+#
+# variant 접두사는 트리(trie)의 노드 번호로 보관 (노드 0: 빈 접두사)
+# 같은 접두사를 가진 주문은 노드를 공유하므로 주문마다 함수 이름 목록을 들고 있지 않음
+class ProcessMiner:
+    def __init__(self, final_step=FINAL_STEP):
+        self.final_step = final_step
+        self.events = 0
+        self.completed = 0
+        self.start_activities = {}
+        self.transitions = {}  # (이전 함수, 다음 함수) -> {"count", "latency": LatencyHistogram}
+        self.variant_counts = {}  # 완료된 주문의 마지막 노드 -> 건수
+        self.open_orders = {}  # order_id -> (마지막 단계 시각 ms, 마지막 함수), step_latencies 형식
+        self._open_prefixes = {}  # order_id -> 접두사 노드
+        self._children = {}  # (부모 노드, 함수) -> 노드
+        self._nodes = [(None, None)]  # 노드 -> (부모 노드, 함수)
+
+    def _child(self, node, activity):
+        child = self._children.get((node, activity))
+        if child is None:
+            child = len(self._nodes)
+            self._children[(node, activity)] = child
+            self._nodes.append((node, activity))
+        return child
+
+    def _variant(self, node):
+        activities = []
+        while node:
+            node, activity = self._nodes[node]
+            activities.append(activity)
+        return activities[::-1]
+
+    # 트랜잭션 청크 하나 반영 (timestamp 순 스트림의 페이지 / 스냅샷 batch)
+    # 전환 건수와 지연은 step_latencies + groupby로 계산하고, variant 접두사만 주문 순서대로 한 행씩 따라감
+    def feed(self, transactions):
+        steps, self.open_orders = step_latencies(transactions, self.open_orders, final_step=self.final_step,
+                                                 tie_breaker="block_number")
+        if steps.empty:
+            return
+        self.events += len(steps)
+        names = steps["function_name"].astype(str)
+        previous = steps["previous_function"]
+
+        starts = names[previous.isna()].value_counts()
+        for activity, count in starts.items():
+            self.start_activities[activity] = self.start_activities.get(activity, 0) + int(count)
+
+        edges = pd.DataFrame({"source": previous, "target": names.to_numpy(),
+                              "latency_ms": steps["step_latency_ms"].to_numpy()}).dropna(subset=["source"])
+        for (source, target), latencies in edges.groupby(["source", "target"], sort=False)["latency_ms"]:
+            stats = self.transitions.setdefault((source, target), {"count": 0, "latency": LatencyHistogram()})
+            stats["count"] += len(latencies)
+            stats["latency"].record_many(latencies.to_numpy())
+
+        # step_latencies 결과는 (order_id, 시각, block_number)로 정렬되어 있음
+        prefixes = self._open_prefixes
+        for order_id, activity in zip(steps["order_id"].to_numpy(dtype="int64").tolist(), names.tolist()):
+            node = self._child(prefixes.get(order_id, 0), activity)
+            if activity == self.final_step:
+                prefixes.pop(order_id, None)
+                self.variant_counts[node] = self.variant_counts.get(node, 0) + 1
+                self.completed += 1
+            else:
+                prefixes[order_id] = node
+
+    def directly_follows(self, percentiles=(50, 95, 99)):
+        graph = []
+        for (source, target), stats in sorted(self.transitions.items(), key=lambda item: -item[1]["count"]):
+            latency = stats["latency"]
+            graph.append({
+                "source": source,
+                "target": target,
+                "count": stats["count"],
+                "latency_ms": {"mean": latency.mean(), "min": latency.min, "max": latency.max,
+                               **{f"p{percent:g}": latency.percentile(percent) for percent in percentiles}},
+            })
+        return graph
+
+    def variants(self, top=None):
+        ranked = sorted(self.variant_counts.items(), key=lambda item: -item[1])[:top]
+        return [{"variant": self._variant(node), "count": count,
+                 "share": count / self.completed if self.completed else None}
+                for node, count in ranked]
+
+    def summary(self, top=10):
+        return {
+            "events": self.events,
+            "completed_orders": self.completed,
+            "open_orders": len(self._open_prefixes),
+            "variant_count": len(self.variant_counts),
+            "start_activities": self.start_activities,
+            "directly_follows": self.directly_follows(),
+            "variants": self.variants(top),
+        }
+
+
+def mine(frames, final_step=FINAL_STEP):
+    miner = ProcessMiner(final_step)
+    for frame in frames:
+        miner.feed(frame)
+    return miner
+
+
+# directly-follows 그래프 시각화 (엣지 두께 = 건수, 레이블 = 건수 / 지연 p50)
+def visualize_directly_follows(graph, output="./process_model.png"):
+    G = nx.DiGraph()
+    for edge in graph:
+        G.add_edge(edge["source"], edge["target"], **edge)
+    max_count = max((edge["count"] for edge in graph), default=1)
+    widths = [1 + 7 * G.edges[edge]["count"] / max_count for edge in G.edges()]
+    edge_labels = {}
+    for edge in G.edges():
+        data = G.edges[edge]
+        label = f"n={data['count']}"
+        if data["latency_ms"]["p50"] is not None:
+            label += f"\np50 {data['latency_ms']['p50']:.0f} ms"
+        edge_labels[edge] = label
+
+    plt.figure(figsize=(12, 8))
+    pos = nx.spring_layout(G, seed=42) if len(G) > 8 else nx.circular_layout(G)
+    connectionstyle = "arc3,rad=0.1"
+    nx.draw(G, pos, with_labels=True, node_size=3000, node_color='skyblue', font_size=10, font_weight='bold',
+            edge_color='gray', width=widths, arrows=True, connectionstyle=connectionstyle)
+    nx.draw_networkx_edge_labels(G, pos, edge_labels=edge_labels, font_size=8, connectionstyle=connectionstyle,
+                                 node_size=3000)
+    plt.title("Directly-Follows Graph of Order Flows", fontsize=16)
+    plt.savefig(output, bbox_inches='tight')
+    plt.close()
+    print(f"Saved plot to {output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mine the directly-follows graph and trace variants of order flows")
+    parser.add_argument("--snapshot", metavar="DIR",
+                        help="read transactions from a local snapshot (tx_snapshot.py) instead of Elasticsearch")
+    parser.add_argument("--es-url", default="http://localhost:9200")
+    parser.add_argument("--start", help="transactions at or after this timestamp")
+    parser.add_argument("--end", help="transactions before this timestamp")
+    parser.add_argument("--page-size", type=int, default=5000)
+    parser.add_argument("--top", type=int, default=10, help="number of most frequent variants to report")
+    parser.add_argument("--output", help="write the JSON summary to this file instead of stdout")
+    parser.add_argument("--graph", metavar="PNG", help="also draw the directly-follows graph")
+    args = parser.parse_args()
+
+    if args.snapshot:
+        frames = iter_snapshot_frames("transactions", args.snapshot, columns=[name for name, _, _ in EVENT_COLUMNS],
+                                      start=args.start, end=args.end, batch_size=args.page_size)
+    else:
+        frames = iter_column_frames(Elasticsearch(args.es_url), "transactions", EVENT_COLUMNS, start=args.start,
+                                    end=args.end, page_size=args.page_size)
+    miner = mine(frames)
+    summary = miner.summary(args.top)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"{summary['events']} events, {summary['completed_orders']} completed orders, "
+              f"{summary['variant_count']} variants -> {args.output}")
+    else:
+        print(json.dumps(summary, indent=2))
+    if args.graph:
+        visualize_directly_follows(summary["directly_follows"], args.graph)
+
+
+if __name__ == "__main__":
+    main()
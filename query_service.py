@@ -0,0 +1,310 @@
+import argparse
+import hashlib
+import io
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import matplotlib
+matplotlib.use("Agg")  # 서비스에서는 화면 없이 PNG 바이트로만 렌더링
+from elasticsearch import Elasticsearch
+
+import kmeans
+import visualdetail
+import visualizer
+from es_scan import fetch_columns, iter_column_frames
+from trace_fetch import fetch_order_traces, fetch_order_traces_from_snapshot
+from tx_snapshot import iter_snapshot_frames, load_manifest
+
+TRANSACTIONS_INDEX = "transactions"
+FABRIC_INDEX = "hyperledgerfabric"
+
+
+class QueryError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# 결과 캐시: 최근에 쓴 순서(LRU)로 max_entries개까지, 각 항목은 ttl_seconds 동안만 유효
+# 값: (etag, content_type, body)
+class ResultCache:
+    def __init__(self, max_entries=256, ttl_seconds=60.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl_seconds:
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _etag(body):
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def _json_body(data):
+    return json.dumps(data, default=str).encode("utf-8")
+
+
+# 조회 서비스: 기존 조회/처리 함수를 그대로 쓰고 결과를 캐시
+# - es: Elasticsearch 클라이언트 (테스트에서는 같은 메서드를 가진 스텁을 넣으면 됨)
+# - snapshot_dir: 지정하면 Elasticsearch 대신 로컬 스냅샷(tx_snapshot.py)에서 조회
+# - ingest watermark(트랜잭션 문서 수 + 최대 timestamp, Fabric 문서 수)가 바뀌면 캐시 전체를 비움
+#   (watermark 자체는 watermark_interval초마다 한 번만 조회)
+class QueryService:
+    def __init__(self, es=None, snapshot_dir=None, cache_entries=256, cache_ttl=60.0, watermark_interval=2.0,
+                 page_size=5000):
+        self.es = es
+        self.snapshot_dir = snapshot_dir
+        self.cache = ResultCache(cache_entries, cache_ttl)
+        self.watermark_interval = watermark_interval
+        self.page_size = page_size
+        self._watermark = None
+        self._watermark_checked = None
+        self._watermark_lock = threading.Lock()
+        self._render_lock = threading.Lock()  # pyplot은 스레드 안전하지 않으므로 렌더링은 한 번에 하나씩
+
+    def _read_watermark(self):
+        if self.snapshot_dir:
+            return {index: [load_manifest(self.snapshot_dir, index)[key] for key in ("watermark", "rows")]
+                    for index in (TRANSACTIONS_INDEX, FABRIC_INDEX)}
+        response = self.es.search(index=TRANSACTIONS_INDEX, size=0, track_total_hits=True,
+                                  aggs={"max_timestamp": {"max": {"field": "timestamp"}}})
+        return {
+            TRANSACTIONS_INDEX: [response["aggregations"]["max_timestamp"]["value"],
+                                 response["hits"]["total"]["value"]],
+            FABRIC_INDEX: self.es.count(index=FABRIC_INDEX)["count"],
+        }
+
+    def watermark(self):
+        with self._watermark_lock:
+            now = time.monotonic()
+            if self._watermark_checked is None or now - self._watermark_checked >= self.watermark_interval:
+                watermark = self._read_watermark()
+                if watermark != self._watermark:
+                    self.cache.clear()
+                    self._watermark = watermark
+                self._watermark_checked = now
+            return self._watermark
+
+    # 캐시에서 찾고 없으면 compute() -> (content_type, body)를 계산해서 저장 -> (etag, content_type, body)
+    def cached(self, key, compute):
+        self.watermark()
+        result = self.cache.get(key)
+        if result is None:
+            content_type, body = compute()
+            result = (_etag(body), content_type, body)
+            self.cache.put(key, result)
+        return result
+
+    def order_trace(self, order_id):
+        if self.snapshot_dir:
+            transactions, fabric = fetch_order_traces_from_snapshot(self.snapshot_dir, [order_id])
+        else:
+            transactions, fabric = fetch_order_traces(self.es, [order_id], page_size=self.page_size)
+        transactions, fabric = transactions[order_id], fabric[order_id]
+        if not transactions:
+            raise QueryError(404, f"No transactions for order {order_id}")
+        return transactions, fabric
+
+    # 주문 하나의 트랜잭션 / Fabric 상세 (visualdetail.py 테이블과 같은 내용)
+    def order_trace_json(self, order_id):
+        transactions, fabric = self.order_trace(order_id)
+        fabric_df, legend_data = visualdetail.process_fabric_data([], fabric)
+        return "application/json", _json_body({
+            "order_id": order_id,
+            "transactions": visualdetail.process_transactions(transactions).to_dict(orient="records"),
+            "fabric": fabric_df.to_dict(orient="records"),
+            "legend": legend_data,
+        })
+
+    # 주문 하나의 네트워크 그래프 PNG (visualizer.py와 같은 그림)
+    def order_graph_png(self, order_id):
+        transactions, fabric = self.order_trace(order_id)
+        network_graph, order_dict, legend_labels, edge_labels = visualizer.create_network_graph(transactions)
+        output = io.BytesIO()
+        with self._render_lock:
+            visualizer.visualize_graph(network_graph, order_dict, legend_labels, edge_labels, fabric,
+                                       output=output, show=False)
+        return "image/png", output.getvalue()
+
+    # 전체 주문의 역할 간 흐름 집계 (visualizer.py --aggregate)
+    def flow_summary(self, start=None, end=None):
+        if self.snapshot_dir:
+            frames = iter_snapshot_frames(TRANSACTIONS_INDEX, self.snapshot_dir,
+                                          columns=[name for name, _, _ in visualizer.FLOW_COLUMNS],
+                                          start=start, end=end, batch_size=self.page_size)
+        else:
+            frames = iter_column_frames(self.es, TRANSACTIONS_INDEX, visualizer.FLOW_COLUMNS, start=start, end=end,
+                                        page_size=self.page_size)
+        return visualizer.flow_summary(visualizer.aggregate_flow(frames))
+
+    def flow_graph_json(self, start=None, end=None):
+        return "application/json", _json_body(self.flow_summary(start, end))
+
+    def flow_graph_png(self, start=None, end=None):
+        summary = self.flow_summary(start, end)
+        output = io.BytesIO()
+        with self._render_lock:
+            visualizer.visualize_flow_graph(summary, output=output, show=False)
+        return "image/png", output.getvalue()
+
+    # 단계 지연 이상치 (kmeans.py 전체 학습과 같은 방식, 모델 저장소는 쓰지 않음)
+    def anomalies_json(self, start=None, end=None, limit=1000):
+        if self.snapshot_dir:
+            transactions = kmeans.fetch_data_from_snapshot(self.snapshot_dir, TRANSACTIONS_INDEX, start=start, end=end)
+        else:
+            transactions = fetch_columns(self.es, TRANSACTIONS_INDEX, kmeans.TRANSACTION_COLUMNS, start=start, end=end,
+                                         page_size=self.page_size)
+        transactions, _ = kmeans.compute_execution_time(transactions)
+        if len(transactions) < kmeans.HYPERPARAMETERS["n_clusters"]:
+            return "application/json", _json_body({"transactions": len(transactions), "threshold_ms": None,
+                                                   "anomaly_count": 0, "anomalies": []})
+        threshold = kmeans.fit_full(transactions)
+        anomalies = transactions[transactions["anomaly"] == -1].sort_values("anomaly_score")
+        columns = ["timestamp", "order_id", "function_name", "tx_hash", "execution_time", "anomaly_score"]
+        rows = anomalies[columns].head(limit)
+        return "application/json", _json_body({
+            "transactions": len(transactions),
+            "threshold_ms": float(threshold),
+            "anomaly_count": len(anomalies),
+            "anomalies": rows.astype(object).where(rows.notna(), None).to_dict(orient="records"),
+        })
+
+    def status_json(self):
+        return "application/json", _json_body({
+            "source": self.snapshot_dir or "elasticsearch",
+            "watermark": self.watermark(),
+            "cache": {"entries": len(self.cache), "hits": self.cache.hits, "misses": self.cache.misses},
+        })
+
+
+# 쿼리 문자열 인자 타입 (start / end: Elasticsearch range 형식, 예: now-1d)
+QUERY_PARAMETERS = {"start": str, "end": str, "limit": int}
+
+# 경로 -> (QueryService 메서드 이름, 받는 쿼리 문자열 인자), 경로의 이름 있는 그룹도 인자로 넘김
+ROUTES = [
+    (re.compile(r"^/orders/(?P<order_id>[^/]+)/trace$"), "order_trace_json", ()),
+    (re.compile(r"^/orders/(?P<order_id>[^/]+)/graph\.png$"), "order_graph_png", ()),
+    (re.compile(r"^/flow-graph$"), "flow_graph_json", ("start", "end")),
+    (re.compile(r"^/flow-graph\.png$"), "flow_graph_png", ("start", "end")),
+    (re.compile(r"^/anomalies$"), "anomalies_json", ("start", "end", "limit")),
+]
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    server_version = "BTRQuery/1.0"
+
+    def do_GET(self):
+        service = self.server.service
+        url = urlparse(self.path)
+        try:
+            if url.path == "/status":
+                self._send(200, *service.status_json())
+                return
+            for pattern, method, parameters in ROUTES:
+                match = pattern.match(url.path)
+                if match:
+                    break
+            else:
+                raise QueryError(404, f"Unknown path {url.path}")
+            kwargs = dict(match.groupdict())
+            for name, values in parse_qs(url.query).items():
+                if name not in parameters:
+                    raise QueryError(400, f"Unknown parameter {name}")
+                try:
+                    kwargs[name] = QUERY_PARAMETERS[name](values[-1])
+                except ValueError:
+                    raise QueryError(400, f"Invalid value for {name}: {values[-1]}")
+            key = (method, tuple(sorted(kwargs.items())))
+            etag, content_type, body = service.cached(key, lambda: getattr(service, method)(**kwargs))
+        except QueryError as e:
+            self._send(e.status, "application/json", _json_body({"error": str(e)}))
+            return
+        except Exception as e:
+            self.log_error("Query %s failed: %r", self.path, e)
+            self._send(500, "application/json", _json_body({"error": repr(e)}))
+            return
+
+        # 대시보드 폴링: 내용이 그대로면 본문 없이 304
+        if etag in [tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")]:
+            self._send(304, content_type, b"", etag)
+        else:
+            self._send(200, content_type, body, etag)
+
+    def _send(self, status, content_type, body, etag=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-cache")  # 캐시해 두되 매번 ETag로 재검증
+        if etag:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+
+def make_server(service, host="127.0.0.1", port=8765):
+    server = ThreadingHTTPServer((host, port), QueryHandler)
+    server.service = service
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local HTTP API for order traces, flow graphs and anomalies")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--es-url", default="http://localhost:9200")
+    parser.add_argument("--snapshot", metavar="DIR",
+                        help="serve from a local snapshot (tx_snapshot.py) instead of Elasticsearch")
+    parser.add_argument("--cache-entries", type=int, default=256)
+    parser.add_argument("--cache-ttl", type=float, default=60.0, help="seconds a cached result stays valid")
+    parser.add_argument("--watermark-interval", type=float, default=2.0,
+                        help="seconds between ingest watermark checks")
+    parser.add_argument("--page-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    service = QueryService(es=None if args.snapshot else Elasticsearch(args.es_url), snapshot_dir=args.snapshot,
+                           cache_entries=args.cache_entries, cache_ttl=args.cache_ttl,
+                           watermark_interval=args.watermark_interval, page_size=args.page_size)
+    server = make_server(service, args.host, args.port)
+    print(f"Serving on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,10 @@
 from elasticsearch import Elasticsearch
+from es_bulk_writer import BulkWriter
+from es_schema import ensure_index_templates
 
 # Elasticsearch 클라이언트 초기화
 es = Elasticsearch(hosts=["http://localhost:9200"])
+ensure_index_templates(es, ["hyperledgerfabric"])
 
 # 인덱스 이름 설정
 index_name = "hyperledgerfabric"
@@ -23,15 +26,15 @@ pattern2 = {
     "phone": "555-1234"
 }
 
-# Elasticsearch에 문서 삽입
-responses = []
-for pattern in [pattern1, pattern2]:
-    response = es.index(index=index_name, document=pattern)
-    responses.append(response)
+# Elasticsearch에 문서 삽입 (bulk writer로 모아서 전송)
+with BulkWriter(es) as writer:
+    for pattern in [pattern1, pattern2]:
+        writer.index(index=index_name, document=pattern)
 
 # 결과 출력
-for i, response in enumerate(responses):
-    print(f"Document {i + 1} Response:", response)
+print("Bulk insert stats:", writer.stats())
+for failure in writer.failures:
+    print("Failed document:", failure)
 document1 = es.get(index="hyperledgerfabric", id='t69J95MBkLbaaYnX-KWT')
 print("Document 1:", document1)
 
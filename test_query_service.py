@@ -0,0 +1,141 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+from datetime import datetime, timedelta
+
+import pytest
+
+from es_stub import InMemoryElasticsearch
+from order_latency import ORDER_STEPS
+from query_service import FABRIC_INDEX, TRANSACTIONS_INDEX, QueryService, make_server
+
+
+def transaction(order_id, function_name, timestamp, **fields):
+    return {
+        "order_id": order_id,
+        "function_name": function_name,
+        "timestamp": timestamp,
+        "function_info": {"function_name": function_name, "parameters": {"_orderId": order_id}},
+        **fields,
+    }
+
+
+# 주문 흐름 전체(ORDER_STEPS)를 주문마다 기록 (단계 사이 간격은 주문마다 다르게 해서 지연 분포를 만듦)
+def add_order_flows(es, orders):
+    started = datetime(2024, 1, 2)
+    for order_id in range(10, 10 + orders):
+        at = started + timedelta(minutes=order_id)
+        for step, function_name in enumerate(ORDER_STEPS):
+            at += timedelta(seconds=1 + (order_id * 7 + step * 3) % 11)
+            es.add(TRANSACTIONS_INDEX, transaction(order_id, function_name, at.isoformat(),
+                                                   tx_hash=f"0x{order_id:04x}{step:02x}", sc_address="0xorder",
+                                                   **{"from": "0xcustomer", "to": "0xseller"}))
+
+
+# Elasticsearch 대신 InMemoryElasticsearch를 붙인 QueryService를 임시 포트에서 실행
+# (watermark_interval=0: 요청마다 watermark 확인)
+@pytest.fixture
+def server():
+    es = InMemoryElasticsearch()
+    es.add(TRANSACTIONS_INDEX, transaction(1, "placeOrder", "2024-01-01T00:00:00"))
+    es.add(TRANSACTIONS_INDEX, transaction(1, "requestManufacture", "2024-01-01T00:00:05"))
+    es.add(FABRIC_INDEX, {"pattern": {"order_id": "1", "name": "factory", "request_loc": "A"}})
+    service = QueryService(es=es, watermark_interval=0)
+    httpd = make_server(service, port=0)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield es, service, f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def get(url, etag=None, with_content_type=False):
+    request = urllib.request.Request(url, headers={"If-None-Match": etag} if etag else {})
+    try:
+        with urllib.request.urlopen(request) as response:
+            result = response.status, response.headers.get("ETag"), response.read()
+            content_type = response.headers.get("Content-Type")
+    except urllib.error.HTTPError as e:
+        result = e.code, e.headers.get("ETag"), e.read()
+        content_type = e.headers.get("Content-Type")
+    return (*result, content_type) if with_content_type else result
+
+
+# 같은 요청을 두 번 보내서 두 번째는 Elasticsearch 조회 없이 캐시에서 304로 응답하는지 확인
+def assert_cached(es, url, etag):
+    scans = es.requests.count("open_point_in_time")
+    status, second_etag, body = get(url, etag)
+    assert (status, second_etag, body) == (304, etag, b"")
+    assert es.requests.count("open_point_in_time") == scans
+
+
+def test_etag_round_trip(server):
+    es, service, base_url = server
+    status, etag, body = get(f"{base_url}/orders/1/trace")
+    assert status == 200 and etag and b"requestManufacture" in body
+
+    searches = es.requests.count("open_point_in_time")
+    status, second_etag, body = get(f"{base_url}/orders/1/trace", etag)
+    assert (status, second_etag, body) == (304, etag, b"")
+    # 두 번째 요청은 캐시에서 응답 (트레이스 조회 없음)
+    assert es.requests.count("open_point_in_time") == searches
+    assert service.cache.hits == 1
+
+
+def test_watermark_change_invalidates_cache(server):
+    es, service, base_url = server
+    _, etag, _ = get(f"{base_url}/orders/1/trace")
+
+    es.add(TRANSACTIONS_INDEX, transaction(1, "completeDelivery", "2024-01-01T00:00:10"))
+    status, new_etag, body = get(f"{base_url}/orders/1/trace", etag)
+    assert status == 200 and new_etag != etag and b"completeDelivery" in body
+    assert service.cache.hits == 0
+
+    assert get(f"{base_url}/orders/1/trace", new_etag)[0] == 304
+
+
+def test_unknown_order_is_404(server):
+    _, _, base_url = server
+    assert get(f"{base_url}/orders/2/trace")[0] == 404
+
+
+def test_flow_graph_endpoints(server):
+    es, service, base_url = server
+    add_order_flows(es, 3)
+
+    status, etag, body, content_type = get(f"{base_url}/flow-graph", with_content_type=True)
+    assert status == 200 and content_type == "application/json"
+    assert json.loads(body)
+    assert_cached(es, f"{base_url}/flow-graph", etag)
+
+    status, png_etag, body, content_type = get(f"{base_url}/flow-graph.png", with_content_type=True)
+    assert status == 200 and content_type == "image/png"
+    assert body.startswith(b"\x89PNG")
+    assert png_etag != etag
+    assert_cached(es, f"{base_url}/flow-graph.png", png_etag)
+
+
+def test_anomalies_endpoint(server):
+    es, service, base_url = server
+    add_order_flows(es, 30)
+
+    status, etag, body, content_type = get(f"{base_url}/anomalies?limit=5", with_content_type=True)
+    assert status == 200 and content_type == "application/json"
+    result = json.loads(body)
+    assert result["threshold_ms"] is not None
+    assert len(result["anomalies"]) <= 5
+    assert_cached(es, f"{base_url}/anomalies?limit=5", etag)
+
+    # 다른 인자는 다른 캐시 항목 (결과가 같으면 ETag도 같으므로 캐시 miss로 확인)
+    misses = service.cache.misses
+    get(f"{base_url}/anomalies?limit=1")
+    assert service.cache.misses == misses + 1
+    assert get(f"{base_url}/anomalies?limit=x")[0] == 400
+
+
+def test_stub_rejects_unsupported_queries():
+    es = InMemoryElasticsearch()
+    es.add(TRANSACTIONS_INDEX, transaction(1, "placeOrder", "2024-01-01T00:00:00"))
+    with pytest.raises(ValueError, match="does not support 'wildcard' queries"):
+        es.search(index=TRANSACTIONS_INDEX, query={"wildcard": {"function_name": "place*"}})
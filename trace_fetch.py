@@ -0,0 +1,62 @@
+from es_scan import iter_hit_pages
+from tx_snapshot import load_snapshot_hits
+
+# terms 쿼리 하나에 넣는 주문 수
+ORDERS_PER_QUERY = 1000
+
+# 주문 id가 들어 있는 필드 경로 후보
+# (예전 transactions 문서는 최상위 order_id 없이 파라미터에만 있고, fabric 문서는 pattern 아래 또는 최상위)
+TRANSACTION_ORDER_FIELDS = ["order_id", "function_info.parameters._orderId"]
+FABRIC_ORDER_FIELDS = ["pattern.order_id", "order_id"]
+
+
+def transaction_order_id(hit):
+    source = hit["_source"]
+    order_id = source.get("order_id")
+    if order_id is None:
+        order_id = source.get("function_info", {}).get("parameters", {}).get("_orderId")
+    return None if order_id is None else str(order_id)
+
+
+def fabric_order_id(hit):
+    source = hit["_source"]
+    order_id = source.get("pattern", {}).get("order_id", source.get("order_id"))
+    return None if order_id is None else str(order_id)
+
+
+# 주문 id ORDERS_PER_QUERY개마다 terms 쿼리 한 번 (PIT + search_after로 결과 끝까지) -> {order_id: [hit, ...]}
+# 주문마다 search를 보내지 않고, size 제한으로 문서가 잘리지도 않음
+def fetch_grouped(es, index, order_ids, fields, order_id_of, sort_field=None, page_size=5000):
+    order_ids = [str(order_id) for order_id in order_ids]
+    grouped = {order_id: [] for order_id in order_ids}
+    for i in range(0, len(order_ids), ORDERS_PER_QUERY):
+        chunk = order_ids[i:i + ORDERS_PER_QUERY]
+        query = {"bool": {"should": [{"terms": {field: chunk}} for field in fields], "minimum_should_match": 1}}
+        for hits in iter_hit_pages(es, index, query=query, sort_field=sort_field, source=True, page_size=page_size):
+            for hit in hits:
+                order_id = order_id_of(hit)
+                if order_id in grouped:
+                    grouped[order_id].append(hit)
+    return grouped
+
+
+# 여러 주문의 이더리움 트랜잭션(timestamp 순)과 fabric 문서를 한 번에 조회
+# -> ({order_id: [트랜잭션 hit, ...]}, {order_id: [fabric hit, ...]}), order_id는 문자열
+def fetch_order_traces(es, order_ids, page_size=5000, transactions_index="transactions",
+                       fabric_index="hyperledgerfabric"):
+    transactions = fetch_grouped(es, transactions_index, order_ids, TRANSACTION_ORDER_FIELDS, transaction_order_id,
+                                 sort_field="timestamp", page_size=page_size)
+    fabric = fetch_grouped(es, fabric_index, order_ids, FABRIC_ORDER_FIELDS, fabric_order_id, page_size=page_size)
+    return transactions, fabric
+
+
+# 로컬 스냅샷(tx_snapshot.py)에서 같은 형태로 조회
+def fetch_order_traces_from_snapshot(snapshot_dir, order_ids):
+    order_ids = [str(order_id) for order_id in order_ids]
+    transactions = {order_id: [] for order_id in order_ids}
+    for hit in load_snapshot_hits("transactions", snapshot_dir, order_ids=order_ids):
+        transactions[transaction_order_id(hit)].append(hit)
+    fabric = {order_id: [] for order_id in order_ids}
+    for hit in load_snapshot_hits("hyperledgerfabric", snapshot_dir, order_ids=order_ids):
+        fabric[fabric_order_id(hit)].append(hit)
+    return transactions, fabric
@@ -0,0 +1,174 @@
+import json
+from datetime import datetime
+
+from eth_abi import decode
+from eth_abi.exceptions import DecodingError
+from eth_utils import (
+    collapse_if_tuple,
+    event_abi_to_log_topic,
+    function_abi_to_4byte_selector,
+    to_bytes,
+    to_checksum_address,
+)
+
+from chain_cache import normalize_tx_hash
+from contract_abis import CONTRACTS
+from mono_clock import epoch_ms
+
+
+# ABI 타입에 맞게 디코딩 결과 정규화 (web3 decode_function_input과 동일하게 주소는 checksum)
+def _normalize(abi_type, value):
+    if abi_type == "address":
+        return to_checksum_address(value)
+    if abi_type.startswith("address[") and isinstance(value, (list, tuple)):
+        return [_normalize(abi_type[:abi_type.rindex("[")], v) for v in value]
+    return value
+
+
+def _to_bytes(data):
+    if isinstance(data, str):
+        return to_bytes(hexstr=data)
+    return bytes(data)
+
+
+# 함수 하나에 대한 디코더 (selector와 입력 타입을 미리 계산)
+class FunctionDecoder:
+    def __init__(self, abi_entry):
+        self.name = abi_entry["name"]
+        self.abi = abi_entry
+        self.selector = function_abi_to_4byte_selector(abi_entry)
+        self.input_types = [collapse_if_tuple(arg) for arg in abi_entry.get("inputs", [])]
+        self.input_names = [arg["name"] for arg in abi_entry.get("inputs", [])]
+
+    # 4바이트 selector 뒤의 인자 부분을 디코딩
+    def decode(self, data):
+        values = decode(self.input_types, data[4:])
+        return {name: _normalize(abi_type, value)
+                for name, abi_type, value in zip(self.input_names, self.input_types, values)}
+
+
+# 이벤트 하나에 대한 디코더 (topic과 indexed/non-indexed 입력을 미리 계산)
+class EventDecoder:
+    def __init__(self, abi_entry):
+        self.name = abi_entry["name"]
+        self.abi = abi_entry
+        self.topic = event_abi_to_log_topic(abi_entry)
+        inputs = abi_entry.get("inputs", [])
+        self.input_names = [arg["name"] for arg in inputs]
+        self.indexed = [(arg["name"], collapse_if_tuple(arg)) for arg in inputs if arg.get("indexed")]
+        self.non_indexed = [(arg["name"], collapse_if_tuple(arg)) for arg in inputs if not arg.get("indexed")]
+        self.non_indexed_types = [abi_type for _, abi_type in self.non_indexed]
+
+    def decode(self, topics, data):
+        values = {}
+        # indexed 인자는 topics[1:]에 32바이트씩 인코딩되어 있음
+        for (name, abi_type), topic in zip(self.indexed, topics[1:]):
+            values[name] = _normalize(abi_type, decode([abi_type], _to_bytes(topic))[0])
+        decoded = decode(self.non_indexed_types, _to_bytes(data))
+        for (name, abi_type), value in zip(self.non_indexed, decoded):
+            values[name] = _normalize(abi_type, value)
+        # ABI에 선언된 순서대로 반환
+        return {name: values[name] for name in self.input_names}
+
+
+# 컨트랙트 주소 + selector/topic -> 디코더 라우팅 테이블
+# - ABI는 문자열 단위로 한 번만 파싱
+# - 디코딩 비용 = dict 조회 한 번 + ABI 디코드
+class DecoderRegistry:
+    def __init__(self):
+        self._parsed_abis = {}
+        self._functions = {}  # (address, selector) -> FunctionDecoder
+        self._events = {}     # (address, topic) -> EventDecoder
+        self.addresses = set()
+
+    # 컨트랙트 ABI 등록 (abi는 JSON 문자열 또는 파싱된 리스트)
+    def register(self, address, abi):
+        address = to_checksum_address(address)
+        functions, events = self._compile(abi)
+        for selector, decoder in functions.items():
+            self._functions[(address, selector)] = decoder
+        for topic, decoder in events.items():
+            self._events[(address, topic)] = decoder
+        self.addresses.add(address)
+
+    def is_registered(self, address):
+        return bool(address) and to_checksum_address(address) in self.addresses
+
+    # 트랜잭션 input 디코딩 -> (FunctionDecoder, 인자 dict)
+    def decode_function_input(self, to, data):
+        data = _to_bytes(data)
+        decoder = self._functions.get((to_checksum_address(to), data[:4])) if to else None
+        if decoder is None:
+            raise DecodingError(f"No function matching selector 0x{data[:4].hex()} for contract {to}")
+        return decoder, decoder.decode(data)
+
+    # 이벤트 로그 디코딩 -> (EventDecoder, 인자 dict)
+    def decode_log(self, log):
+        topics = log["topics"]
+        if not topics:
+            raise DecodingError("Anonymous events are not supported")
+        decoder = self._events.get((to_checksum_address(log["address"]), _to_bytes(topics[0])))
+        if decoder is None:
+            raise DecodingError(f"No event matching topic for contract {log['address']}")
+        return decoder, decoder.decode(topics, log["data"])
+
+    # 등록된 이벤트 topic -> EventDecoder (address를 주면 해당 컨트랙트만)
+    def event_topics(self, address=None):
+        return {topic: decoder for (addr, topic), decoder in self._events.items()
+                if address is None or addr == to_checksum_address(address)}
+
+    def _compile(self, abi):
+        key = abi if isinstance(abi, str) else json.dumps(abi, sort_keys=True)
+        if key not in self._parsed_abis:
+            entries = json.loads(abi) if isinstance(abi, str) else abi
+            functions = {}
+            events = {}
+            for entry in entries:
+                if entry.get("type") == "function":
+                    decoder = FunctionDecoder(entry)
+                    functions[decoder.selector] = decoder
+                elif entry.get("type") == "event" and not entry.get("anonymous"):
+                    decoder = EventDecoder(entry)
+                    events[decoder.topic] = decoder
+            self._parsed_abis[key] = (functions, events)
+        return self._parsed_abis[key]
+
+
+# 수신자 역할을 나타내는 함수 인자 (transactions 문서의 "to" 필드)
+RECIPIENT_PARAMETERS = ['_seller', '_manufacturer', '_deliveryAgency']
+
+
+# transactions 인덱스에 저장하는 트랜잭션 문서 생성
+# order_id / function_name / block_number / tx_hash는 분석 쪽에서 컬럼으로 바로 읽도록 최상위에도 저장
+# 시각 필드 (epoch ms 숫자, 블록 timestamp는 초 단위라 지연 분석에 쓰기엔 거침)
+# - block_timestamp_ms: 블록 timestamp
+# - indexed_at_ms: ingest 경로에서 문서를 만든 시각 (단조 시계)
+# - timing: 전송한 쪽에서 기록한 submitted_at_ms / receipt_at_ms / confirm_latency_ms (OrderFlowExecutor)
+def build_transaction_data(tx, function_name, func_params, block_timestamp, timing=None):
+    document = {
+        "order_id": func_params.get("_orderId"),
+        "function_name": function_name,
+        "block_number": tx['blockNumber'],
+        "tx_hash": normalize_tx_hash(tx['hash']),
+        "from": tx['from'],
+        "sc_address": tx['to'],
+        "function_info": {
+            "function_name": function_name,
+            "parameters": func_params
+        },
+        "timestamp": datetime.utcfromtimestamp(block_timestamp).isoformat(),
+        "to": next((func_params[key] for key in RECIPIENT_PARAMETERS if key in func_params and func_params[key]), None),
+        "block_timestamp_ms": int(block_timestamp) * 1000,
+        "indexed_at_ms": round(epoch_ms()),
+    }
+    if timing:
+        document.update(timing)
+    return document
+
+
+# 주문/제조/배송 컨트랙트가 등록된 레지스트리
+def default_registry():
+    registry = DecoderRegistry()
+    for address, abi in CONTRACTS.values():
+        registry.register(address, abi)
+    return registry
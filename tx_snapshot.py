@@ -0,0 +1,324 @@
+import argparse
+import json
+import os
+import re
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow import fs
+from elasticsearch import Elasticsearch
+
+from es_scan import fetch_columns
+
+SNAPSHOT_DIR = "tx_snapshot"
+MANIFEST_FILE = "manifest.json"
+PART_PREFIX = "part-"
+PART_SUFFIX = ".parquet"
+
+# 스냅샷에 저장할 컬럼: (컬럼 이름, 필드 경로, 타입)
+# - 필드 경로 튜플은 후보 순서 (ingest 시 최상위로 올린 필드가 없는 예전 문서는 원래 위치에서 꺼냄)
+# - doc_id: refresh 시 lateness 구간에서 다시 읽은 문서를 걸러내는 키
+SNAPSHOT_COLUMNS = {
+    "transactions": [
+        ("doc_id", "_id", "str"),
+        ("timestamp", "timestamp", "datetime"),
+        ("from", "from", "str"),
+        ("to", "to", "str"),
+        ("sc_address", "sc_address", "str"),
+        ("function_name", ("function_name", "function_info.function_name"), "str"),
+        ("order_id", ("order_id", "function_info.parameters._orderId"), "int64"),
+        ("block_number", "block_number", "int64"),
+        ("tx_hash", "tx_hash", "str"),
+        ("submitted_at_ms", "submitted_at_ms", "float64"),
+        ("receipt_at_ms", "receipt_at_ms", "float64"),
+        ("indexed_at_ms", "indexed_at_ms", "float64"),
+        ("confirm_latency_ms", "confirm_latency_ms", "float64"),
+        ("parameters", "function_info.parameters", "json"),
+    ],
+    "hyperledgerfabric": [
+        ("doc_id", "_id", "str"),
+        ("order_id", ("pattern.order_id", "order_id"), "str"),
+        ("request_loc", ("pattern.request_loc", "request_loc"), "str"),
+        ("name", ("pattern.name", "name"), "str"),
+        ("address", ("pattern.address", "address"), "str"),
+        ("phone", ("pattern.phone", "phone"), "str"),
+        ("email", ("pattern.email", "email"), "str"),
+    ],
+}
+
+# watermark 기준 필드 (None: timestamp가 없는 인덱스 -> refresh마다 전체를 다시 읽어 교체)
+TIME_FIELDS = {"transactions": "timestamp", "hyperledgerfabric": None}
+
+# Elasticsearch date math 중 스냅샷 조회에서 지원하는 형식 (예: now, now-7d, now-12h)
+_DATE_MATH = re.compile(r"^now(?:([+-])(\d+)([smhdw]))?$")
+_DATE_MATH_UNITS = {"s": "s", "m": "min", "h": "h", "d": "D", "w": "W"}
+
+# 정수 컬럼은 결측이 있어도 float로 바뀌지 않도록 nullable Int64로 변환 (Elasticsearch 조회 결과와 같은 타입)
+_PANDAS_TYPES = {pa.int64(): pd.Int64Dtype()}
+
+_ARROW_TYPES = {
+    "datetime": pa.timestamp("ms"),
+    "int64": pa.int64(),
+    "float64": pa.float64(),
+    "str": pa.string(),
+    "json": pa.string(),
+}
+
+
+def snapshot_schema(index):
+    return pa.schema([(name, _ARROW_TYPES[dtype]) for name, _, dtype in SNAPSHOT_COLUMNS[index]])
+
+
+def _index_dir(directory, index):
+    return os.path.join(directory, index)
+
+
+def load_manifest(directory, index):
+    try:
+        with open(os.path.join(_index_dir(directory, index), MANIFEST_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"index": index, "watermark": None, "rows": 0, "parts": [], "next_part": 0}
+
+
+def _save_manifest(directory, index, manifest):
+    path = os.path.join(_index_dir(directory, index), MANIFEST_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def _part_paths(directory, index, manifest):
+    return [os.path.join(_index_dir(directory, index), part["file"]) for part in manifest["parts"]]
+
+
+def _read_parts(index, paths, columns=None, filters=None):
+    return pq.read_table(paths, columns=columns, schema=snapshot_schema(index), filters=filters, memory_map=True)
+
+
+# frame: DataFrame 또는 pyarrow Table
+# part 안의 행은 항상 timestamp 순으로 저장 (iter_snapshot_frames가 part들을 시간 순으로 병합)
+def _write_part(directory, index, manifest, frame):
+    name = f"{PART_PREFIX}{manifest['next_part']:05d}{PART_SUFFIX}"
+    path = os.path.join(_index_dir(directory, index), name)
+    if isinstance(frame, pd.DataFrame):
+        frame = pa.Table.from_pandas(frame, schema=snapshot_schema(index), preserve_index=False)
+    time_field = TIME_FIELDS.get(index, "timestamp")
+    if time_field:
+        frame = frame.sort_by(time_field)
+    pq.write_table(frame, path + ".tmp")
+    os.replace(path + ".tmp", path)
+    manifest["next_part"] += 1
+    return {"file": name, "rows": frame.num_rows, "sorted": True}
+
+
+def _to_timestamp(value):
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return pd.Timestamp(int(value), unit="ms")
+    match = _DATE_MATH.match(value)
+    if match:
+        now = pd.Timestamp.now(tz="UTC").tz_localize(None)
+        sign, amount, unit = match.groups()
+        if not sign:
+            return now
+        offset = pd.Timedelta(int(amount), unit=_DATE_MATH_UNITS[unit])
+        return now + offset if sign == "+" else now - offset
+    timestamp = pd.Timestamp(value)
+    return timestamp.tz_convert("UTC").tz_localize(None) if timestamp.tzinfo else timestamp
+
+
+# 스냅샷 갱신 -> 추가된 행 수
+# - timestamp가 있는 인덱스: watermark - lateness_ms 이후 문서만 읽어서 새 part 파일로 추가
+#   (lateness 구간에서 이미 저장한 문서는 doc_id로 제외)
+# - timestamp가 없는 인덱스: 전체를 다시 읽어서 part 하나로 교체
+# - part 수가 max_parts를 넘거나 timestamp 순으로 정렬되지 않은 (예전 형식) part가 있으면 하나로 합침
+def refresh_snapshot(es, index, directory=SNAPSHOT_DIR, lateness_ms=60000, page_size=5000, max_parts=32):
+    os.makedirs(_index_dir(directory, index), exist_ok=True)
+    manifest = load_manifest(directory, index)
+    time_field = TIME_FIELDS.get(index, "timestamp")
+    old_paths = _part_paths(directory, index, manifest)
+
+    start = None
+    if time_field and manifest["watermark"] is not None:
+        start = manifest["watermark"] - lateness_ms
+    frame = fetch_columns(es, index, SNAPSHOT_COLUMNS[index], start=start, time_field=time_field,
+                          page_size=page_size)
+
+    if time_field is None:
+        part = _write_part(directory, index, manifest, frame)
+        manifest["parts"] = [part]
+        added = len(frame) - manifest["rows"]
+    else:
+        if start is not None and old_paths:
+            seen = _read_parts(index, old_paths, columns=["doc_id"], filters=[(time_field, ">=", _to_timestamp(start))])
+            frame = frame[~frame["doc_id"].isin(seen.column("doc_id").to_pylist())]
+        added = len(frame)
+        if added:
+            manifest["parts"].append(_write_part(directory, index, manifest, frame))
+            latest = frame[time_field].to_numpy().astype("datetime64[ms]").astype("int64").max()
+            manifest["watermark"] = max(int(latest), manifest["watermark"] or 0)
+        old_paths = []
+
+    if len(manifest["parts"]) > max_parts or not all(part.get("sorted") for part in manifest["parts"]):
+        old_paths = _part_paths(directory, index, manifest)
+        merged = _read_parts(index, old_paths)
+        manifest["parts"] = [_write_part(directory, index, manifest, merged)]
+
+    manifest["rows"] = sum(part["rows"] for part in manifest["parts"])
+    manifest["refreshed_at"] = time.time()
+    _save_manifest(directory, index, manifest)
+    # manifest를 바꾼 뒤에 이전 part 삭제 (읽는 쪽은 항상 manifest에 있는 파일만 읽음)
+    for path in old_paths:
+        if path not in _part_paths(directory, index, manifest):
+            os.remove(path)
+    return added
+
+
+def _existing_part_paths(directory, index):
+    paths = _part_paths(directory, index, load_manifest(directory, index))
+    if not paths:
+        raise FileNotFoundError(f"No snapshot of {index} in {directory}; run tx_snapshot.py refresh first")
+    return paths
+
+
+def _snapshot_filters(index, start=None, end=None, order_ids=None):
+    filters = []
+    time_field = TIME_FIELDS.get(index, "timestamp")
+    if start is not None:
+        filters.append((time_field, ">=", _to_timestamp(start)))
+    if end is not None:
+        filters.append((time_field, "<", _to_timestamp(end)))
+    if order_ids is not None:
+        cast = str if snapshot_schema(index).field("order_id").type == pa.string() else int
+        filters.append(("order_id", "in", [cast(order_id) for order_id in order_ids]))
+    return filters
+
+
+# 스냅샷을 DataFrame으로 읽기 (part 파일은 memory map으로 읽고, 조건은 row group 단위로 걸러냄)
+# - start / end: ISO 시각 문자열 또는 epoch ms (start 이상, end 미만)
+# - order_ids: 해당 주문의 행만
+def load_snapshot(index, directory=SNAPSHOT_DIR, columns=None, start=None, end=None, order_ids=None):
+    paths = _existing_part_paths(directory, index)
+    time_field = TIME_FIELDS.get(index, "timestamp")
+    filters = _snapshot_filters(index, start, end, order_ids)
+    frame = _read_parts(index, paths, columns, filters or None).to_pandas(types_mapper=_PANDAS_TYPES.get)
+    if time_field in frame.columns:
+        frame = frame.sort_values(time_field, kind="stable", ignore_index=True)
+    return frame
+
+
+# 스냅샷 행을 Elasticsearch hit 형태({"_id", "_source"})로 변환
+# (hit을 처리하는 기존 코드(visualizer / visualdetail)에서 그대로 사용)
+def load_snapshot_hits(index, directory=SNAPSHOT_DIR, order_ids=None):
+    frame = load_snapshot(index, directory, order_ids=order_ids)
+    hits = []
+    for row in frame.to_dict("records"):
+        row = {key: value for key, value in row.items() if not pd.isna(value)}
+        doc_id = row.pop("doc_id", None)
+        if index == "transactions":
+            # timestamp가 없는 행(NaT라 위에서 빠짐)은 timestamp 없이 그대로 둠
+            if row.get("timestamp") is not None:
+                row["timestamp"] = row["timestamp"].isoformat()
+            row["function_info"] = {
+                "function_name": row.get("function_name"),
+                "parameters": json.loads(row.pop("parameters", "{}")),
+            }
+            source = row
+        else:
+            source = {"pattern": row}
+        hits.append({"_id": doc_id, "_source": source})
+    return hits
+
+
+# load_snapshot과 같지만 batch_size행씩 DataFrame을 차례로 생성 (전체를 메모리에 올리지 않음)
+# timestamp가 있는 인덱스는 part들을 timestamp 순으로 병합해서 생성
+# (lateness 구간에서 늦게 들어온 문서는 나중 part에 저장되므로 저장 순서대로 읽으면 시간 순서가 어긋남)
+# -> 각 part의 현재 batch 중 아직 다 읽지 않은 part들의 마지막 timestamp 최솟값까지만 내보냄
+def iter_snapshot_frames(index, directory=SNAPSHOT_DIR, columns=None, start=None, end=None, batch_size=65536):
+    filters = _snapshot_filters(index, start, end)
+    expression = pq.filters_to_expression(filters) if filters else None
+    filesystem = fs.LocalFileSystem(use_mmap=True)
+    time_field = TIME_FIELDS.get(index, "timestamp")
+    read_columns = columns
+    if time_field and columns is not None and time_field not in columns:
+        read_columns = list(columns) + [time_field]
+
+    def part_batches(path, part):
+        dataset = ds.dataset(path, schema=snapshot_schema(index), format="parquet", filesystem=filesystem)
+        if time_field and not part.get("sorted"):
+            # 정렬 전에 저장된 part (다음 refresh에서 정렬해서 다시 씀): part 하나를 읽어서 정렬
+            batches = (dataset.to_table(columns=read_columns, filter=expression).sort_by(time_field)
+                       .to_batches(max_chunksize=batch_size))
+        else:
+            batches = dataset.to_batches(columns=read_columns, filter=expression, batch_size=batch_size)
+        for batch in batches:
+            if batch.num_rows:
+                yield batch.to_pandas(types_mapper=_PANDAS_TYPES.get)
+
+    paths = _existing_part_paths(directory, index)
+    readers = [part_batches(path, part) for path, part in zip(paths, load_manifest(directory, index)["parts"])]
+    if not time_field:
+        for reader in readers:
+            yield from reader
+        return
+
+    buffers = [next(reader, None) for reader in readers]
+    while True:
+        live = [i for i, buffer in enumerate(buffers) if buffer is not None]
+        if not live:
+            return
+        bound = min(buffers[i][time_field].iloc[-1] for i in live)
+        parts = []
+        for i in live:
+            buffer = buffers[i]
+            upto = buffer[time_field].searchsorted(bound, side="right")
+            if upto:
+                parts.append(buffer.iloc[:upto])
+            buffers[i] = buffer.iloc[upto:] if upto < len(buffer) else next(readers[i], None)
+        frame = pd.concat(parts, ignore_index=True).sort_values(time_field, kind="stable", ignore_index=True)
+        yield frame if columns is None else frame[list(columns)]
+
+
+def snapshot_status(directory=SNAPSHOT_DIR):
+    status = {}
+    for index in SNAPSHOT_COLUMNS:
+        manifest = load_manifest(directory, index)
+        paths = _part_paths(directory, index, manifest)
+        status[index] = {
+            "rows": manifest["rows"],
+            "parts": len(paths),
+            "bytes": sum(os.path.getsize(path) for path in paths),
+            "watermark": manifest["watermark"],
+            "refreshed_at": manifest.get("refreshed_at"),
+        }
+    return status
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Parquet snapshot of the transactions and hyperledgerfabric indices")
+    parser.add_argument("command", choices=["refresh", "status"])
+    parser.add_argument("--snapshot-dir", default=SNAPSHOT_DIR)
+    parser.add_argument("--es-url", default="http://localhost:9200")
+    parser.add_argument("--index", action="append", choices=list(SNAPSHOT_COLUMNS),
+                        help="index to refresh (repeatable, default: all)")
+    parser.add_argument("--lateness-ms", type=int, default=60000,
+                        help="re-read documents this far behind the watermark to pick up late writes")
+    parser.add_argument("--page-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    if args.command == "refresh":
+        es = Elasticsearch(args.es_url)
+        for index in args.index or list(SNAPSHOT_COLUMNS):
+            added = refresh_snapshot(es, index, args.snapshot_dir, lateness_ms=args.lateness_ms,
+                                     page_size=args.page_size)
+            print(f"{index}: {added:+d} rows")
+    print(json.dumps(snapshot_status(args.snapshot_dir), indent=2))
+
+
+if __name__ == "__main__":
+    main()
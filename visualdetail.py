@@ -1,7 +1,9 @@
+import argparse
 import pandas as pd
 import matplotlib.pyplot as plt
 from elasticsearch import Elasticsearch
 from matplotlib.lines import Line2D
+from trace_fetch import fetch_order_traces, fetch_order_traces_from_snapshot
 
 # Elasticsearch 클라이언트 설정
 es = Elasticsearch([{'host': 'localhost', 'port': 9200, 'scheme': 'http'}])
@@ -24,14 +26,8 @@ NODE_MAPPING = {
     # 필요에 따라 추가 노드 매핑 설정
 }
 
-# Elasticsearch에서 데이터 조회
-def fetch_data(index, query, size=1000):
-    response = es.search(index=index, body=query, size=size)
-    return response['hits']['hits']
-
 # 트랜잭션 데이터 정리
 def process_transactions(transactions):
-    print(transactions)
     data = []
     for tx in transactions:
         doc = tx["_source"]
@@ -57,25 +53,9 @@ def process_transactions(transactions):
 def process_fabric_data(fabric_data, elastic_data):
     legend_data = {}  # 레전드를 위한 데이터 수집
     data = []
-    
-    # 기존의 기본 데이터 처리
-    for doc in fabric_data:
-        pattern = doc["_source"].get("pattern", {})
-        mapped_node = NODE_MAPPING.get(pattern.get("request_loc"), pattern.get("request_loc"))
-        name = pattern.get("name", "N/A")
-        address = pattern.get("address", "N/A")
-        data.append({
-            "Mapped Node": mapped_node,
-            "Name": name,
-            "Address": address,
-            "Phone": pattern.get("phone", "N/A"),
-            "Email": pattern.get("email", "N/A"),
-        })
-        if mapped_node not in legend_data:
-            legend_data[mapped_node] = f"{name}, {address}"  # 레전드 항목 생성
 
-    # Elasticsearch에서 가져온 데이터 처리
-    for doc in elastic_data:
+    # 기존의 기본 데이터 다음에 Elasticsearch에서 가져온 데이터 처리
+    for doc in list(fabric_data) + list(elastic_data):
         pattern = doc["_source"].get("pattern", {})
         mapped_node = NODE_MAPPING.get(pattern.get("request_loc"), pattern.get("request_loc"))
         name = pattern.get("name", "N/A")
@@ -89,79 +69,91 @@ def process_fabric_data(fabric_data, elastic_data):
         })
         if mapped_node not in legend_data:
             legend_data[mapped_node] = f"{name}, {address}"  # 레전드 항목 생성
-    
+
     return pd.DataFrame(data), legend_data
 
+# 테이블 하나 그리기 (데이터가 없으면 테이블 대신 안내 문구)
+def draw_table(ax, df, title):
+    ax.axis('off')  # 플롯 축 제거
+    if df.empty:
+        ax.text(0.5, 0.5, "No data", ha='center', va='center', fontsize=12, color='gray')
+    else:
+        table = ax.table(cellText=df.values,
+                         colLabels=df.columns,
+                         loc='center',
+                         cellLoc='center')
+        table.auto_set_font_size(False)
+        table.set_fontsize(10)
+        table.auto_set_column_width(col=list(range(len(df.columns))))
+    ax.set_title(title, fontsize=14, pad=10)  # 제목과 테이블 간 간격 줄이기
+
 # 트랜잭션 및 Fabric 데이터 시각화
-def visualize_details(transaction_df, fabric_df, legend_data):
+# show=False: 화면에 띄우지 않고 파일로만 저장 (batch_report.py)
+def visualize_details(transaction_df, fabric_df, legend_data, output="./test2.png", show=True):
     fig, axes = plt.subplots(2, 1, figsize=(14, 10))  # figsize 조정
 
     # 트랜잭션 데이터 테이블
-    axes[0].axis('off')  # 플롯 축 제거
-    table_1 = axes[0].table(cellText=transaction_df.values,
-                            colLabels=transaction_df.columns,
-                            loc='center',
-                            cellLoc='center')
-    table_1.auto_set_font_size(False)
-    table_1.set_fontsize(10)
-    table_1.auto_set_column_width(col=list(range(len(transaction_df.columns))))
-    axes[0].set_title("Ethereum Transactions", fontsize=14, pad=10)  # 제목과 테이블 간 간격 줄이기
+    draw_table(axes[0], transaction_df, "Ethereum Transactions")
 
     # Fabric 데이터 테이블
-    axes[1].axis('off')  # 플롯 축 제거
-    table_2 = axes[1].table(cellText=fabric_df.values,
-                            colLabels=fabric_df.columns,
-                            loc='center',
-                            cellLoc='center')
-    table_2.auto_set_font_size(False)
-    table_2.set_fontsize(10)
-    table_2.auto_set_column_width(col=list(range(len(fabric_df.columns))))
-    axes[1].set_title("Hyperledger Fabric Data", fontsize=14, pad=10)  # 제목과 테이블 간 간격 줄이기
+    draw_table(axes[1], fabric_df, "Hyperledger Fabric Data")
 
     plt.tight_layout(pad=3.0)  # 레이아웃 간격 더 좁게 설정
-    plt.savefig("./test2.png")
-    plt.show()
-
-# 실행
-order_id = '1'
-
-# 기본 하이퍼레저 패브릭 데이터 (기존에 제공된 데이터)
-fabric_data = [
-    {
-        "_source": {
-            "pattern": {
-                "request_loc": "Org2MSP",
-                "email": "john@example.com",
-                "name": "John",
-                "order_id": "1",
-                "phone": "555-1234",
+    plt.savefig(output)
+    if show:
+        plt.show()
+    plt.close(fig)
+
+def main():
+    parser = argparse.ArgumentParser(description="Transaction and Fabric detail tables for one order")
+    parser.add_argument("--order-id", default="1")
+    parser.add_argument("--output", default="./test2.png")
+    parser.add_argument("--snapshot", metavar="DIR",
+                        help="read transactions and fabric data from a local snapshot (tx_snapshot.py) instead of Elasticsearch")
+    args = parser.parse_args()
+
+    # 실행
+    order_id = args.order_id
+
+    # 기본 하이퍼레저 패브릭 데이터 (기존에 제공된 데이터)
+    fabric_data = [
+        {
+            "_source": {
+                "pattern": {
+                    "request_loc": "Org2MSP",
+                    "email": "john@example.com",
+                    "name": "John",
+                    "order_id": "1",
+                    "phone": "555-1234",
+                }
             }
-        }
-    },
-    {
-        "_source": {
-            "pattern": {
-                "request_loc": "Org3MSP",
-                "address": "123 Main St",
-                "name": "John",
-                "order_id": "1",
-                "phone": "555-1234",
+        },
+        {
+            "_source": {
+                "pattern": {
+                    "request_loc": "Org3MSP",
+                    "address": "123 Main St",
+                    "name": "John",
+                    "order_id": "1",
+                    "phone": "555-1234",
+                }
             }
         }
-    }
-]
+    ]
 
-# Elasticsearch에서 이더리움 트랜잭션 데이터 가져오기
-transaction_query = {"query": {"match": {"function_info.parameters._orderId": order_id}}}
-transactions = fetch_data(index="transactions", query=transaction_query)
+    # 이더리움 트랜잭션 / 하이퍼레저 패브릭 데이터를 한 번에 가져오기 (Elasticsearch 또는 로컬 스냅샷)
+    if args.snapshot:
+        transactions, elastic_fabric_data = fetch_order_traces_from_snapshot(args.snapshot, [order_id])
+    else:
+        transactions, elastic_fabric_data = fetch_order_traces(es, [order_id])
+    transactions, elastic_fabric_data = transactions[order_id], elastic_fabric_data[order_id]
 
-# Elasticsearch에서 하이퍼레저 패브릭 데이터 가져오기
-fabric_query = {"query": {"match": {"pattern.order_id": order_id}}}
-elastic_fabric_data = fetch_data(index="hyperledgerfabric", query=fabric_query)
+    # 데이터 처리
+    transaction_df = process_transactions(transactions)
+    fabric_df, legend_data = process_fabric_data(fabric_data, elastic_fabric_data)
 
-# 데이터 처리
-transaction_df = process_transactions(transactions)
-fabric_df, legend_data = process_fabric_data(fabric_data, elastic_fabric_data)
+    # 시각화
+    visualize_details(transaction_df, fabric_df, legend_data, args.output)
 
-# 시각화
-visualize_details(transaction_df, fabric_df, legend_data)
+if __name__ == "__main__":
+    main()
@@ -1,49 +1,43 @@
+import argparse
+import json
 import networkx as nx
 import matplotlib.pyplot as plt
+import pandas as pd
 import random
 from elasticsearch import Elasticsearch
 from matplotlib.lines import Line2D
+from es_scan import iter_column_frames
+from latency_histogram import LatencyHistogram
+from order_latency import event_times_ms, step_latencies
+from trace_fetch import fetch_order_traces, fetch_order_traces_from_snapshot
+from tx_snapshot import iter_snapshot_frames
 
 # Elasticsearch 클라이언트 설정
 es = Elasticsearch([{'host': 'localhost', 'port': 9200, 'scheme': 'http'}])
 
-# Elasticsearch에서 데이터 조회 (orderId를 파라미터로 입력받아 해당하는 트랜잭션만 가져오기)
-def fetch_transactions(order_id, index="transactions"):
-    query = {
-        "query": {
-            "match": {
-                "function_info.parameters._orderId": order_id
-            }
-        }
-    }
-    response = es.search(index=index, body=query, size=1000)  # 최대 1000개의 도큐먼트 조회
-    return response['hits']['hits']
-
-# Elasticsearch에서 Hyperledger Fabric 데이터 조회 (orderID 기반으로 관련 데이터 가져오기)
-def fetch_fabric_data(order_id, index="hyperledgerfabric"):
-    query = {
-        "query": {
-            "match": {
-                "pattern.order_id": order_id
-            }
-        }
-    }
-    response = es.search(index=index, body=query, size=1000)
-    return response['hits']['hits']
+# 거래 흐름에 따라 'from'과 'to'를 설정할 매핑
+node_mapping = {
+    'placeOrder': [('OrderUser', 'Seller')],
+    'requestManufacture': [('Seller', 'Manufacturer')],
+    'completeManufacture': [('Manufacturer', 'Seller')],
+    'requestDelivery': [('Seller', 'DeliveryAgency')],
+    'completeDelivery': [('DeliveryAgency', 'Seller')]
+}
+# 엣지 레이블에 파라미터를 표시하는 첫 단계
+first_function = next(iter(node_mapping))
+
+# 역할 노드 위치 (1열에 OrderUser, Seller 배치)
+role_positions = {
+    'OrderUser': (0, 0),
+    'Seller': (1, 0),
+    'Manufacturer': (0, 1),
+    'DeliveryAgency': (1, 1),
+}
 
 # 네트워크 그래프 생성
 def create_network_graph(transactions):
     G = nx.DiGraph()  # 방향성 있는 그래프 (화살표로 엣지를 표시하기 위해)
 
-    # 거래 흐름에 따라 'from'과 'to'를 설정할 매핑
-    node_mapping = {
-        'placeOrder': [('OrderUser', 'Seller')],
-        'requestManufacture': [('Seller', 'Manufacturer')],
-        'completeManufacture': [('Manufacturer', 'Seller')],
-        'requestDelivery': [('Seller', 'DeliveryAgency')],
-        'completeDelivery': [('DeliveryAgency', 'Seller')]
-    }
-
     # orderId 기준으로 묶기
     order_dict = {}
 
@@ -75,7 +69,7 @@ def create_network_graph(transactions):
                     legend_labels[mapped_to] = to_node
 
                 # 엣지 레이블 추가
-                if function_name == list(node_mapping.keys())[0]:
+                if function_name == first_function:
                     edge_label = "\n".join([f"{key}: {value}" for key, value in functioninfo['parameters'].items()])
                     edge_labels[(mapped_from, mapped_to)] = edge_label
 
@@ -95,19 +89,17 @@ request_loc_mapping = {
     'DeliveryAgency': 'Org3MSP'
 }
 
-# 네트워크 그래프 시각화
-def visualize_graph(G, order_dict, legend_labels, edge_labels, fabric_data):
-    pos = {}  # 노드 위치 설정
-
-    # 1열에 OrderUser, Seller 배치
-    pos['OrderUser'] = (0, 0)
-    pos['Seller'] = (1, 0)
-    pos['Manufacturer'] = (0, 1)
-    pos['DeliveryAgency'] = (1, 1)
-
+def role_layout(G):
+    pos = dict(role_positions)
     for i, node in enumerate(G.nodes()):
         if node not in pos:
             pos[node] = (i % 2, i // 2 + 1)
+    return pos
+
+# 네트워크 그래프 시각화
+# show=False: 화면에 띄우지 않고 파일로만 저장 (batch_report.py)
+def visualize_graph(G, order_dict, legend_labels, edge_labels, fabric_data, output="./test2.png", show=True):
+    pos = role_layout(G)  # 노드 위치 설정
 
     # 그래프 시각화
     plt.figure(figsize=(10, 10))
@@ -175,12 +167,134 @@ def visualize_graph(G, order_dict, legend_labels, edge_labels, fabric_data):
     # 레이아웃 조정 (타이틀이 잘리는 경우 해결)
     plt.tight_layout(pad=2.0)
 
-    plt.savefig("./test2.png", bbox_inches='tight')
-    plt.show()
+    plt.savefig(output, bbox_inches='tight')
+    if show:
+        plt.show()
+    plt.close()
+
+# 집계 모드에서 읽는 컬럼 (예전 문서는 최상위 필드 없이 function_info 아래에만 있음)
+FLOW_COLUMNS = [
+    ("timestamp", "timestamp", "datetime"),
+    ("function_name", ("function_name", "function_info.function_name"), "category"),
+    ("order_id", ("order_id", "function_info.parameters._orderId"), "int64"),
+    ("receipt_at_ms", "receipt_at_ms", "float64"),
+]
+
+# 전체 트랜잭션을 페이지(또는 스냅샷 batch) 단위로 읽어서 역할 간 엣지별로 집계
+# - 단계 지연: 같은 주문의 직전 단계부터 걸린 시간 (페이지 경계를 넘는 주문은 open_orders로 이어서 계산)
+# - 페이지마다 groupby로 엣지별 건수 / 처음·마지막 시각을 구하고 지연은 엣지별 히스토그램에 누적
+#   -> 메모리는 엣지 수 (+ 진행 중인 주문 수)만큼만 사용
+# -> {(from 역할, to 역할): {"count", "first_ms", "last_ms", "latency": LatencyHistogram}}
+def aggregate_flow(frames):
+    sources = {name: edges[0][0] for name, edges in node_mapping.items()}
+    targets = {name: edges[0][1] for name, edges in node_mapping.items()}
+    flow = {}
+    open_orders = {}
+    for frame in frames:
+        steps, open_orders = step_latencies(frame, open_orders)
+        names = steps["function_name"].astype(str)
+        steps = pd.DataFrame({
+            "source": names.map(sources),
+            "target": names.map(targets),
+            "event_ms": event_times_ms(steps),
+            "latency_ms": steps["step_latency_ms"].to_numpy(),
+        }).dropna(subset=["source"])
+        if steps.empty:
+            continue
+
+        grouped = steps.groupby(["source", "target"], sort=False)
+        summary = grouped["event_ms"].agg(["size", "min", "max"])
+        for edge, count, first_ms, last_ms in summary.itertuples():
+            stats = flow.setdefault(edge, {"count": 0, "first_ms": first_ms, "last_ms": last_ms,
+                                           "latency": LatencyHistogram()})
+            stats["count"] += int(count)
+            stats["first_ms"] = min(stats["first_ms"], int(first_ms))
+            stats["last_ms"] = max(stats["last_ms"], int(last_ms))
+        for edge, latencies in grouped["latency_ms"]:
+            flow[edge]["latency"].record_many(latencies.to_numpy())
+    return flow
+
+# 엣지별 건수 / 처리량 (초당 건수) / 단계 지연 백분위수
+def flow_summary(flow, percentiles=(50, 95, 99)):
+    summary = []
+    for (source, target), stats in flow.items():
+        span_seconds = (stats["last_ms"] - stats["first_ms"]) / 1000
+        latency = stats["latency"]
+        summary.append({
+            "source": source,
+            "target": target,
+            "count": stats["count"],
+            "throughput_per_s": stats["count"] / span_seconds if span_seconds > 0 else None,
+            "latency_ms": {f"p{percent:g}": latency.percentile(percent) for percent in percentiles},
+        })
+    return summary
+
+# 집계 그래프 시각화 (엣지 두께 = 건수, 레이블 = 건수 / 처리량 / 지연 p50·p95)
+def visualize_flow_graph(summary, output="./flow_graph.png", show=True):
+    G = nx.DiGraph()
+    for edge in summary:
+        G.add_edge(edge["source"], edge["target"], **edge)
+    pos = role_layout(G)
+    max_count = max((edge["count"] for edge in summary), default=1)
+    widths = [1 + 9 * G.edges[edge]["count"] / max_count for edge in G.edges()]
+
+    edge_labels = {}
+    for edge in G.edges():
+        data = G.edges[edge]
+        label = f"n={data['count']}"
+        if data["throughput_per_s"] is not None:
+            label += f", {data['throughput_per_s']:.2f}/s"
+        if data["latency_ms"]["p50"] is not None:
+            label += f"\np50 {data['latency_ms']['p50']:.0f} ms / p95 {data['latency_ms']['p95']:.0f} ms"
+        edge_labels[edge] = label
 
-# 실행
-order_id = '1'  # 여기서 orderId를 설정 (입력 값으로 받아도 됩니다)
-transactions = fetch_transactions(order_id)  # Elasticsearch에서 해당 orderId의 트랜잭션만 가져오기
-fabric_data = fetch_fabric_data(order_id)  # Elasticsearch에서 해당 orderId의 Fabric 데이터 가져오기
-network_graph, order_dict, legend_labels, edge_labels = create_network_graph(transactions)  # 네트워크 그래프 생성
-visualize_graph(network_graph, order_dict, legend_labels, edge_labels, fabric_data)  # 네트워크 그래프 시각화
+    plt.figure(figsize=(10, 10))
+    connectionstyle = "arc3,rad=0.1"
+    nx.draw(G, pos, with_labels=True, node_size=3000, node_color='skyblue', font_size=12, font_weight='bold',
+            edge_color='gray', width=widths, arrows=True, connectionstyle=connectionstyle)
+    nx.draw_networkx_edge_labels(G, pos, edge_labels=edge_labels, font_size=8, connectionstyle=connectionstyle,
+                                 node_size=3000)
+    plt.title("Aggregated Transaction Flow Between Roles", fontsize=16)
+    plt.savefig(output, bbox_inches='tight')
+    if show:
+        plt.show()
+    plt.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Network graph of one order's transaction flow")
+    parser.add_argument("--order-id", default="1")
+    parser.add_argument("--output", help="image path (default: ./test2.png, or ./flow_graph.png with --aggregate)")
+    parser.add_argument("--snapshot", metavar="DIR",
+                        help="read transactions and fabric data from a local snapshot (tx_snapshot.py) instead of Elasticsearch")
+    parser.add_argument("--aggregate", action="store_true",
+                        help="draw one graph of all orders with per-edge counts, throughput and latency percentiles")
+    parser.add_argument("--start", help="with --aggregate: transactions at or after this timestamp")
+    parser.add_argument("--end", help="with --aggregate: transactions before this timestamp")
+    parser.add_argument("--page-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    if args.aggregate:
+        if args.snapshot:
+            frames = iter_snapshot_frames("transactions", args.snapshot, columns=[name for name, _, _ in FLOW_COLUMNS],
+                                          start=args.start, end=args.end, batch_size=args.page_size)
+        else:
+            frames = iter_column_frames(es, "transactions", FLOW_COLUMNS, start=args.start, end=args.end,
+                                        page_size=args.page_size)
+        summary = flow_summary(aggregate_flow(frames))
+        print(json.dumps(summary, indent=2))
+        visualize_flow_graph(summary, args.output or "./flow_graph.png")
+        return
+
+    # 실행
+    order_id = args.order_id
+    # 해당 orderId의 트랜잭션 / Fabric 데이터를 한 번에 가져오기 (주문 id별로 묶인 결과)
+    if args.snapshot:
+        transactions, fabric_data = fetch_order_traces_from_snapshot(args.snapshot, [order_id])
+    else:
+        transactions, fabric_data = fetch_order_traces(es, [order_id])
+    transactions, fabric_data = transactions[order_id], fabric_data[order_id]
+    network_graph, order_dict, legend_labels, edge_labels = create_network_graph(transactions)  # 네트워크 그래프 생성
+    visualize_graph(network_graph, order_dict, legend_labels, edge_labels, fabric_data, args.output or "./test2.png")  # 네트워크 그래프 시각화
+
+if __name__ == "__main__":
+    main()